@@ -0,0 +1,61 @@
+"""Precomputed, shared analysis parameters (window, mel filterbank) for onset detection."""
+
+import functools
+
+import numpy as np
+import librosa
+
+
+class AnalysisPlan:
+    """
+    Everything the onset pipeline needs for one (sr, n_fft, hop, n_mels, fmin, fmax).
+
+    Plans are immutable and shared by all detectors through get_plan(), so the
+    window and filterbank are built once per parameter set instead of per update.
+
+    The mel filterbank is stored banded: only the FFT bins [bin_lo, bin_hi) that
+    any mel filter touches are kept. With fmax well below Nyquist (8 kHz at
+    48 kHz) this skips most of the spectrum in the power and projection stages.
+    """
+
+    def __init__(self, sample_rate, n_fft, hop_length, n_mels, fmin, fmax):
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mels = n_mels
+        self.fmin = fmin
+        self.fmax = fmax
+
+        self.window = librosa.filters.get_window('hann', n_fft, fftbins=True).astype(np.float32)
+        self.window.flags.writeable = False
+
+        basis = librosa.filters.mel(sr=sample_rate, n_fft=n_fft, n_mels=n_mels, fmin=fmin, fmax=fmax).astype(np.float32)
+        used = np.flatnonzero(basis.any(axis=0))
+        self.bin_lo = int(used[0]) if len(used) else 0
+        self.bin_hi = int(used[-1]) + 1 if len(used) else 0
+        # transposed so blocks of power spectra (frames, bins) project with one matmul
+        self.mel_band_t = np.ascontiguousarray(basis[:, self.bin_lo:self.bin_hi].T)
+        self.mel_band_t.flags.writeable = False
+
+    @property
+    def n_bins(self):
+        return self.n_fft // 2 + 1
+
+    @property
+    def band_bins(self):
+        return self.bin_hi - self.bin_lo
+
+    def nbytes(self):
+        return self.window.nbytes + self.mel_band_t.nbytes
+
+
+@functools.lru_cache(maxsize=None)
+def get_plan(sample_rate, n_fft=2048, hop_length=512, n_mels=128, fmin=0.0, fmax=None):
+    """
+    Get the shared AnalysisPlan for a parameter set, building it on first use.
+
+    Returns:
+        AnalysisPlan (the same instance for the same arguments)
+    """
+    return AnalysisPlan(int(sample_rate), n_fft, hop_length, n_mels, float(fmin),
+                        float(fmax) if fmax is not None else sample_rate / 2.0)
@@ -1,11 +1,13 @@
-import threading
 import pyaudio
 import os
 import aubio
 import numpy as np
 import logging
 
-from beat_detector_base import BaseBeatDetector
+from beat_detector_base import AudioStreamDetector
+
+
+AUBIO_TEMPO_WINDOW = 5.8     # Seconds of onsets aubio's tempo tracker estimates the period from
 
 
 class DeviceDetector:
@@ -25,8 +27,15 @@ class DeviceDetector:
     def __del__(self):
         self.p.terminate()
 
-def list_input_devices():
-    p = pyaudio.PyAudio()
+def list_input_devices(pa_factory=None):
+    """
+    List input devices as dicts (id, name, defaultSampleRate, maxInputChannels).
+
+    Args:
+        pa_factory: Callable returning a PyAudio-like instance (default pyaudio.PyAudio);
+                    lets tests script a fake PortAudio
+    """
+    p = (pa_factory or pyaudio.PyAudio)()
     devices = []
     try:
         for i in range(p.get_device_count()):
@@ -45,115 +54,114 @@ def list_input_devices():
         p.terminate()
     return devices
 
-def resolve_device_index(pyaudio_instance, config_entry):
-    """Resolve a configured device entry to an actual device index.
+def resolve_device_from_list(devices, config_entry):
+    """Resolve a configured device entry against a list from list_input_devices().
     Strategy: exact name match -> substring match -> stored id fallback -> None
     """
     target_name = config_entry.get('name')
     # 1) exact name
     if target_name:
-        for i in range(pyaudio_instance.get_device_count()):
-            try:
-                info = pyaudio_instance.get_device_info_by_index(i)
-            except Exception:
-                continue
-            if info.get('maxInputChannels', 0) <= 0:
-                continue
-            if info.get('name') == target_name:
-                return i
+        for d in devices:
+            if d.get('name') == target_name:
+                return d['id']
     # 2) substring match (case-insensitive)
     if target_name:
         lower = target_name.lower()
-        for i in range(pyaudio_instance.get_device_count()):
-            try:
-                info = pyaudio_instance.get_device_info_by_index(i)
-            except Exception:
-                continue
-            if info.get('maxInputChannels', 0) <= 0:
-                continue
-            if lower in (info.get('name') or '').lower():
-                return i
+        for d in devices:
+            if lower in (d.get('name') or '').lower():
+                return d['id']
     # 3) fallback to stored id if it exists and has input channels
     stored_id = config_entry.get('id')
     if stored_id is not None:
-        try:
-            info = pyaudio_instance.get_device_info_by_index(stored_id)
-            if info.get('maxInputChannels', 0) > 0:
+        for d in devices:
+            if d['id'] == stored_id:
                 return stored_id
-        except Exception:
-            pass
     return None
 
-class BeatDetector(BaseBeatDetector):
-    def __init__(self, method, buffer_size, sample_rate, channels, format, input_device_index=None, window_multiple=4):
-        super().__init__(input_device_index)
-        self.p = pyaudio.PyAudio()
+def resolve_device_index(pyaudio_instance, config_entry):
+    """Resolve a configured device entry to an actual device index.
+    Strategy: exact name match -> substring match -> stored id fallback -> None
+    """
+    devices = []
+    for i in range(pyaudio_instance.get_device_count()):
+        try:
+            info = pyaudio_instance.get_device_info_by_index(i)
+        except Exception:
+            continue
+        if info.get('maxInputChannels', 0) > 0:
+            devices.append({'id': i, 'name': info.get('name')})
+    return resolve_device_from_list(devices, config_entry)
+
+class BeatDetector(AudioStreamDetector):
+    """
+    Beat detector using aubio's tempo tracker, fed hop by hop.
+
+    The PyAudio stream is opened lazily in run() and released when the thread
+    stops (see AudioStreamDetector); it can also run on a shared capture or a
+    FileSource. aubio's estimate, read on every beat, goes through the shared
+    TempoFilter (set_estimate) like the other detectors' readings.
+    """
+
+    def __init__(self, method, buffer_size, sample_rate, channels, format, input_device_index=None,
+                 window_multiple=4, source=None):
+        super().__init__(input_device_index, source)
+        self.method = method
         # make buffer and window sizes explicit and configurable
         self.buffer_size = buffer_size
         self.window_multiple = window_multiple
-        win_size = buffer_size * window_multiple
-        # determine samplerate from device when available to avoid clock mismatch calibration
-        self.sample_rate = int(sample_rate) if sample_rate else None
-        if input_device_index is not None:
-            try:
-                dev_info = self.p.get_device_info_by_index(input_device_index)
-                dev_rate = dev_info.get('defaultSampleRate')
-                if dev_rate:
-                    self.sample_rate = int(dev_rate)
-                    if os.environ.get('BPM_DEBUG') == '1':
-                        print(f"Using device sample rate {self.sample_rate} for input {input_device_index}")
-            except Exception:
-                # fallback to provided sample_rate
-                pass
-        if not self.sample_rate:
-            # fallback to a sane default
-            self.sample_rate = int(44100)
+        self.channels = channels
+        self.format = format
+        # fallback to a sane default; run() switches to the device's native rate
+        # to prevent clock drift bias
+        self.set_sample_rate(int(sample_rate) if sample_rate else 44100)
 
+    def set_sample_rate(self, rate):
+        """Switch to a sample rate: recreate the aubio tempo tracker and reset state."""
+        self.sample_rate = int(rate)
+        win_size = self.buffer_size * self.window_multiple
         # use named arguments to avoid ambiguity
-        self.tempo = aubio.tempo(method=method, buf_size=win_size, hop_size=buffer_size, samplerate=self.sample_rate)
-        # open stream with the device sample rate to prevent clock drift bias
-        self.stream = self.p.open(format=format, channels=channels, rate=self.sample_rate, input=True, frames_per_buffer=buffer_size, input_device_index=input_device_index)
-        self.bpm_estimates = []
-        self.rolling_window_seconds = 5
-        self.bpm = 0
-        self.running = True
-
-    def run(self):
-        print("Starting to listen, press Ctrl+C to stop")
-        try:
-            while self.running:
-                self.detect_beat()
-        except KeyboardInterrupt:
-            print("\nStopping")
-            self.stream.stop_stream()
-            self.stream.close()
-            self.p.terminate()
-
-    def stop(self):
-        self.running = False
-
-    def detect_beat(self):
-        # guard against buffer overflow by allowing non-blocking read to drop frames when needed
-        try:
-            data = self.stream.read(self.buffer_size, exception_on_overflow=False)
-        except Exception:
+        self.tempo = aubio.tempo(method=self.method, buf_size=win_size, hop_size=self.buffer_size,
+                                 samplerate=self.sample_rate)
+        # aubio needs exactly hop_size samples per call; blocks from a shared capture may differ
+        self.hop = np.zeros(self.buffer_size, dtype=aubio.float_type)
+        self.hop_fill = 0
+        self.samples_processed = 0
+        # aubio estimates the period over AUBIO_TEMPO_WINDOW seconds of onsets (rounded up to
+        # a power of two of hops); its reading describes the middle of that window
+        frames = 2 ** int(np.ceil(np.log2(AUBIO_TEMPO_WINDOW * self.sample_rate / self.buffer_size)))
+        self.reading_lag = frames * self.buffer_size / self.sample_rate / 2
+        # the filter's time base (audio seconds) restarts with the counters
+        self.tempo_filter.reset()
+        if os.environ.get('BPM_DEBUG') == '1':
+            print(f"Using sample rate {self.sample_rate} for input {self.input_device_index}")
+
+    def process_samples(self, samples):
+        """Feed a block of mono samples to aubio, one hop at a time."""
+        if len(samples) == self.buffer_size and self.hop_fill == 0:
+            # common case: own stream delivers exactly one hop
+            self._process_hop(samples.astype(aubio.float_type, copy=False))
             return
-        samples = np.frombuffer(data, dtype=aubio.float_type)
-        is_beat = self.tempo(samples)
+        pos = 0
+        while pos < len(samples):
+            take = min(self.buffer_size - self.hop_fill, len(samples) - pos)
+            self.hop[self.hop_fill:self.hop_fill + take] = samples[pos:pos + take]
+            self.hop_fill += take
+            pos += take
+            if self.hop_fill == self.buffer_size:
+                self._process_hop(self.hop)
+                self.hop_fill = 0
+
+    def _process_hop(self, hop):
+        self.samples_processed += len(hop)
+        is_beat = self.tempo(hop)
         if is_beat:
             # this_beat = int(self.tempo.get_last_s())
             raw_bpm = self.tempo.get_bpm()
             if raw_bpm:
-                bpm_estimate = raw_bpm
-                self.bpm_estimates.append(bpm_estimate)
-                # keep last N seconds estimates
-                self.bpm_estimates = self.bpm_estimates[-self.rolling_window_seconds:]
-                # use median for robustness
-                try:
-                    median_bpm = float(np.median(self.bpm_estimates))
-                except Exception:
-                    median_bpm = float(bpm_estimate)
-                self.bpm = round(median_bpm, 1)
+                self.set_estimate(raw_bpm, self.tempo.get_confidence(), self.samples_processed / self.sample_rate,
+                                  lag=self.reading_lag)
+                self.record_estimate()
                 # optional debug print controlled by env var
                 if os.environ.get('BPM_DEBUG') == '1':
-                    print(f"raw={raw_bpm:.3f}, median={self.bpm:.2f}")
+                    print(f"raw={raw_bpm:.3f}, filtered={self.bpm:.2f}")
+            self.record_beats((0.0,))
@@ -1,24 +1,173 @@
 """Abstract base class for beat detectors."""
 
+import contextlib
+import logging
+import os
 import threading
+import time
 from abc import ABC, abstractmethod
 
+import numpy as np
+import pyaudio
+
+from bpm_history import HistoryBuffer
+
+
+# Consecutive failed stream reads after which a detector gives up on its device
+MAX_READ_ERRORS = 20
+
+DEBUG = os.environ.get("BPM_DEBUG", "0") == "1"
+
+# Overload policy (AudioStreamDetector): keep the display within a bounded lag of the music
+MAX_INPUT_AGE = 0.5          # Seconds of unread input above which due analyses are skipped until caught up
+ANALYSIS_BUDGET = 0.5        # Fraction of its update interval a slot's analysis may take before it is slowed down
+
+# Estimates below this confidence are shown dimmed and do not move the MIDI clock
+LOW_CONFIDENCE = 0.45
+
+# Tempo filter (Kalman filter over tempo and tempo drift, see TempoFilter)
+TEMPO_MEASUREMENT_STD = 0.3  # BPM std of a reading at confidence 1.0 (scaled up as confidence drops)
+TEMPO_DRIFT_NOISE = 0.01     # How fast the drift may change, in (BPM/s)^2 per second (pitch fader moves)
+TEMPO_DRIFT_DECAY = 8.0      # Seconds for an unconfirmed drift to decay (limits overshoot when a fader stops)
+TEMPO_JUMP = 0.04            # Readings off by more than this fraction are a possible track change
+TEMPO_JUMP_CONFIRM = 2       # Consecutive agreeing off readings before the filter jumps to them
+
+
+class TempoFilter:
+    """
+    Kalman filter tracking tempo (BPM) and tempo drift (BPM per second).
+
+    Replaces a fixed exponential average: the gain follows the filter's own
+    uncertainty and each reading's confidence, so steady grooves settle to a
+    tight reading while a pitch-fader move is followed through the drift term
+    instead of lagging behind. Readings averaged over a window describe the
+    tempo `lag` seconds before they are taken (about half the window); with
+    the drift known, the filter reports the current tempo instead.
+    A reading far from the prediction is treated as
+    a possible track change: it is ignored until TEMPO_JUMP_CONFIRM consecutive
+    readings agree, then the filter restarts from them.
+
+    Time is supplied by the caller (seconds of audio), so results do not depend
+    on wall-clock timing.
+    """
+
+    def __init__(self, measurement_std=TEMPO_MEASUREMENT_STD, drift_noise=TEMPO_DRIFT_NOISE,
+                 drift_decay=TEMPO_DRIFT_DECAY, jump=TEMPO_JUMP, jump_confirm=TEMPO_JUMP_CONFIRM):
+        self.measurement_std = measurement_std
+        self.drift_noise = drift_noise
+        self.drift_decay = drift_decay
+        self.jump = jump
+        self.jump_confirm = jump_confirm
+        self.reset()
+
+    @property
+    def bpm(self):
+        return float(self.x[0]) if self.initialized else 0.0
+
+    @property
+    def drift(self):
+        """Estimated tempo change in BPM per second."""
+        return float(self.x[1]) if self.initialized else 0.0
+
+    def reset(self, bpm=None, t=0.0, confidence=1.0):
+        """Forget the state; with a bpm, restart from that reading."""
+        self.initialized = bpm is not None
+        self.t = t
+        self.x = np.array([bpm or 0.0, 0.0])
+        # drift starts unknown (+-0.5 BPM/s), tempo as uncertain as the reading
+        self.P = np.diag([self._measurement_var(confidence), 0.25])
+        self.outliers = []
+
+    def _measurement_var(self, confidence):
+        std = self.measurement_std / min(1.0, max(0.1, confidence))
+        return std * std
+
+    def update(self, bpm, confidence, t, lag=0.0):
+        """
+        Add a reading taken at time t.
+
+        Args:
+            bpm: Measured tempo
+            confidence: Quality of the reading, 0.0-1.0 (lower = trusted less)
+            t: Time of the reading in seconds (monotonic, e.g. audio seconds)
+            lag: Seconds before t that the reading describes (half its analysis window)
+
+        Returns:
+            Filtered tempo in BPM
+        """
+        if not self.initialized:
+            self.reset(bpm, t, confidence)
+            return self.bpm
+
+        # Predict: drift decaying towards zero, with white noise on the drift rate
+        dt = max(0.0, t - self.t)
+        self.t = t
+        F = np.array([[1.0, dt], [0.0, np.exp(-dt / self.drift_decay)]])
+        q = self.drift_noise
+        Q = q * np.array([[dt ** 3 / 3.0, dt ** 2 / 2.0], [dt ** 2 / 2.0, dt]])
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + Q
+
+        # The reading observes the tempo `lag` seconds ago: H = [1, -lag]
+        H = np.array([1.0, -lag])
+        innovation = bpm - H @ self.x
+        if abs(innovation) > self.jump * self.x[0]:
+            # Possible track change (or an octave error): wait for it to repeat
+            if self.outliers and abs(bpm - self.outliers[-1]) > self.jump * bpm:
+                self.outliers = []
+            self.outliers.append(bpm)
+            if len(self.outliers) >= self.jump_confirm:
+                self.reset(bpm, t, confidence)
+            return self.bpm
+        self.outliers = []
+
+        # Correct
+        PH = self.P @ H
+        S = H @ PH + self._measurement_var(confidence)
+        K = PH / S
+        self.x = self.x + K * innovation
+        self.P = self.P - np.outer(K, PH)
+        return self.bpm
+
 
 class BaseBeatDetector(threading.Thread, ABC):
     """
     Abstract base class for beat detection implementations.
-    
+
     Subclasses must implement:
     - run(): Main thread loop for audio processing
     - stop(): Signal the thread to stop
     - bpm (property): Current BPM estimate
+
+    Subclasses should also set `confidence` (0.0-1.0) before each BPM update,
+    so listeners see the quality of the estimate they are notified about, and
+    call record_estimate() after each update for the overlay graph (and the
+    `timeline`, a timeline.TimelineWriter, and `shared_state`, a
+    shared_state.SlotPublisher, if attached).
+
+    An external tempo reference (e.g. a MIDIClockReceiver, anything with a
+    `bpm` attribute and `is_locked()`) can be assigned to `reference`.
+    Detectors may use it to seed or skip their analysis.
+
+    Raw readings should go through set_estimate(), which smooths them with the
+    shared TempoFilter and sets `confidence` and `bpm` in the right order.
     """
 
     def __init__(self, input_device_index=None):
         super().__init__()
         self.input_device_index = input_device_index
         self._bpm = 0.0
+        self._confidence = 0.0
+        self._bpm_listeners = []
+        self.history = HistoryBuffer()
+        self.timeline = None
+        self.shared_state = None
+        self.reference = None
+        self.tempo_filter = TempoFilter()
         self.running = False
+        # Set when the audio device is gone (open failed or reads keep failing);
+        # the device monitor then re-attaches the slot once the device is back
+        self.failed = False
 
     @property
     def bpm(self) -> float:
@@ -27,7 +176,101 @@ class BaseBeatDetector(threading.Thread, ABC):
 
     @bpm.setter
     def bpm(self, value: float):
+        changed = value != self._bpm
         self._bpm = value
+        if changed:
+            self._notify_bpm_listeners(value)
+
+    @property
+    def confidence(self) -> float:
+        """Quality of the current estimate, 0.0 (unreliable/stale) to 1.0 (locked)."""
+        return self._confidence
+
+    @confidence.setter
+    def confidence(self, value: float):
+        self._confidence = min(1.0, max(0.0, float(value)))
+
+    def add_bpm_listener(self, callback):
+        """
+        Register a callback invoked with the new BPM whenever the estimate changes.
+
+        Callbacks run on the detector thread, so they must be quick and thread-safe.
+        """
+        if callback not in self._bpm_listeners:
+            self._bpm_listeners.append(callback)
+
+    def remove_bpm_listener(self, callback):
+        """Unregister a callback previously added with add_bpm_listener()."""
+        try:
+            self._bpm_listeners.remove(callback)
+        except ValueError:
+            pass
+
+    def _notify_bpm_listeners(self, bpm):
+        # iterate over a copy so listeners may unsubscribe from inside the callback
+        for callback in list(self._bpm_listeners):
+            try:
+                callback(bpm)
+            except Exception:
+                logging.exception("BPM listener failed")
+
+    def record_estimate(self):
+        """Record the current estimate in `history` and the timeline. Called from the detector thread."""
+        now = time.time()
+        self.history.append(now, self.bpm, self.confidence)
+        if self.timeline is not None:
+            self.timeline.estimate(now, self.bpm, self.confidence)
+        if self.shared_state is not None:
+            self.shared_state.publish(self.bpm, self.confidence, getattr(self, 'sample_rate', 0))
+
+    def record_beats(self, ages):
+        """
+        Log detected beats to the timeline and publish the latest one, if attached.
+
+        Args:
+            ages: Seconds from each beat to now, oldest first; beats already logged are skipped
+        """
+        if self.timeline is None and self.shared_state is None:
+            return
+        ages = np.asarray(ages)
+        times = time.time() - ages
+        if self.timeline is not None:
+            self.timeline.beats(times, self.bpm, self.confidence)
+        if self.shared_state is not None and len(ages):
+            rate = getattr(self, 'sample_rate', 0)
+            self.shared_state.publish(self.bpm, self.confidence, rate, beat_time=times[-1],
+                                      beat_sample=getattr(self, 'stream_position', 0) - ages[-1] * rate)
+
+    def set_estimate(self, raw_bpm, confidence, t, lag=0.0, smooth=True):
+        """
+        Publish a new reading: filter it, then set confidence and BPM.
+
+        Args:
+            raw_bpm: Measured tempo
+            confidence: Quality of the reading, 0.0-1.0
+            t: Time of the reading in seconds of audio
+            lag: Seconds before t that the reading describes (half its analysis window)
+            smooth: False to restart the filter at this reading (e.g. after a
+                    confirmed tempo change) instead of filtering it
+        """
+        if smooth:
+            bpm = self.tempo_filter.update(raw_bpm, confidence, t, lag)
+        else:
+            self.tempo_filter.reset(raw_bpm, t, confidence)
+            bpm = raw_bpm
+        # Set before the BPM so BPM listeners see the matching confidence
+        self.confidence = confidence
+        self.bpm = round(bpm, 1)
+
+    def reference_bpm(self) -> float:
+        """BPM of the external reference while it is locked, else 0.0."""
+        ref = self.reference
+        if ref is None:
+            return 0.0
+        try:
+            return float(ref.bpm) if ref.is_locked() else 0.0
+        except Exception:
+            return 0.0
 
     @abstractmethod
     def run(self):
@@ -38,3 +281,313 @@ class BaseBeatDetector(threading.Thread, ABC):
     def stop(self):
         """Signal the thread to stop - must be implemented by subclass."""
         pass
+
+
+class AnalysisTiming:
+    """
+    Cost of one kind of periodic analysis of a detector, against its budget.
+
+    Only the thread running that kind of analysis updates it.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.average = 0.0          # moving average of one analysis, seconds
+        self.count = 0
+        self.overruns = 0
+        self.delay = 0.0            # extra seconds of audio before the next analysis (after an overrun)
+
+    def add(self, elapsed, interval):
+        """
+        Account one analysis.
+
+        Args:
+            elapsed: Seconds it took
+            interval: Seconds of audio between analyses of this kind
+
+        Returns:
+            True if it exceeded its budget (ANALYSIS_BUDGET of the interval)
+        """
+        self.count += 1
+        self.average = elapsed if self.count == 1 else 0.8 * self.average + 0.2 * elapsed
+        # keep this kind's average share of the CPU at the budget: the next analysis comes
+        # average / ANALYSIS_BUDGET after this one instead of one interval (a one-off
+        # stall barely moves the average; its backlog is handled by the stale check)
+        self.delay = max(0.0, self.average / ANALYSIS_BUDGET - interval)
+        if elapsed > ANALYSIS_BUDGET * interval:
+            self.overruns += 1
+            return True
+        return False
+
+
+class AudioStreamDetector(BaseBeatDetector):
+    """
+    Base for detectors that analyse blocks of float32 samples.
+
+    Audio comes either from its own PyAudio stream on input_device_index
+    (opened at the device's native rate), or from a shared capture `source`
+    (see capture.py) delivering one channel of a device.
+
+    The stream is opened lazily in run(), on the detector thread, and released
+    there when the loop ends.
+
+    Subclasses set `sample_rate`, `buffer_size` and `channels`, and implement:
+    - set_sample_rate(rate): switch rate and resize buffers before capture starts
+    - process_samples(samples): consume one block (runs on the detector thread)
+
+    Overload policy: before each periodic analysis, subclasses check
+    analysis_allowed() and run the analysis inside measure_analysis(). While
+    more than MAX_INPUT_AGE seconds of input wait to be read, due analyses are
+    skipped (blocks are still stored), so the backlog drains quickly and the
+    next analysis sees the freshest window. Each kind of analysis (e.g. the
+    full update and the cheaper fast-lock pass, which run at different
+    intervals) has its own AnalysisTiming: one taking longer than
+    ANALYSIS_BUDGET of its interval on average sets that kind's `delay`, the
+    extra seconds of audio to wait before its next run. get_stats() exposes the counters.
+
+    CPU budget: `cpu_time` accumulates the thread CPU seconds spent in
+    process_samples(), which the governor (governor.py) samples per slot.
+    Detectors offering cheaper settings override `quality_levels` and
+    set_quality(); level 0 is always the best.
+
+    Recording: with a `recorder` attached (recorder.SessionRecorder), every
+    block is also written to its ring file before it is analysed, together
+    with `stream_position`, the samples read from the input so far.
+    """
+
+    quality_levels = 1
+
+    def __init__(self, input_device_index=None, source=None):
+        super().__init__(input_device_index)
+        self.source = source
+        self.format = pyaudio.paFloat32
+        self.pa = None
+        self.stream = None
+        
+        # Overload policy state and counters
+        self.backlog = 0.0          # seconds of input waiting to be read after the current block
+        self.timings = {}           # AnalysisTiming by analysis kind
+        self.stale_skips = 0
+        self._skipping = False
+        self.cpu_time = 0.0         # thread CPU seconds spent in process_samples()
+        self.quality = 0
+        self.recorder = None
+        self.stream_position = 0    # samples read from the input, up to the end of the current block
+
+    @abstractmethod
+    def set_sample_rate(self, rate):
+        pass
+
+    @abstractmethod
+    def process_samples(self, samples):
+        pass
+
+    def set_quality(self, level):
+        """Switch to a quality level (0 = best, up to quality_levels - 1); one level by default."""
+        pass
+
+    def _process_measured(self, samples):
+        if self.recorder is not None:
+            self.recorder.write(samples, self.stream_position, self.sample_rate)
+        start = time.thread_time()
+        try:
+            self.process_samples(samples)
+        finally:
+            self.cpu_time += time.thread_time() - start
+
+    def analysis_allowed(self):
+        """
+        Check whether a due analysis should run now.
+
+        Returns:
+            False while the input is stale (a backlog older than MAX_INPUT_AGE);
+            the analysis stays due and runs on the first fresh block
+        """
+        if self.backlog > MAX_INPUT_AGE:
+            if not self._skipping:
+                self._skipping = True
+                self.stale_skips += 1
+                if DEBUG:
+                    print(f"[{self.__class__.__name__}] {self.backlog:.2f}s behind, skipping analysis")
+            return False
+        self._skipping = False
+        return True
+
+    def timing(self, kind):
+        """AnalysisTiming of one kind of analysis (created on first use)."""
+        timing = self.timings.get(kind)
+        if timing is None:
+            timing = self.timings[kind] = AnalysisTiming(kind)
+        return timing
+
+    @contextlib.contextmanager
+    def measure_analysis(self, interval, kind='update'):
+        """
+        Time the analysis run inside the block against the budget of its kind.
+
+            with self.measure_analysis(UPDATE_INTERVAL) as timing:
+                ...
+            self.samples_since_update = -int(timing.delay * self.sample_rate)
+
+        Args:
+            interval: Seconds of audio between analyses of this kind
+            kind: Analysis kind; each has its own average, budget and delay
+
+        Yields:
+            The kind's AnalysisTiming, updated when the block ends
+        """
+        timing = self.timing(kind)
+        start = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            elapsed = time.perf_counter() - start
+            if timing.add(elapsed, interval) and DEBUG:
+                print(f"[{self.__class__.__name__}] {kind} analysis took {elapsed * 1000:.0f} ms "
+                      f"(budget {ANALYSIS_BUDGET * interval * 1000:.0f} ms)")
+
+    @property
+    def analyses(self):
+        return sum(t.count for t in list(self.timings.values()))
+
+    @property
+    def overruns(self):
+        return sum(t.overruns for t in list(self.timings.values()))
+
+    def get_stats(self):
+        """
+        Get the overload counters.
+
+        Returns:
+            Dict with analyses, overruns (totals of all kinds), stale_skips,
+            analysis_ms (moving average of the full 'update' analysis),
+            analysis_ms_by_kind, backlog_ms, dropped_blocks (shared capture
+            only), cpu_seconds and quality
+        """
+        return {
+            'analyses': self.analyses,
+            'overruns': self.overruns,
+            'stale_skips': self.stale_skips,
+            'analysis_ms': self.timing('update').average * 1000.0,
+            'analysis_ms_by_kind': {kind: t.average * 1000.0 for kind, t in list(self.timings.items())},
+            'backlog_ms': self.backlog * 1000.0,
+            'dropped_blocks': getattr(self.source, 'dropped', 0),
+            'cpu_seconds': self.cpu_time,
+            'quality': self.quality,
+        }
+
+    def run(self):
+        """Main thread loop - capture audio and hand each block to process_samples()."""
+        self.running = True
+        if self.source is not None:
+            self._run_shared()
+            return
+        try:
+            self._run_stream()
+        finally:
+            # Released on the detector thread as soon as the loop ends, so stop() + join() frees the device
+            self._cleanup()
+
+    def _run_stream(self):
+        """Open our own stream (lazily, on the detector thread) and read until stopped."""
+        self.pa = pyaudio.PyAudio()
+        
+        # Get device info to check native sample rate
+        if self.input_device_index is not None:
+            device_info = self.pa.get_device_info_by_index(self.input_device_index)
+            native_rate = int(device_info.get('defaultSampleRate', 44100))
+            
+            # Update sample rate to match device native rate (avoid resampling artifacts)
+            if native_rate != self.sample_rate:
+                if DEBUG:
+                    print(f"[{self.__class__.__name__}] Switching to native device rate: {native_rate} (was {self.sample_rate})")
+                # Let the subclass resize its buffers for the new rate
+                self.set_sample_rate(native_rate)
+            elif DEBUG:
+                print(f"[{self.__class__.__name__}] Device rate matches default: {self.sample_rate}")
+        
+        try:
+            self.stream = self.pa.open(
+                format=self.format,
+                channels=self.channels,
+                rate=self.sample_rate,
+                input=True,
+                input_device_index=self.input_device_index,
+                frames_per_buffer=self.buffer_size,
+            )
+        except Exception as e:
+            print(f"[{self.__class__.__name__}] Error opening audio stream: {e}")
+            self.running = False
+            self.failed = True
+            return
+        
+        if DEBUG:
+            print(f"[{self.__class__.__name__}] Started on device {self.input_device_index} at {self.sample_rate} Hz")
+        
+        read_errors = 0
+        while self.running:
+            try:
+                # Read audio chunk
+                audio_data = self.stream.read(self.buffer_size, exception_on_overflow=False)
+                samples = np.frombuffer(audio_data, dtype=np.float32)
+                read_errors = 0
+                self.stream_position += len(samples)
+                self.backlog = self.stream.get_read_available() / self.sample_rate
+                self._process_measured(samples)
+                    
+            except Exception as e:
+                if self.running:
+                    print(f"[{self.__class__.__name__}] Error reading audio: {e}")
+                    read_errors += 1
+                    if read_errors >= MAX_READ_ERRORS:
+                        # Device most likely unplugged; leave it to the device monitor
+                        print(f"[{self.__class__.__name__}] Giving up on audio device")
+                        self.failed = True
+                        self.running = False
+                        break
+                    time.sleep(0.1)
+
+    def _run_shared(self):
+        """Consume one channel of a shared capture (or a file source) until stopped or finished."""
+        if self.source.sample_rate != self.sample_rate:
+            self.set_sample_rate(self.source.sample_rate)
+        if DEBUG:
+            print(f"[{self.__class__.__name__}] Started on shared capture channel {self.source.channel} at {self.sample_rate} Hz")
+        
+        try:
+            while self.running:
+                samples = self.source.read(timeout=0.5)
+                if samples is None:
+                    if self.source.failed:
+                        print(f"[{self.__class__.__name__}] Shared capture failed")
+                        self.failed = True
+                        self.running = False
+                    elif self.source.finished:
+                        self.running = False
+                    continue
+                # a capture subscription counts dropped blocks in its position
+                self.stream_position = getattr(self.source, 'position', self.stream_position + len(samples))
+                self.backlog = self.source.backlog()
+                self._process_measured(samples)
+        finally:
+            self.source.close()
+
+    def _cleanup(self):
+        """Clean up audio resources (safe to call more than once)."""
+        stream, self.stream = self.stream, None
+        pa, self.pa = self.pa, None
+        if stream:
+            try:
+                stream.stop_stream()
+                stream.close()
+            except Exception:
+                pass
+        if pa:
+            try:
+                pa.terminate()
+            except Exception:
+                pass
+
+    def stop(self):
+        """Signal the thread to stop."""
+        self.running = False
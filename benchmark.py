@@ -0,0 +1,1088 @@
+"""
+Benchmarks and stress runs for the BPM overlay.
+
+Each benchmark is a subcommand, e.g.:
+
+    python benchmark.py midi-router --ports 8 --bpm 180 --duration 10
+    python benchmark.py memory --slots 16 --rate 48000
+    python benchmark.py analysis-plan --rates 44100,48000,96000
+    python benchmark.py detectors --seconds 20
+    python benchmark.py fast-lock --changes 128:140,140:110,174:128
+    python benchmark.py tempo-filter --bpm 124
+    python benchmark.py batch --slots 1,2,4,8,16,32
+    python benchmark.py overload --load 2.5 --stall 5
+    python benchmark.py governor --slots 8 --budget 40 --spike 2
+    python benchmark.py timeline --hours 8
+    python benchmark.py shared-state --seconds 3
+    python benchmark.py graph --slots 8 --fps 10,60
+    python benchmark.py overlay --slots 16
+    python benchmark.py file track.wav --backend aubio --expect 128
+    python benchmark.py replay recordings/slot0.bpmrec --expect 128
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+
+class FakeMidiPort:
+    """In-memory MIDI output port that timestamps every message it is sent."""
+
+    def __init__(self, name):
+        self.name = name
+        self.clock_times = []
+        self.messages = []
+
+    def send(self, message):
+        if message.type == 'clock':
+            self.clock_times.append(time.perf_counter())
+        else:
+            self.messages.append(message.type)
+
+    def close(self):
+        pass
+
+
+class FakeDetector:
+    """Minimal stand-in for a beat detector with a fixed BPM."""
+
+    def __init__(self, bpm):
+        self.bpm = bpm
+        self._listeners = []
+
+    def add_bpm_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_bpm_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+
+def bench_midi_router(args):
+    """
+    Drive N fake ports from one MIDIClockRouter and report pulse timing per port.
+
+    Exits 1 when a port's pulse interval jitter (std), worst lateness or
+    average tempo is beyond the given limits, so it can gate a change.
+    """
+    from midi_clock import MIDIClockRouter
+
+    router = MIDIClockRouter()
+    ports = []
+    for i in range(args.ports):
+        port = FakeMidiPort(f"fake-{i}")
+        router.add_route(port.name, detector=FakeDetector(args.bpm), port=port, slot=i)
+        ports.append(port)
+
+    router.start()
+    time.sleep(args.duration)
+    stats = router.get_stats()
+    router.close()
+
+    expected = 60.0 / (args.bpm * 24.0)
+    print(f"MIDI router: {args.ports} ports at {args.bpm} BPM for {args.duration}s "
+          f"(expected pulse interval {expected * 1000:.3f} ms)")
+    print(f"{'port':<10} {'pulses':>7} {'bpm':>8} {'late mean':>10} {'late std':>9} {'late max':>9} {'ivl std':>8}")
+    failed = []
+    for port in ports:
+        s = stats[port.name]
+        intervals = np.diff(port.clock_times)
+        measured_bpm = 60.0 / (np.mean(intervals) * 24.0) if len(intervals) else 0.0
+        interval_std = np.std(intervals) * 1000.0 if len(intervals) else 0.0
+        problems = []
+        if abs(measured_bpm - args.bpm) > args.max_bpm_error:
+            problems.append("tempo")
+        if interval_std > args.max_std_ms:
+            problems.append("jitter")
+        if s['max_ms'] > args.max_late_ms:
+            problems.append("late")
+        if problems:
+            failed.append(port.name)
+        print(f"{port.name:<10} {len(port.clock_times):>7} {measured_bpm:>8.2f} {s['mean_ms']:>8.3f}ms "
+              f"{s['std_ms']:>7.3f}ms {s['max_ms']:>7.3f}ms {interval_std:>6.3f}ms  {' '.join(problems) or 'OK'}")
+
+    verdict = f"{len(failed)} of {len(ports)} port(s) FAIL" if failed else "OK"
+    print(f"limits: interval std {args.max_std_ms} ms, lateness {args.max_late_ms} ms, "
+          f"tempo +-{args.max_bpm_error} BPM: {verdict}")
+    if failed:
+        sys.exit(1)
+
+
+def click_track(bpm, seconds, sample_rate, noise=0.05, seed=0):
+    """Synthetic test signal: decaying noise bursts on every beat plus background noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    clicks = rng.standard_normal(len(t)) * np.exp(-(t % (60.0 / bpm)) * 40.0)
+    return (0.3 * clicks + noise * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def drum_loop(bpm, seconds, sample_rate, seed=0):
+    """Synthetic dance loop: kick on every beat, hi-hat on eighths, snare on 2 and 4."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sample_rate)
+    t = np.arange(n) / sample_rate
+    period = 60.0 / bpm
+    y = np.sin(2 * np.pi * 55.0 * t) * np.exp(-(t % period) * 20.0)
+    y += 0.2 * rng.standard_normal(n) * np.exp(-(t % (period / 2)) * 80.0)
+    y += 0.4 * rng.standard_normal(n) * np.exp(-((t + period) % (2 * period)) * 25.0)
+    return (0.3 * y + 0.02 * rng.standard_normal(n)).astype(np.float32)
+
+
+def ramp_loop(points, sample_rate, noise=0.02, seed=0):
+    """
+    Drum loop whose tempo moves linearly between (seconds, bpm) points, like a pitch fader.
+
+    Returns:
+        Tuple (audio, tempo) where tempo(t) gives the true BPM at t seconds
+    """
+    times = [p[0] for p in points]
+    bpms = [p[1] for p in points]
+    tempo = lambda t: np.interp(t, times, bpms)
+    rng = np.random.default_rng(seed)
+    n = int(times[-1] * sample_rate)
+    t = np.arange(n) / sample_rate
+    # beat phase is the integral of the tempo
+    beats = np.cumsum(tempo(t)) / (60.0 * sample_rate)
+    period = 60.0 / tempo(t)
+    since = (beats % 1.0) * period
+    since_eighth = (beats % 0.5) * period
+    since_snare = ((beats + 1.0) % 2.0) * period
+    y = np.sin(2 * np.pi * 55.0 * t) * np.exp(-since * 20.0)
+    y += 0.2 * rng.standard_normal(n) * np.exp(-since_eighth * 80.0)
+    y += 0.4 * rng.standard_normal(n) * np.exp(-since_snare * 25.0)
+    return (0.3 * y + noise * rng.standard_normal(n)).astype(np.float32), tempo
+
+
+def _rss_bytes():
+    """Current resident set size, or None if it can't be read on this platform."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def _peak_rss_bytes():
+    """Peak resident set size of this process, or None if unavailable."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset
+    except (ImportError, AttributeError):
+        return None
+
+
+def _memory_worker(dtype, slots, rate, seconds, result):
+    """Runs in a fresh process so peak RSS only covers this configuration."""
+    from librosa_beat_detector import LibrosaBeatDetector
+    import librosa
+    audio = click_track(128.0, seconds, rate)
+    # warm up librosa/numba so their one-off allocations are part of the baseline
+    warm = LibrosaBeatDetector(history_dtype=dtype)
+    warm.set_sample_rate(rate)
+    warm.process_samples(audio[:warm.update_samples])
+    librosa.beat.beat_track(onset_envelope=np.zeros(100, dtype=np.float32), sr=rate)
+    del warm
+    baseline = _rss_bytes()
+
+    detectors = []
+    for _ in range(slots):
+        bd = LibrosaBeatDetector(history_dtype=dtype)
+        bd.set_sample_rate(rate)
+        detectors.append(bd)
+    start = time.perf_counter()
+    for i in range(0, len(audio), 1024):
+        for bd in detectors:
+            bd.process_samples(audio[i:i + 1024])
+    elapsed = time.perf_counter() - start
+
+    current, peak = _rss_bytes(), _peak_rss_bytes()
+    result.put({
+        'dtype': dtype,
+        'estimate': detectors[0].estimate_memory(),
+        'slot_rss': (current - baseline) / slots if current and baseline else None,
+        'peak_rss': peak,
+        'bpm': detectors[0].bpm,
+        'realtime': seconds * slots / elapsed,
+    })
+
+
+def bench_memory(args):
+    """Per-slot memory of LibrosaBeatDetector for each history dtype, each in its own process."""
+    ctx = multiprocessing.get_context('spawn')
+    mb = 1024.0 * 1024.0
+    print(f"Memory: {args.slots} slots at {args.rate} Hz, {args.seconds}s of audio each")
+    print(f"{'dtype':<8} {'estimate':>9} {'RSS/slot':>9} {'peak RSS':>9} {'bpm':>6} {'x realtime':>10}")
+    for dtype in args.dtypes.split(','):
+        result = ctx.Queue()
+        proc = ctx.Process(target=_memory_worker, args=(dtype, args.slots, args.rate, args.seconds, result))
+        proc.start()
+        r = result.get()
+        proc.join()
+        slot_rss = f"{r['slot_rss'] / mb:7.2f}MB" if r['slot_rss'] is not None else f"{'n/a':>9}"
+        peak = f"{r['peak_rss'] / mb:7.1f}MB" if r['peak_rss'] is not None else f"{'n/a':>9}"
+        print(f"{r['dtype']:<8} {r['estimate'] / mb:7.2f}MB {slot_rss} {peak} {r['bpm']:>6.1f} {r['realtime']:>10.1f}")
+
+
+def _mean_ms(func, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) * 1000.0 / repeats
+
+
+def bench_analysis_plan(args):
+    """Per-update onset strength cost: plain librosa vs. the cached, banded AnalysisPlan."""
+    import librosa
+    import librosa_beat_detector as lbd
+    from analysis_plan import get_plan
+
+    print(f"Onset strength per update ({lbd.BUFFER_DURATION}s buffer, hop {lbd.HOP_LENGTH}, fmax {lbd.FMAX:.0f} Hz), "
+          f"mean of {args.updates} updates")
+    print(f"{'rate':>6} {'librosa':>9} {'plan cold':>10} {'plan':>8} {'saving':>7} "
+          f"{'mel dense':>10} {'mel band':>9} {'bins used':>10}")
+    for rate in (int(r) for r in args.rates.split(',')):
+        bd = lbd.LibrosaBeatDetector()
+        bd.set_sample_rate(rate)
+        bd.process_samples(click_track(128.0, lbd.BUFFER_DURATION, rate))
+        y = bd._read_window(0, np.zeros(bd.buffer_samples, dtype=np.float32))
+
+        def librosa_update():
+            librosa.onset.onset_strength(y=y, sr=rate, hop_length=lbd.HOP_LENGTH, fmax=lbd.FMAX,
+                                         center=lbd.CENTER, detrend=lbd.DETREND)
+
+        librosa_update()  # warm up librosa's own caches
+        librosa_ms = _mean_ms(librosa_update, args.updates)
+
+        get_plan.cache_clear()
+        cold_ms = _mean_ms(bd._onset_strength, 1)
+        plan_ms = _mean_ms(bd._onset_strength, args.updates)
+
+        # mel projection alone, full filterbank vs. the plan's band
+        plan = bd.plan
+        full = librosa.filters.mel(sr=rate, n_fft=lbd.N_FFT, n_mels=lbd.N_MELS, fmax=lbd.FMAX).astype(np.float32)
+        power = np.random.default_rng(0).random((bd.n_frames, plan.n_bins), dtype=np.float32)
+        band = np.ascontiguousarray(power[:, plan.bin_lo:plan.bin_hi])
+        dense_ms = _mean_ms(lambda: power @ full.T, args.updates)
+        band_ms = _mean_ms(lambda: band @ plan.mel_band_t, args.updates)
+
+        print(f"{rate:>6} {librosa_ms:>7.2f}ms {cold_ms:>8.2f}ms {plan_ms:>6.2f}ms {1 - plan_ms / librosa_ms:>6.0%} "
+              f"{dense_ms:>8.2f}ms {band_ms:>7.2f}ms {plan.band_bins:>5}/{plan.n_bins}")
+
+
+def _run_detector(detector, audio, block=1024):
+    """Feed audio through process_samples(); returns CPU seconds used."""
+    start = time.process_time()
+    for i in range(0, len(audio), block):
+        detector.process_samples(audio[i:i + block])
+    return time.process_time() - start
+
+
+def bench_detectors(args):
+    """CPU time and accuracy of the librosa and streaming detectors on synthetic loops."""
+    from librosa_beat_detector import LibrosaBeatDetector
+    import streaming_beat_detector as sbd
+
+    backends = [('librosa', lambda: LibrosaBeatDetector())]
+    if sbd.HAVE_NUMBA:
+        backends.append(('streaming/numba', lambda: sbd.StreamingBeatDetector(use_numba=True)))
+    backends.append(('streaming/numpy', lambda: sbd.StreamingBeatDetector(use_numba=False)))
+    # JIT compilation (librosa's and ours, or loading the on-disk cache) happens outside the measurement
+    for _, factory in backends:
+        warm = factory()
+        warm.set_sample_rate(args.rate)
+        _run_detector(warm, click_track(120.0, 10.0, args.rate))
+
+    print(f"Detectors: {args.seconds}s per signal at {args.rate} Hz; CPU is % of one core in real time")
+    print(f"{'backend':<16} {'signal':<10} {'true':>6} {'bpm':>6} {'error':>6} {'conf':>5} {'cpu':>6}")
+    for name, factory in backends:
+        errors, cpu = [], []
+        for bpm in (int(b) for b in args.bpms.split(',')):
+            for signal, audio in (('clicks', click_track(bpm, args.seconds, args.rate)),
+                                  ('drums', drum_loop(bpm, args.seconds, args.rate))):
+                bd = factory()
+                bd.set_sample_rate(args.rate)
+                seconds = _run_detector(bd, audio)
+                errors.append(abs(bd.bpm - bpm))
+                cpu.append(seconds / args.seconds)
+                print(f"{name:<16} {signal:<10} {bpm:>6} {bd.bpm:>6.1f} {bd.bpm - bpm:>+6.1f} "
+                      f"{bd.confidence:>5.2f} {seconds / args.seconds:>6.1%}")
+        within = sum(e <= 0.5 for e in errors)
+        print(f"{name:<16} {'total':<10} {within}/{len(errors)} within 0.5 BPM, mean CPU {np.mean(cpu):.1%}\n")
+
+
+def _lock_times(detector, audio, cut, target, block=1024, settle=0.5):
+    """
+    Feed audio and time the readings after the tempo change at sample `cut`.
+
+    Returns:
+        Tuple (seconds to the first reading within 2% of target, seconds until
+        the reading stays within `settle` BPM); None where never reached
+    """
+    first = settled = None
+    for i in range(0, len(audio), block):
+        detector.process_samples(audio[i:i + block])
+        after = (i + block - cut) / detector.sample_rate
+        if after <= 0:
+            continue
+        if first is None and abs(detector.bpm - target) <= 0.02 * target:
+            first = after
+        if abs(detector.bpm - target) <= settle:
+            settled = after if settled is None else settled
+        else:
+            settled = None
+    return first, settled
+
+
+def bench_fast_lock(args):
+    """Time to a plausible BPM after a hard cut between two loops, with and without fast lock."""
+    from librosa_beat_detector import LibrosaBeatDetector
+
+    print(f"Fast lock: {args.before:.0f}s of loop A, then a hard cut to loop B for {args.after:.0f}s at {args.rate} Hz")
+    print(f"{'change':<12} {'fast_lock':<10} {'first':>8} {'settled':>8} {'final':>7}")
+    fmt = lambda t: f"{t:>7.1f}s" if t is not None else f"{'never':>8}"
+    for change in args.changes.split(','):
+        a, b = (float(x) for x in change.split(':'))
+        cut = int(args.before * args.rate)
+        audio = np.concatenate([drum_loop(a, args.before, args.rate),
+                                drum_loop(b, args.after, args.rate, seed=1)])
+        for fast_lock in (False, True):
+            bd = LibrosaBeatDetector(fast_lock=fast_lock)
+            bd.set_sample_rate(args.rate)
+            first, settled = _lock_times(bd, audio, cut, b)
+            print(f"{change:<12} {str(fast_lock):<10} {fmt(first)} {fmt(settled)} {bd.bpm:>7.1f}")
+
+
+def bench_tempo_filter(args):
+    """Displayed-BPM error on tempo ramps: the shared TempoFilter vs. the former fixed EMA (alpha 0.6)."""
+    from beat_detector_base import TempoFilter
+    from librosa_beat_detector import LibrosaBeatDetector
+    from streaming_beat_detector import StreamingBeatDetector
+
+    # steady, slow fader move up, steady, quick move back down, steady
+    base = args.bpm
+    points = [(0, base), (20, base), (50, base * 1.05), (70, base * 1.05), (75, base * 1.02), (100, base * 1.02)]
+    # steady sections, once the analysis window holds only the new tempo
+    steady = [(12, 20), (62, 70), (88, 100)]
+
+    print(f"Tempo filter: drum loop {base:.0f} -> {base * 1.05:.1f} -> {base * 1.02:.1f} BPM at {args.rate} Hz; "
+          f"errors against the true tempo when shown, from 12 s")
+    print(f"{'backend':<10} {'noise':>5} {'smoothing':<9} {'rms err':>8} {'max err':>8} {'steady':>7}")
+    for noise in (float(n) for n in args.noise.split(',')):
+        audio, tempo = ramp_loop(points, args.rate, noise=noise)
+        for name, cls in (('librosa', LibrosaBeatDetector), ('streaming', StreamingBeatDetector)):
+            bd = cls()
+            bd.set_sample_rate(args.rate)
+            # record the raw readings, then smooth the same readings both ways
+            readings = []
+            publish = bd.set_estimate
+            def record(raw_bpm, confidence, t, lag=0.0, smooth=True, publish=publish):
+                readings.append((t, raw_bpm, confidence, lag))
+                publish(raw_bpm, confidence, t, lag, smooth)
+            bd.set_estimate = record
+            _run_detector(bd, audio)
+
+            ema, kalman, tempo_filter = [], [], TempoFilter()
+            for t, raw_bpm, confidence, lag in readings:
+                ema.append(raw_bpm if not ema else ema[-1] * 0.4 + raw_bpm * 0.6)
+                kalman.append(tempo_filter.update(raw_bpm, confidence, t, lag))
+            times = np.array([r[0] for r in readings])
+            keep = times >= 12
+            in_steady = np.any([(times >= a) & (times < b) for a, b in steady], axis=0)
+            for label, shown in (('ema', ema), ('kalman', kalman)):
+                error = np.array(shown) - tempo(times)
+                print(f"{name:<10} {noise:>5.2f} {label:<9} {np.sqrt(np.mean(error[keep] ** 2)):>8.2f} "
+                      f"{np.abs(error[keep]).max():>8.2f} {np.abs(error[in_steady]).mean():>7.2f}")
+
+
+def bench_batch(args):
+    """Tempo-stage throughput of the streaming detector: one thread per slot vs. one batched call."""
+    import threading
+    import streaming_beat_detector as sbd
+
+    # realistic envelopes: run each slot's detector over a loop once
+    bpms = [90, 110, 124, 128, 140, 174]
+    slot_counts = [int(n) for n in args.slots.split(',')]
+    detectors, envs = [], []
+    for i in range(max(slot_counts)):
+        bd = sbd.StreamingBeatDetector(use_numba=False if args.numpy else None)
+        bd.set_sample_rate(args.rate)
+        _run_detector(bd, drum_loop(bpms[i % len(bpms)], sbd.ONSET_DURATION + 1, args.rate, seed=i))
+        detectors.append(bd)
+        envs.append(bd.envelope())
+    # always batch here, to compare both paths at every slot count
+    analyzer = sbd.BatchTempoAnalyzer(min_slots=1)
+    # warm up the compiled kernels and FFT plans
+    detectors[0]._analyze_tempo(envs[0])
+    analyzer.analyze([(detectors[0], envs[0])])
+
+    print(f"Batched tempo stage: {args.updates} updates per slot at {args.rate} Hz, "
+          f"{'numba' if detectors[0].use_numba else 'numpy'} comb kernel per thread")
+    print(f"{'slots':>5} {'threads ms':>11} {'batch ms':>9} {'per slot':>9} {'speedup':>8}")
+    for n in slot_counts:
+        def slot_loop(i):
+            for _ in range(args.updates):
+                detectors[i]._analyze_tempo(envs[i])
+        start = time.perf_counter()
+        threads = [threading.Thread(target=slot_loop, args=(i,)) for i in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        threaded = (time.perf_counter() - start) / args.updates
+
+        pending = list(zip(detectors[:n], envs[:n]))
+        start = time.perf_counter()
+        for _ in range(args.updates):
+            analyzer.analyze(pending)
+        batched = (time.perf_counter() - start) / args.updates
+        print(f"{n:>5} {threaded * 1000:>10.2f}ms {batched * 1000:>8.2f}ms "
+              f"{batched * 1000 / n:>8.3f}ms {threaded / batched:>7.2f}x")
+
+
+class LiveSource:
+    """
+    Plays audio at real-time pace like a capture subscription: blocks become
+    available as the clock advances and queue up while the consumer is busy.
+    """
+
+    def __init__(self, samples, sample_rate, block_size=1024):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.channel = 0
+        self.position = 0
+        self.start = None
+        self.failed = False
+        self.closed = False
+
+    def _arrived(self):
+        return min(len(self.samples), int((time.perf_counter() - self.start) * self.sample_rate))
+
+    @property
+    def finished(self):
+        return self.position >= len(self.samples)
+
+    def backlog(self):
+        return max(0, self._arrived() - self.position) / self.sample_rate
+
+    def read(self, timeout=0.5):
+        if self.start is None:
+            self.start = time.perf_counter()
+        if self.finished or self.closed:
+            return None
+        end = min(len(self.samples), self.position + self.block_size)
+        while self._arrived() < end:
+            time.sleep(0.002)
+        block = self.samples[self.position:end]
+        self.position = end
+        return block
+
+    def close(self):
+        self.closed = True
+
+
+def bench_overload(args):
+    """Display lag of an overloaded librosa detector, with and without the overload policy."""
+    import beat_detector_base
+    import librosa_beat_detector
+    from librosa_beat_detector import LibrosaBeatDetector
+
+    audio = drum_loop(128, args.seconds, args.rate)
+    print(f"Overload: {args.seconds:.0f}s of live audio, {args.load:.1f}s extra work per analysis, "
+          f"one {args.stall:.1f}s stall (update interval {librosa_beat_detector.UPDATE_INTERVAL}s)")
+    print(f"{'policy':<7} {'analyses':>8} {'overruns':>8} {'stale':>6} {'mean lag':>9} {'max lag':>8}")
+    defaults = beat_detector_base.MAX_INPUT_AGE, beat_detector_base.ANALYSIS_BUDGET
+    for policy in (False, True):
+        if policy:
+            max_age, budget = defaults
+        else:
+            max_age, budget = float('inf'), float('inf')
+        beat_detector_base.MAX_INPUT_AGE = librosa_beat_detector.MAX_INPUT_AGE = max_age
+        beat_detector_base.ANALYSIS_BUDGET = budget
+
+        source = LiveSource(audio, args.rate)
+        bd = LibrosaBeatDetector(source=source, fast_lock=False)
+        # lag of a reading: input still unread when it is shown (the analysis ran on older audio)
+        lags = []
+        calculate = bd._calculate_bpm
+        def loaded_calculate(calculate=calculate, bd=bd, source=source):
+            time.sleep(args.load + (args.stall if len(lags) == 2 else 0.0))
+            calculate()
+            lags.append(source.backlog())
+        bd._calculate_bpm = loaded_calculate
+        bd.start()
+        bd.join()
+        stats = bd.get_stats()
+        print(f"{'on' if policy else 'off':<7} {stats['analyses']:>8} {stats['overruns']:>8} {stats['stale_skips']:>6} "
+              f"{np.mean(lags):>8.2f}s {np.max(lags):>7.2f}s")
+    beat_detector_base.MAX_INPUT_AGE = librosa_beat_detector.MAX_INPUT_AGE = defaults[0]
+    beat_detector_base.ANALYSIS_BUDGET = defaults[1]
+
+
+class SimulatedDetector:
+    """Detector stand-in whose CPU time grows by a given cost per quality level."""
+
+    def __init__(self, costs):
+        self.costs = costs
+        self.quality_levels = len(costs)
+        self.quality = 0
+        self.cpu_time = 0.0
+
+    def set_quality(self, level):
+        self.quality = level
+
+    def advance(self, seconds, load, rng):
+        self.cpu_time += self.costs[self.quality] * load * seconds * rng.uniform(0.9, 1.1)
+
+
+def bench_governor(args):
+    """Quality ladder of the librosa detector, then the governor on simulated slots under a load spike."""
+    import governor
+    from librosa_beat_detector import LibrosaBeatDetector, QUALITY_LEVELS
+
+    # CPU and accuracy per level, switching after a lock at level 0 as the governor does
+    print(f"Quality ladder: {args.seconds:.0f}s of drums at {args.bpm} BPM and {args.rate} Hz per level, "
+          f"after a 10s lock at level 0")
+    print(f"{'level':>5} {'hop':>5} {'decim':>5} {'window':>6} {'update':>6} {'bpm':>6} {'error':>6} {'cpu':>6}")
+    audio = drum_loop(args.bpm, 10.0 + args.seconds, args.rate)
+    lock = 10 * args.rate
+    costs = []
+    for level, settings in enumerate(QUALITY_LEVELS):
+        bd = LibrosaBeatDetector()
+        bd.set_sample_rate(args.rate)
+        _run_detector(bd, audio[:lock])
+        bd.set_quality(level)
+        cpu = _run_detector(bd, audio[lock:]) / args.seconds
+        costs.append(cpu)
+        print(f"{level:>5} {settings['hop_length']:>5} {settings['decimate']:>5} {settings['buffer_duration']:>5.0f}s "
+              f"{settings['update_interval']:>5.0f}s {bd.bpm:>6.1f} {bd.bpm - args.bpm:>+6.1f} {cpu:>6.1%}")
+
+    # Governor on a simulated clock: slot 0 feeds the MIDI clock, slots differ a little in cost
+    rng = np.random.default_rng(0)
+    now = [0.0]
+    gov = governor.QualityGovernor(args.budget / 100.0, clock=lambda: now[0])
+    slots = [SimulatedDetector([c * rng.uniform(0.8, 1.2) for c in costs]) for _ in range(args.slots)]
+    spike = (args.duration / 3, 2 * args.duration / 3)
+    print(f"\nGovernor: {args.slots} slots, budget {args.budget:.0f}% of one core, load x{args.spike:.1f} "
+          f"from {spike[0]:.0f}s to {spike[1]:.0f}s, step every {governor.GOVERNOR_INTERVAL:.0f}s, slot 0 is priority")
+    print(f"{'time':>5} {'load':>5} {'total':>6}  levels")
+    over = 0
+    priority_levels, other_levels = [], []
+    steps = int(args.duration / governor.GOVERNOR_INTERVAL)
+    gov.step(slots, priority_slots={0})
+    for _ in range(steps):
+        load = args.spike if spike[0] <= now[0] < spike[1] else 1.0
+        for d in slots:
+            d.advance(governor.GOVERNOR_INTERVAL, load, rng)
+        now[0] += governor.GOVERNOR_INTERVAL
+        # the total is measured over the window just ended; levels are the ones chosen for the next
+        total = gov.step(slots, priority_slots={0})
+        over += total > gov.budget * 1.001
+        priority_levels.append(slots[0].quality)
+        other_levels.extend(d.quality for d in slots[1:])
+        print(f"{now[0]:>4.0f}s {load:>5.1f} {total:>6.1%}  {' '.join(str(d.quality) for d in slots)}")
+    print(f"Over budget in {over}/{steps} steps; mean level: priority slot {np.mean(priority_levels):.2f}, "
+          f"others {np.mean(other_levels):.2f}")
+
+
+def bench_timeline(args):
+    """Write a synthetic multi-hour BPM timeline, then time the track report over it."""
+    import tempfile
+    import timeline
+
+    rng = np.random.default_rng(0)
+    path = os.path.join(tempfile.mkdtemp(), "slot0.bpmtl")
+    writer = timeline.TimelineWriter(path)
+    t = 1.7e9
+    end = t + args.hours * 3600
+    truth = []
+    records = 0
+    write_time = 0.0
+    while t < end:
+        # one track: a tempo, sometimes a pitch-fader move of up to 2%, beats and an estimate every 2s.
+        # Consecutive tempos differ by 7% or more: beatmatched tracks are one section by design
+        bpm = rng.uniform(85, 175)
+        while truth and abs(bpm - truth[-1]) < 0.07 * truth[-1]:
+            bpm = rng.uniform(85, 175)
+        length = rng.uniform(150, 420)
+        drift = bpm * rng.uniform(-0.02, 0.02) if rng.random() < 0.3 else 0.0
+        truth.append(bpm + drift / 2)   # the median of a linear move is its middle
+        track_end = t + length
+        while t < track_end:
+            shown = bpm + drift * (1 - (track_end - t) / length)
+            beats = t + np.arange(0, 2.0, 60.0 / shown)
+            start = time.perf_counter()
+            writer.beats(beats, shown, 0.9)
+            writer.estimate(t + 2.0, shown + rng.normal(0, 0.1), rng.uniform(0.6, 1.0))
+            write_time += time.perf_counter() - start
+            records += len(beats) + 1
+            t += 2.0
+    writer.close()
+
+    start = time.perf_counter()
+    tracks = timeline.tracks(timeline.load(path))
+    report_time = time.perf_counter() - start
+    errors = [abs(r['bpm'] - bpm) for r, bpm in zip(tracks, truth)]
+    print(f"{args.hours:g} h, {len(truth)} tracks: {records} records, {os.path.getsize(path) / 1e6:.1f} MB, "
+          f"{write_time / records * 1e6:.2f} us per record logged")
+    print(f"report: {len(tracks)} tracks found in {report_time * 1000:.0f} ms, "
+          f"median BPM within {max(errors):.2f} of the played tempo")
+    os.remove(path)
+
+
+def _shared_state_reader(name, seconds, ready, results):
+    """Reader process of bench_shared_state: read slot 0 in a loop, check every snapshot."""
+    from shared_state import SharedStateReader
+
+    reader = SharedStateReader(name)
+    ready.set()
+    latencies, delays = [], []
+    torn = 0
+    last = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        seq, values = reader.read_row(0)
+        latencies.append(time.perf_counter() - start)
+        # the benchmark writer stores one counter in bpm, beat_time, beat_sample and sample_rate
+        if not values[0] == values[4] == values[5] == values[6]:
+            torn += 1
+        if seq != last:
+            delays.append(time.time() - values[3])
+            last = seq
+    reader.close()
+    results.put({'reads': len(latencies), 'latency': np.median(latencies), 'latency_p99': np.percentile(latencies, 99),
+                 'torn': torn, 'retries': reader.retries, 'seen': len(delays),
+                 'delay': np.median(delays) if delays else float('nan')})
+
+
+def bench_shared_state(args):
+    """Seqlock state table: writer cost per update, reader latency and consistency from another process."""
+    from shared_state import SharedStateTable
+
+    name = f"bpm_bench_{os.getpid()}"
+    table = SharedStateTable(name)
+    slot = table.slot(0)
+    ctx = multiprocessing.get_context('spawn')
+    k = 0
+    print(f"Shared state table: slot 0 read by another process for {args.seconds:g}s per run")
+    try:
+        for label, rate in (("writer flat out", None), (f"writer at {args.rate:g} Hz", args.rate)):
+            ready, results = ctx.Event(), ctx.Queue()
+            reader = ctx.Process(target=_shared_state_reader, args=(name, args.seconds, ready, results))
+            reader.start()
+            ready.wait()
+            published = 0
+            busy = 0.0
+            start = time.perf_counter()
+            while reader.is_alive():
+                k += 1
+                t0 = time.perf_counter()
+                slot.publish(k, 0.9, k, beat_time=k, beat_sample=k)
+                busy += time.perf_counter() - t0
+                published += 1
+                if rate:
+                    time.sleep(max(0.0, start + published / rate - time.perf_counter()))
+            r = results.get()
+            reader.join()
+            if sys.version_info < (3, 13) and os.name == 'posix':
+                # the reader shares our resource tracker, and took the segment off it
+                from multiprocessing import resource_tracker
+                resource_tracker.register(table.shm._name, 'shared_memory')
+            print(f"{label}: {published} updates, {busy / published * 1e6:.2f} us per update; reader: "
+                  f"{r['reads']} reads, {r['latency'] * 1e6:.2f} us median ({r['latency_p99'] * 1e6:.2f} us p99), "
+                  f"{r['retries']} retries, {r['torn']} torn, saw {r['seen']} updates "
+                  f"{r['delay'] * 1e6:.0f} us after they were written")
+    finally:
+        table.close()
+        table.shm.close()
+
+
+class _HeadlessCanvas:
+    """Stands in for tk.Canvas without a display: takes the items' coordinates, draws nothing."""
+
+    def __init__(self, parent, **kwargs):
+        self.items = 0
+
+    def create_line(self, *coords, **kwargs):
+        self.items += 1
+        return self.items
+
+    create_text = create_line
+
+    def coords(self, item, coords):
+        pass
+
+    def itemconfig(self, item, **kwargs):
+        pass
+
+    def after(self, ms, func):
+        pass
+
+    def winfo_exists(self):
+        return True
+
+
+def _feed_history(history, k, onset_frames):
+    # one detector update: a reading and the onset envelope of its window
+    history.append(time.time(), 128.0 + np.sin(k / 5.0), 0.8)
+    history.set_onset(np.random.default_rng(k).random(onset_frames, dtype=np.float32))
+
+
+def _graph_cpu_tk(root, fps, slots, seconds, update, onset_frames, graphs):
+    """CPU share of the Tk process over `seconds` with fed histories, with or without graphs."""
+    import threading
+    import ui
+    from bpm_history import HistoryBuffer
+
+    stop = threading.Event()
+    histories = [HistoryBuffer() for _ in range(slots)]
+    canvases = []
+    if graphs:
+        for history in histories:
+            graph = ui.BpmGraph(root, history, stop, 'black', 'white', fps=fps)
+            graph.canvas.pack(side='left')
+            canvases.append(graph.canvas)
+
+    # detector updates, spread evenly over the slots (in the app they come from detector threads)
+    def feed(k):
+        if not stop.is_set():
+            _feed_history(histories[k % slots], k, onset_frames)
+            root.after(max(1, int(update * 1000 / slots)), feed, k + 1)
+
+    root.after(0, feed, 0)
+    root.after(int(seconds * 1000), root.quit)
+    start = time.process_time()
+    root.mainloop()
+    cpu = time.process_time() - start
+    stop.set()
+    for canvas in canvases:
+        canvas.destroy()
+    return cpu / seconds
+
+
+def _graph_cpu_headless(fps, slots, seconds, update, onset_frames):
+    """CPU share of the graphs' own work (no Tk drawing) over `seconds` of simulated time."""
+    from unittest import mock
+    import ui
+    from bpm_history import HistoryBuffer
+
+    histories = [HistoryBuffer() for _ in range(slots)]
+    with mock.patch.object(ui.tk, 'Canvas', _HeadlessCanvas):
+        graphs = [ui.BpmGraph(None, history, None, 'black', 'white', fps=fps) for history in histories]
+    busy = 0.0
+    k = 0
+    for tick in range(int(seconds * fps)):
+        while k * update / slots <= tick / fps:
+            _feed_history(histories[k % slots], k, onset_frames)
+            k += 1
+        t0 = time.perf_counter()
+        for graph in graphs:
+            graph._tick()
+        busy += time.perf_counter() - t0
+    return busy / seconds
+
+
+def bench_graph(args):
+    """CPU of the overlay mini-graph (ui.BpmGraph) per slot at each redraw rate."""
+    import tkinter as tk
+    import librosa_beat_detector as lbd
+
+    # onset frames of one full update window at the default settings
+    onset_frames = int(lbd.BUFFER_DURATION * args.rate / lbd.HOP_LENGTH)
+    try:
+        root = tk.Tk()
+        root.title("graph benchmark")
+    except tk.TclError:
+        root = None
+    print(f"Mini-graph: {args.slots} slots, a reading every {args.update:g}s per slot, "
+          f"{onset_frames} onset frames per update, {args.seconds:g}s per run")
+    if root is None:
+        print("No display: measuring the graphs' own work only (Tk drawing and the X server not included)")
+    else:
+        baseline = _graph_cpu_tk(root, 1, args.slots, args.seconds, args.update, onset_frames, graphs=False)
+        print(f"Process CPU without graphs: {baseline:.2%} of one core")
+    print(f"{'fps':>5} {'per slot':>9} {'total':>7}")
+    failed = False
+    for fps in [float(f) for f in args.fps.split(',')]:
+        if root is None:
+            cpu = _graph_cpu_headless(fps, args.slots, args.seconds, args.update, onset_frames)
+        else:
+            cpu = _graph_cpu_tk(root, fps, args.slots, args.seconds, args.update, onset_frames, graphs=True)
+            cpu = max(0.0, cpu - baseline)
+        per_slot = cpu / args.slots
+        ok = per_slot * 100 <= args.max_cpu
+        failed |= not ok
+        print(f"{fps:>5g} {per_slot:>9.3%} {cpu:>7.2%}  {'OK' if ok else 'over ' + format(args.max_cpu, 'g') + '%'}")
+    if root is not None:
+        root.destroy()
+    if failed:
+        sys.exit(1)
+
+
+class _OverlayDetector:
+    """Detector stand-in for the overlay: a new reading every `update` seconds, low confidence now and then."""
+
+    def __init__(self, slot, update):
+        self.slot = slot
+        self.update = update
+
+    def _step(self):
+        return int(time.monotonic() / self.update) + self.slot
+
+    @property
+    def bpm(self):
+        # the length changes now and then (99.x / 100.x), which resizes the label
+        return round(99.5 + (self._step() % 7) * 0.3, 1)
+
+    @property
+    def confidence(self):
+        return 0.2 if self._step() % 5 == 0 else 0.9
+
+    def reference_bpm(self):
+        return None
+
+
+def _overlay_cpu(root, controller_class, slots, seconds, update):
+    """CPU share of the Tk process over `seconds` with one overlay renderer (None: no overlay)."""
+    import threading
+
+    stop = threading.Event()
+    controller = None
+    if controller_class is not None:
+        config = {'font_size': 30, 'input_devices': [
+            {'x': 40 + (i % 4) * 180, 'y': 40 + (i // 4) * 70} for i in range(slots)]}
+        controller = controller_class(root, [_OverlayDetector(i, update) for i in range(slots)], config, stop)
+        controller.create_windows()
+    root.after(int(seconds * 1000), root.quit)
+    start = time.process_time()
+    root.mainloop()
+    cpu = time.process_time() - start
+    stop.set()
+    if controller is not None:
+        controller.close_all()
+    return cpu / seconds, controller
+
+
+def bench_overlay(args):
+    """CPU of the overlay renderers: one window per slot vs. all slots on one canvas."""
+    import tkinter as tk
+    import ui
+
+    try:
+        root = tk.Tk()
+        root.withdraw()
+    except tk.TclError:
+        sys.exit("The overlay benchmark needs a display")
+    print(f"Overlay: {args.slots} slots, a reading every {args.update:g}s per slot, {args.seconds:g}s per renderer")
+    if not ui.CanvasOverlayController.supported():
+        print("No -transparentcolor on this platform: the canvas window is opaque here (the app uses windows)")
+    baseline, _ = _overlay_cpu(root, None, args.slots, args.seconds, args.update)
+    print(f"Process CPU without overlay: {baseline:.2%} of one core")
+    print(f"{'renderer':>9} {'total':>7} {'per slot':>9} {'redraw':>12}")
+    for name, controller_class in (('windows', ui.OverlayController), ('canvas', ui.CanvasOverlayController)):
+        cpu, controller = _overlay_cpu(root, controller_class, args.slots, args.seconds, args.update)
+        cpu = max(0.0, cpu - baseline)
+        # only the canvas renderer has a single update loop to time
+        redraw = f"{controller.frame_cost_ms:.3f} ms" if name == 'canvas' else '-'
+        print(f"{name:>9} {cpu:>7.2%} {cpu / args.slots:>9.3%} {redraw:>12}")
+    root.destroy()
+
+
+def _make_detector(backend, source):
+    """Detector of a backend name ("librosa", "aubio", "streaming") reading from a source."""
+    if backend == 'aubio':
+        import pyaudio
+        from beat_detector import BeatDetector
+        return BeatDetector("default", 256, source.sample_rate, 1, pyaudio.paFloat32, source=source)
+    if backend == 'streaming':
+        from streaming_beat_detector import StreamingBeatDetector
+        return StreamingBeatDetector(source=source)
+    from librosa_beat_detector import LibrosaBeatDetector
+    return LibrosaBeatDetector(source=source)
+
+
+def _check_source(detector, source, label, args):
+    """Run a detector over a finite source, print its estimates; with --expect, exit 1 when the BPM is off."""
+    start_cpu, start = time.process_time(), time.perf_counter()
+    detector.start()
+    detector.join()
+    cpu, elapsed = time.process_time() - start_cpu, time.perf_counter() - start
+
+    times, bpms, confidences = detector.history.read_last(detector.history.capacity)
+    print(f"{label} ({source.duration:.1f}s at {source.sample_rate} Hz), "
+          f"{args.backend}: {len(bpms)} estimates, {elapsed:.2f}s wall, {cpu:.2f}s CPU")
+    if args.verbose:
+        for t, bpm, confidence in zip(times - times[0] if len(times) else times, bpms, confidences):
+            print(f"  +{t:6.2f}s {bpm:6.1f} BPM  confidence {confidence:.2f}")
+    print(f"final: {detector.bpm:.1f} BPM, confidence {detector.confidence:.2f}")
+
+    if args.expect is not None:
+        error = abs(detector.bpm - args.expect)
+        ok = error <= args.tolerance
+        print(f"expected {args.expect:.1f} +- {args.tolerance}: {'OK' if ok else 'FAIL'} (off by {error:.2f})")
+        if not ok:
+            sys.exit(1)
+
+
+def bench_file(args):
+    """Run a detector over an audio file via FileSource; with --expect, exit 1 when the BPM is off."""
+    from capture import FileSource
+
+    source = FileSource(args.path, channel=args.channel)
+    _check_source(_make_detector(args.backend, source), source, f"{args.path} (channel {args.channel})", args)
+
+
+def bench_replay(args):
+    """
+    Replay a session recording (see recorder.py) block for block through a backend.
+
+    With --expect the exit code makes it a `git bisect run` check.
+    """
+    from recorder import RecordingSource
+
+    source = RecordingSource(args.path)
+    if not len(source.block_ends):
+        print(f"{args.path}: empty recording")
+        sys.exit(125)   # tells git bisect to skip, not blame, this commit
+    print(f"{args.path}: {len(source.block_ends)} blocks, {len(source.gaps)} gap(s) in the recorded input")
+    for t, seconds in source.gaps:
+        print(f"  gap at {t:7.2f}s: {seconds * 1000:+.0f} ms" + (" (stream restarted)" if seconds < 0 else ""))
+    _check_source(_make_detector(args.backend, source), source, args.path, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--debug", help="Enable debug logging", action="store_true")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    p = sub.add_parser("midi-router", help="Stress the MIDI clock router with fake ports")
+    p.add_argument("--ports", type=int, default=8)
+    p.add_argument("--bpm", type=float, default=180.0)
+    p.add_argument("--duration", type=float, default=10.0)
+    p.add_argument("--max-std-ms", type=float, default=1.0, help="Largest pulse interval std per port")
+    p.add_argument("--max-late-ms", type=float, default=5.0, help="Largest lateness of a single pulse")
+    p.add_argument("--max-bpm-error", type=float, default=0.05, help="Largest error of the average tempo")
+    p.set_defaults(func=bench_midi_router)
+
+    p = sub.add_parser("memory", help="Per-slot memory of the librosa detector by history dtype")
+    p.add_argument("--slots", type=int, default=16)
+    p.add_argument("--rate", type=int, default=48000)
+    p.add_argument("--seconds", type=float, default=20.0)
+    p.add_argument("--dtypes", default="float32,float16,int16")
+    p.set_defaults(func=bench_memory)
+
+    p = sub.add_parser("analysis-plan", help="Onset strength cost per update with the shared analysis plan")
+    p.add_argument("--rates", default="44100,48000,96000")
+    p.add_argument("--updates", type=int, default=20)
+    p.set_defaults(func=bench_analysis_plan)
+
+    p = sub.add_parser("detectors", help="CPU and accuracy of the librosa vs. streaming detector")
+    p.add_argument("--rate", type=int, default=48000)
+    p.add_argument("--seconds", type=float, default=20.0)
+    p.add_argument("--bpms", default="90,124,128,140,174")
+    p.set_defaults(func=bench_detectors)
+
+    p = sub.add_parser("fast-lock", help="Time to a plausible BPM after a tempo change, with and without fast lock")
+    p.add_argument("--rate", type=int, default=48000)
+    p.add_argument("--changes", default="128:140,140:110,174:128,90:124")
+    p.add_argument("--before", type=float, default=20.0, help="Seconds of the first loop")
+    p.add_argument("--after", type=float, default=20.0, help="Seconds of the second loop")
+    p.set_defaults(func=bench_fast_lock)
+
+    p = sub.add_parser("tempo-filter", help="BPM error on tempo ramps: tempo filter vs. fixed smoothing")
+    p.add_argument("--rate", type=int, default=48000)
+    p.add_argument("--bpm", type=float, default=124.0)
+    p.add_argument("--noise", default="0.02,0.15", help="Background noise levels of the drum loop")
+    p.set_defaults(func=bench_tempo_filter)
+
+    p = sub.add_parser("batch", help="Streaming tempo stage: one thread per slot vs. batched analysis")
+    p.add_argument("--rate", type=int, default=48000)
+    p.add_argument("--slots", default="1,2,4,8,16,32")
+    p.add_argument("--updates", type=int, default=20)
+    p.add_argument("--numpy", action="store_true", help="Per-thread path with the NumPy comb kernel (no numba)")
+    p.set_defaults(func=bench_batch)
+
+    p = sub.add_parser("overload", help="Display lag of an overloaded detector, with and without the overload policy")
+    p.add_argument("--rate", type=int, default=48000)
+    p.add_argument("--seconds", type=float, default=30.0)
+    p.add_argument("--load", type=float, default=2.5, help="Extra seconds of work per analysis")
+    p.add_argument("--stall", type=float, default=0.0, help="Extra seconds of work in the third analysis only")
+    p.set_defaults(func=bench_overload)
+
+    p = sub.add_parser("governor", help="Quality ladder CPU/accuracy and the CPU budget governor under simulated load")
+    p.add_argument("--rate", type=int, default=48000)
+    p.add_argument("--seconds", type=float, default=20.0, help="Audio per ladder level")
+    p.add_argument("--bpm", type=int, default=128)
+    p.add_argument("--slots", type=int, default=8)
+    p.add_argument("--budget", type=float, default=40.0, help="CPU budget, percent of one core")
+    p.add_argument("--spike", type=float, default=2.0, help="Load factor during the middle third")
+    p.add_argument("--duration", type=float, default=180.0, help="Simulated seconds")
+    p.set_defaults(func=bench_governor)
+
+    p = sub.add_parser("timeline", help="BPM timeline: logging cost and track report time over a long synthetic set")
+    p.add_argument("--hours", type=float, default=8.0)
+    p.set_defaults(func=bench_timeline)
+
+    p = sub.add_parser("shared-state", help="Shared-memory state table: writer cost, reader latency and consistency")
+    p.add_argument("--seconds", type=float, default=3.0, help="Reader run time per writer mode")
+    p.add_argument("--rate", type=float, default=500.0, help="Updates per second of the paced writer")
+    p.set_defaults(func=bench_shared_state)
+
+    p = sub.add_parser("graph", help="CPU of the overlay mini-graph per slot at each redraw rate")
+    p.add_argument("--slots", type=int, default=8)
+    p.add_argument("--fps", default="10,60", help="Redraw limits to measure (graph_fps)")
+    p.add_argument("--update", type=float, default=2.0, help="Seconds between readings of a slot")
+    p.add_argument("--rate", type=int, default=44100, help="Sample rate (sets the onset envelope length)")
+    p.add_argument("--seconds", type=float, default=20.0, help="Run time per rate")
+    p.add_argument("--max-cpu", type=float, default=2.0, help="Largest CPU per slot, percent of one core")
+    p.set_defaults(func=bench_graph)
+
+    p = sub.add_parser("overlay", help="CPU of the overlay renderers: one window per slot vs. one canvas")
+    p.add_argument("--slots", type=int, default=16)
+    p.add_argument("--update", type=float, default=1.0, help="Seconds between readings of a slot")
+    p.add_argument("--seconds", type=float, default=20.0, help="Run time per renderer")
+    p.set_defaults(func=bench_overlay)
+
+    p = sub.add_parser("replay", help="Replay a session recording through one backend (regression check, git bisect)")
+    p.add_argument("path")
+    p.add_argument("--backend", choices=("librosa", "aubio", "streaming"), default="librosa")
+    p.add_argument("--expect", type=float, help="Expected BPM; exit code 1 if the final BPM is further off")
+    p.add_argument("--tolerance", type=float, default=0.5)
+    p.add_argument("--verbose", action="store_true", help="Print every estimate")
+    p.set_defaults(func=bench_replay)
+
+    p = sub.add_parser("file", help="Analyse an audio file with one backend (offline check)")
+    p.add_argument("path")
+    p.add_argument("--backend", choices=("librosa", "aubio", "streaming"), default="librosa")
+    p.add_argument("--channel", type=int, default=0)
+    p.add_argument("--expect", type=float, help="Expected BPM; exit code 1 if the final BPM is further off")
+    p.add_argument("--tolerance", type=float, default=0.5)
+    p.add_argument("--verbose", action="store_true", help="Print every estimate")
+    p.set_defaults(func=bench_file)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING,
+                        format='%(asctime)s %(levelname)s: %(message)s')
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
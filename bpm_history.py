@@ -0,0 +1,72 @@
+"""Fixed-size, array-backed history of BPM estimates shared between a detector and the UI."""
+
+import numpy as np
+
+
+class HistoryBuffer:
+    """
+    Ring buffer of (time, bpm, confidence) estimates plus the latest onset envelope.
+
+    The detector thread appends; the Tk thread reads only the entries it needs
+    (read_last) and can check `count` / `onset_seq` to skip redraws when nothing
+    changed. Storage is preallocated, so writing never allocates. Readers may
+    observe an entry being overwritten mid-read, which is harmless for display.
+    """
+
+    def __init__(self, capacity=256, onset_points=256):
+        """
+        Args:
+            capacity: Number of estimates kept
+            onset_points: Resolution of the stored onset envelope snapshot
+        """
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.bpm = np.zeros(capacity, dtype=np.float32)
+        self.confidence = np.zeros(capacity, dtype=np.float32)
+        self.count = 0  # total number of estimates appended (write sequence)
+
+        self.onset = np.zeros(onset_points, dtype=np.float32)
+        self.onset_seq = 0
+
+    def append(self, timestamp, bpm, confidence):
+        """Record one estimate. Called from the detector thread."""
+        idx = self.count % self.capacity
+        self.times[idx] = timestamp
+        self.bpm[idx] = bpm
+        self.confidence[idx] = confidence
+        # publish after the data is written
+        self.count += 1
+
+    def set_onset(self, onset_env):
+        """
+        Store a max-pooled snapshot of an onset envelope. Called from the detector thread.
+
+        Max pooling keeps the peaks visible at reduced resolution.
+        """
+        n = len(onset_env)
+        points = len(self.onset)
+        if n == 0:
+            return
+        if n >= points:
+            usable = n - n % points
+            np.max(np.asarray(onset_env[n - usable:]).reshape(points, -1), axis=1, out=self.onset)
+        else:
+            self.onset[:] = np.interp(np.linspace(0, n - 1, points), np.arange(n), onset_env)
+        self.onset_seq += 1
+
+    def read_last(self, n):
+        """
+        Get the most recent estimates in chronological order.
+
+        Only the requested entries are copied, not the whole ring.
+
+        Returns:
+            Tuple of arrays (times, bpm, confidence), each of length <= n
+        """
+        count = self.count
+        n = min(n, count, self.capacity)
+        if n <= 0:
+            empty = np.zeros(0, dtype=np.float32)
+            return empty, empty, empty
+        idx = np.arange(count - n, count) % self.capacity
+        return self.times[idx], self.bpm[idx], self.confidence[idx]
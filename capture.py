@@ -0,0 +1,384 @@
+"""Shared audio capture: one PortAudio stream per physical device, fanned out per channel; plus a file source."""
+
+import logging
+import queue
+import threading
+import time
+import wave
+
+import numpy as np
+import pyaudio
+
+from beat_detector_base import MAX_READ_ERRORS
+
+
+BUFFER_SIZE = 1024           # Frames per read
+QUEUE_BLOCKS = 64            # Blocks buffered per subscriber before blocks are dropped
+
+
+class CaptureSubscription:
+    """
+    One channel of a shared device capture, consumed by a single detector thread.
+
+    Blocks are strided views into the interleaved block read from the device,
+    so fanning out costs no copy; the consumer copies them into its own buffer.
+    `position` is the device's frame count at the end of the last block read,
+    so blocks dropped for this subscriber show as a jump.
+    """
+
+    def __init__(self, capture, channel):
+        self.capture = capture
+        self.channel = channel
+        self.sample_rate = capture.sample_rate
+        self.queue = queue.Queue(maxsize=QUEUE_BLOCKS)
+        self.dropped = 0
+        self.position = 0
+        self.closed = False
+
+    @property
+    def failed(self):
+        return self.capture.failed
+
+    @property
+    def finished(self):
+        # a live device never runs out of audio
+        return False
+
+    def backlog(self):
+        """Seconds of audio queued and not yet read."""
+        return self.queue.qsize() * self.capture.buffer_size / self.sample_rate
+
+    def push(self, block, position):
+        """Called from the capture thread with an interleaved (frames, channels) block and the frames read up to its end."""
+        if self.channel >= block.shape[1]:
+            # Just subscribed; the stream is reopened with this channel on the next read
+            return
+        try:
+            self.queue.put_nowait((position, block[:, self.channel]))
+        except queue.Full:
+            # Consumer is behind; drop rather than stall the other channels
+            self.dropped += 1
+
+    def read(self, timeout=0.5):
+        """
+        Get the next block of samples for this channel.
+
+        Returns:
+            1D float32 array (a view), or None on timeout
+        """
+        try:
+            self.position, samples = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return samples
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.capture.hub.unsubscribe(self)
+
+
+class DeviceCapture(threading.Thread):
+    """
+    Reads one input device with as many channels as its subscribers need.
+
+    The stream is (re)opened on this thread whenever a subscriber asks for a
+    channel beyond the ones currently captured.
+    """
+
+    def __init__(self, hub, device_index, buffer_size=BUFFER_SIZE):
+        super().__init__(daemon=True, name=f"Capture-{device_index}")
+        self.hub = hub
+        self.device_index = device_index
+        self.buffer_size = buffer_size
+        self.subscribers = []
+        self.channels = 0
+        self.running = True
+        self.failed = False
+        self.frames_read = 0
+        self._lock = threading.Lock()
+
+        self.pa = pyaudio.PyAudio()
+        info = self.pa.get_device_info_by_index(device_index)
+        self.device_name = info.get('name')
+        self.max_channels = int(info.get('maxInputChannels') or 1)
+        self.sample_rate = int(info.get('defaultSampleRate') or 44100)
+        self.stream = None
+
+    def add(self, subscription):
+        with self._lock:
+            self.subscribers.append(subscription)
+
+    def remove(self, subscription):
+        with self._lock:
+            if subscription in self.subscribers:
+                self.subscribers.remove(subscription)
+            return len(self.subscribers)
+
+    def _wanted_channels(self):
+        with self._lock:
+            return max((s.channel for s in self.subscribers), default=0) + 1
+
+    def _open(self, channels):
+        self._close_stream()
+        self.stream = self.pa.open(
+            format=pyaudio.paFloat32,
+            channels=channels,
+            rate=self.sample_rate,
+            input=True,
+            input_device_index=self.device_index,
+            frames_per_buffer=self.buffer_size,
+        )
+        self.channels = channels
+        logging.info("Capture: opened device %s (%s) with %d channel(s) at %d Hz",
+                     self.device_index, self.device_name, channels, self.sample_rate)
+
+    def _close_stream(self):
+        if self.stream:
+            try:
+                self.stream.stop_stream()
+                self.stream.close()
+            except Exception:
+                pass
+            self.stream = None
+
+    def run(self):
+        read_errors = 0
+        while self.running:
+            try:
+                wanted = self._wanted_channels()
+                if wanted > self.channels:
+                    self._open(wanted)
+                data = self.stream.read(self.buffer_size, exception_on_overflow=False)
+                read_errors = 0
+            except Exception:
+                if not self.running:
+                    break
+                read_errors += 1
+                if self.stream is None or read_errors >= MAX_READ_ERRORS:
+                    # Could not open, or device most likely unplugged; subscribers see `failed`
+                    logging.exception("Capture: giving up on device %s (%s)", self.device_index, self.device_name)
+                    self.failed = True
+                    break
+                continue
+
+            block = np.frombuffer(data, dtype=np.float32).reshape(-1, self.channels)
+            self.frames_read += len(block)
+            with self._lock:
+                subscribers = list(self.subscribers)
+            for subscription in subscribers:
+                subscription.push(block, self.frames_read)
+
+        self._close_stream()
+        try:
+            self.pa.terminate()
+        except Exception:
+            pass
+
+    def stop(self):
+        self.running = False
+
+
+class CaptureHub:
+    """
+    Opens each physical input device once and hands out per-channel subscriptions.
+
+    Used for slots that set a `channel`, so several slots on one multichannel
+    interface share a single stream instead of opening the device once each.
+    """
+
+    def __init__(self, buffer_size=BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.captures = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, device_index, channel=0):
+        """
+        Subscribe to one channel of a device, starting its capture if needed.
+
+        Returns:
+            CaptureSubscription
+
+        Raises:
+            ValueError: If the device has no such channel
+        """
+        with self._lock:
+            capture = self.captures.get(device_index)
+            is_new = capture is None or capture.failed or not capture.running
+            if is_new:
+                capture = DeviceCapture(self, device_index, self.buffer_size)
+            if not 0 <= channel < capture.max_channels:
+                if is_new:
+                    capture.pa.terminate()
+                raise ValueError(f"Device {device_index} has {capture.max_channels} input channel(s), no channel {channel}")
+            subscription = CaptureSubscription(capture, channel)
+            capture.add(subscription)
+            if is_new:
+                self.captures[device_index] = capture
+                capture.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription; the device is closed once nobody listens to it."""
+        capture = subscription.capture
+        with self._lock:
+            if capture.remove(subscription) == 0:
+                capture.stop()
+                if self.captures.get(capture.device_index) is capture:
+                    del self.captures[capture.device_index]
+
+    def close(self, timeout=None):
+        """
+        Stop all captures.
+
+        Args:
+            timeout: Seconds to wait for each capture thread to release its
+                     device (None: don't wait)
+        """
+        with self._lock:
+            captures = list(self.captures.values())
+            for capture in captures:
+                capture.stop()
+            self.captures.clear()
+        if timeout is not None:
+            for capture in captures:
+                capture.join(timeout)
+
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.aiff', '.aif', '.mp3')  # what soundfile reads; without it WAV only
+
+
+def _decode_pcm(raw, width, channels):
+    """Convert interleaved little-endian PCM bytes to float32 (frames, channels)."""
+    if width == 1:
+        data = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        data = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = (b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)) << 8 >> 8  # sign-extend 24 bit
+        data = ints.astype(np.float32) / 8388608.0
+    elif width == 4:
+        data = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width} bytes")
+    return data.reshape(-1, channels)
+
+
+class AudioFileReader:
+    """
+    Decodes an audio file block by block as float32.
+
+    Uses soundfile when installed (any format it supports), else the standard
+    wave module (PCM WAV only). Only one block is held in memory at a time.
+    """
+
+    def __init__(self, path):
+        try:
+            import soundfile
+        except ImportError:
+            soundfile = None
+        self._sf = self._wave = None
+        if soundfile is not None:
+            self._sf = soundfile.SoundFile(path)
+            self.sample_rate = int(self._sf.samplerate)
+            self.channels = self._sf.channels
+            self.frames = self._sf.frames
+        else:
+            self._wave = wave.open(path, 'rb')
+            self.sample_rate = self._wave.getframerate()
+            self.channels = self._wave.getnchannels()
+            self.frames = self._wave.getnframes()
+
+    def read(self, frames):
+        """
+        Read up to `frames` frames.
+
+        Returns:
+            float32 array shaped (frames, channels); fewer rows (or none) at the end
+        """
+        if self._sf is not None:
+            return self._sf.read(frames, dtype='float32', always_2d=True)
+        return _decode_pcm(self._wave.readframes(frames), self._wave.getsampwidth(), self.channels)
+
+    def close(self):
+        (self._sf or self._wave).close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_audio_file(path):
+    """
+    Read a whole audio file as float32 (see AudioFileReader).
+
+    Returns:
+        Tuple (samples, sample_rate), samples shaped (frames, channels)
+    """
+    with AudioFileReader(path) as reader:
+        return reader.read(reader.frames), reader.sample_rate
+
+
+class FileSource:
+    """
+    Plays one channel of an audio file in place of a capture subscription.
+
+    Detectors take it as their `source`, so a file can be analysed offline with
+    exactly the code path used live; they stop when the file is finished.
+    The file is decoded one block at a time as it is read, so long tracks need
+    no more memory than short ones. Blocks are delivered as fast as they are
+    read unless `realtime` is set.
+    """
+
+    def __init__(self, path, channel=0, block_size=BUFFER_SIZE, realtime=False):
+        self.reader = AudioFileReader(path)
+        if not 0 <= channel < self.reader.channels:
+            self.reader.close()
+            raise ValueError(f"{path} has {self.reader.channels} channel(s), no channel {channel}")
+        self.path = path
+        self.channel = channel
+        self.sample_rate = self.reader.sample_rate
+        self.block_size = block_size
+        self.realtime = realtime
+        self.position = 0
+        self.failed = False
+        self.closed = False
+        self._ended = False
+
+    @property
+    def finished(self):
+        return self._ended or self.position >= self.reader.frames
+
+    @property
+    def duration(self):
+        return self.reader.frames / self.sample_rate
+
+    def backlog(self):
+        # a file is never behind: offline analysis runs every update
+        return 0.0
+
+    def read(self, timeout=0.5):
+        """
+        Get the next block.
+
+        Returns:
+            1D float32 array, or None once the file is finished
+        """
+        if self.finished or self.closed:
+            return None
+        block = self.reader.read(self.block_size)
+        if len(block) == 0:
+            self._ended = True
+            return None
+        self.position += len(block)
+        if self.realtime:
+            time.sleep(len(block) / self.sample_rate)
+        return np.ascontiguousarray(block[:, self.channel])
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.reader.close()
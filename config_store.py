@@ -0,0 +1,260 @@
+"""
+Config persistence: validated once at load, written debounced and atomically.
+
+Writes happen on a background timer thread, so saving from the Tk thread never
+blocks the UI, and the file is replaced via rename so a crash mid-write leaves
+the previous config.json intact.
+"""
+
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+
+
+DEFAULT_CONFIG = {
+    'input_devices': [],
+    'font_size': 30,
+    'font_color': 'white',
+    'bg_color': 'black',
+}
+
+# Expected types of known keys. Values of the wrong type are replaced by the
+# default (if any) or dropped; unknown keys are kept as they are.
+NUMBER = (int, float)
+OPTIONAL_STR = (str, type(None))
+CONFIG_SCHEMA = {
+    'input_devices': list,
+    'font_size': int,
+    'font_color': str,
+    'bg_color': str,
+    'low_confidence_color': str,
+    'overlay_renderer': str,
+    'detector_backend': str,
+    'batch_analysis': bool,
+    'cpu_budget': NUMBER,
+    'librosa_preset': dict,
+    'shared_state': bool,
+    'graph_fps': NUMBER,
+    'midi_enabled': bool,
+    'midi_port': OPTIONAL_STR,
+    'midi_source_slot': int,
+    'midi_ramp_rate': NUMBER,
+    'midi_routes': list,
+    'midi_input_port': OPTIONAL_STR,
+    'midi_input_slot': int,
+}
+DEVICE_SCHEMA = {
+    'id': (int, type(None)),
+    'name': OPTIONAL_STR,
+    'x': int,
+    'y': int,
+    'text_size': int,
+    'channel': int,
+    'history_dtype': str,
+    'memory_budget_mb': NUMBER,
+    'fast_lock': bool,
+    'record_seconds': NUMBER,
+    'timeline': bool,
+    'show_graph': bool,
+}
+DEVICE_DEFAULTS = {'x': 100, 'y': 100}
+# "librosa_preset" (see librosa_beat_detector.DEFAULT_PRESET): expected type and
+# allowed range of each setting; invalid ones are dropped, so the detector's default applies
+PRESET_SCHEMA = {
+    'hop_length': int,
+    'fmin': NUMBER,
+    'fmax': NUMBER,
+    'tightness': NUMBER,
+    'measurement_std': NUMBER,
+}
+PRESET_RANGES = {
+    'hop_length': (32, 4096),
+    'fmin': (0.0, 2000.0),
+    'fmax': (1000.0, 48000.0),
+    'tightness': (1.0, 10000.0),
+    'measurement_std': (0.01, 50.0),
+}
+DEPRECATED_DEVICE_KEYS = ('bpm_scale',)
+
+DEBOUNCE_SECONDS = 0.5
+
+
+def _type_ok(value, expected):
+    # bool is a subclass of int; don't accept True as a coordinate
+    if isinstance(value, bool):
+        return expected is bool
+    return isinstance(value, expected)
+
+
+def _coerce(value, expected):
+    """Convert numeric strings (as typed into spinboxes) to the expected number type, else None."""
+    target = expected if expected in (int, float) else (float if expected == NUMBER else None)
+    if target is None or isinstance(value, bool):
+        return None
+    if target is int and isinstance(value, float) and not value.is_integer():
+        return None
+    try:
+        return target(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _validate_section(section, schema, defaults, where):
+    for key, expected in schema.items():
+        if key not in section or _type_ok(section[key], expected):
+            continue
+        coerced = _coerce(section[key], expected)
+        if coerced is not None:
+            section[key] = coerced
+        elif key in defaults:
+            logging.warning("Config: invalid %s%s=%r, using default %r", where, key, section[key], defaults[key])
+            section[key] = copy.deepcopy(defaults[key])
+        else:
+            logging.warning("Config: invalid %s%s=%r, ignoring", where, key, section[key])
+            del section[key]
+
+
+def _validate_ranges(section, ranges, where):
+    for key, (low, high) in ranges.items():
+        if key in section and not low <= section[key] <= high:
+            logging.warning("Config: %s%s=%r is outside %g..%g, ignoring", where, key, section[key], low, high)
+            del section[key]
+
+
+def validate_config(config):
+    """
+    Validate and normalize a loaded config in place.
+
+    Returns:
+        The config dict, with defaults filled in and invalid values fixed or removed
+    """
+    if not isinstance(config, dict):
+        logging.warning("Config: top level is not an object, using defaults")
+        config = {}
+    for key, value in DEFAULT_CONFIG.items():
+        config.setdefault(key, copy.deepcopy(value))
+    _validate_section(config, CONFIG_SCHEMA, DEFAULT_CONFIG, '')
+
+    preset = config.get('librosa_preset')
+    if preset is not None:
+        _validate_section(preset, PRESET_SCHEMA, {}, 'librosa_preset.')
+        _validate_ranges(preset, PRESET_RANGES, 'librosa_preset.')
+        if preset.get('fmin', 0.0) >= preset.get('fmax', float('inf')):
+            logging.warning("Config: librosa_preset.fmin=%r is not below fmax=%r, ignoring both",
+                            preset['fmin'], preset['fmax'])
+            del preset['fmin'], preset['fmax']
+
+    devices = []
+    for i, device in enumerate(config['input_devices']):
+        if not isinstance(device, dict):
+            logging.warning("Config: input_devices[%d] is not an object, ignoring", i)
+            continue
+        for key in DEPRECATED_DEVICE_KEYS:
+            device.pop(key, None)
+        _validate_section(device, DEVICE_SCHEMA, DEVICE_DEFAULTS, f'input_devices[{i}].')
+        devices.append(device)
+    config['input_devices'] = devices
+    return config
+
+
+class ConfigStore:
+    """
+    Owns the app config dict and persists it.
+
+    The rest of the app mutates `store.config` in place and calls save(); the
+    write is debounced, skipped when nothing changed since the last write, and
+    done atomically on a background thread.
+    """
+
+    def __init__(self, path='config.json', debounce=DEBOUNCE_SECONDS):
+        self.path = path
+        self.debounce = debounce
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # serializes writes, so flush() waits for one in flight
+        self._timer = None
+        self._pending = None
+        self._written = None
+        self.config = self.load()
+
+    def load(self):
+        """Read, validate and return the config file (defaults if missing or unreadable)."""
+        try:
+            with open(self.path, 'r') as f:
+                config = json.load(f)
+            self._written = json.dumps(config, indent=4)
+        except FileNotFoundError:
+            config = {}
+        except (OSError, ValueError):
+            logging.exception("Config: failed to read %s, using defaults", self.path)
+            config = {}
+        return validate_config(config)
+
+    def changed_keys(self, snapshot=None):
+        """
+        Top-level keys that differ between the config (or a snapshot) and the file last written.
+
+        Returns:
+            Set of key names; all keys if nothing was written yet
+        """
+        current = snapshot if snapshot is not None else json.dumps(self.config, indent=4)
+        if self._written is None:
+            return set(json.loads(current))
+        before = json.loads(self._written)
+        after = json.loads(current)
+        return {k for k in before.keys() | after.keys() if before.get(k) != after.get(k)}
+
+    def save(self):
+        """Schedule a debounced background write of the current config."""
+        # Serialize on the caller's thread so the writer never sees a dict being mutated
+        snapshot = json.dumps(self.config, indent=4)
+        with self._lock:
+            self._pending = snapshot
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self._write_pending)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write any pending change now (call on shutdown)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._write_pending()
+
+    def _write_pending(self):
+        with self._lock:
+            snapshot, self._pending = self._pending, None
+            self._timer = None
+        with self._write_lock:
+            if snapshot is None:
+                return
+            if snapshot == self._written:
+                logging.debug("Config: no changes, skipping write")
+                return
+            try:
+                logging.debug("Config: writing %s (changed: %s)", self.path, sorted(self.changed_keys(snapshot)))
+                self._atomic_write(snapshot)
+                self._written = snapshot
+            except Exception:
+                logging.exception("Config: failed to write %s", self.path)
+
+    def _atomic_write(self, text):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.config-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
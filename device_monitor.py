@@ -0,0 +1,242 @@
+"""Background monitor that notices audio devices being plugged in or removed."""
+
+import logging
+import multiprocessing
+import threading
+
+from beat_detector import list_input_devices, resolve_device_from_list
+
+
+ENUMERATE_TIMEOUT = 10.0     # Seconds to wait for the enumeration process before restarting it
+BACKOFF_START = 2.0          # Seconds before a slot whose re-attach failed is tried again
+BACKOFF_MAX = 60.0           # Longest wait between re-attach attempts
+
+
+def _enumeration_process(conn, pa_factory):
+    """
+    Enumerate devices on request, in a process of its own.
+
+    PortAudio only rescans the hardware when it is initialised from scratch,
+    i.e. when no other PyAudio instance of the process is alive. The app's
+    detectors keep theirs open, so the app itself would never see a device
+    coming back; this process holds no other instance, so every request
+    starts from a fresh PortAudio.
+    """
+    while True:
+        try:
+            conn.recv()
+        except (EOFError, OSError):
+            return
+        conn.send(list_input_devices(pa_factory))
+
+
+class DeviceMonitor(threading.Thread):
+    """
+    Periodically enumerates input devices and reports when the list changes.
+
+    Enumeration runs in a helper process (see _enumeration_process), driven
+    from this thread, never the Tk thread. A change is only reported when the
+    (id, name) signature of the device list differs from the previous poll,
+    or after rescan() was requested (e.g. because a detector failed). The
+    callback receives the device list and decides which slots are affected,
+    using resolve_device_from_list() like the startup code.
+
+    Note: the device ids in the list are those of a fresh PortAudio. They
+    match the app's own ids only after the app re-initialised PortAudio (all
+    of its PyAudio instances terminated); slots should be resolved by name.
+    """
+
+    def __init__(self, on_change, interval=2.0, pa_factory=None, fresh=True):
+        """
+        Args:
+            on_change: Called with the new device list (on this thread)
+            interval: Seconds between polls
+            pa_factory: Callable returning a PyAudio-like instance (default pyaudio.PyAudio);
+                        must be picklable (a module-level callable) when `fresh`
+            fresh: Enumerate in a helper process; False enumerates on this thread,
+                   which only sees hardware changes while no other PyAudio is alive
+        """
+        super().__init__(daemon=True, name="DeviceMonitor")
+        self.on_change = on_change
+        self.interval = interval
+        self.pa_factory = pa_factory
+        self.fresh = fresh
+        self.running = False
+        self._signature = None
+        self._force = False
+        self._wake = threading.Event()
+        self._process = None
+        self._conn = None
+
+    @staticmethod
+    def signature(devices):
+        return tuple((d['id'], d.get('name')) for d in devices)
+
+    def _start_process(self):
+        ctx = multiprocessing.get_context('spawn')
+        self._conn, child = ctx.Pipe()
+        self._process = ctx.Process(target=_enumeration_process, args=(child, self.pa_factory),
+                                    daemon=True, name="DeviceEnumeration")
+        self._process.start()
+        child.close()
+
+    def _stop_process(self):
+        if self._process is None:
+            return
+        self._conn.close()
+        self._process.join(timeout=1)
+        if self._process.is_alive():
+            self._process.kill()
+        self._process = self._conn = None
+
+    def enumerate(self):
+        """
+        Current input devices as seen by a fresh PortAudio.
+
+        Returns:
+            Device list (see list_input_devices), or None if enumeration failed
+        """
+        if not self.fresh:
+            return list_input_devices(self.pa_factory)
+        try:
+            if self._process is None or not self._process.is_alive():
+                self._stop_process()
+                self._start_process()
+            self._conn.send(None)
+            if self._conn.poll(ENUMERATE_TIMEOUT):
+                return self._conn.recv()
+            logging.warning("Device monitor: enumeration timed out, restarting it")
+        except (OSError, EOFError):
+            logging.exception("Device monitor: enumeration process failed")
+        self._stop_process()
+        return None
+
+    def poll(self):
+        """Enumerate once and report if needed. Returns True when on_change was called."""
+        devices = self.enumerate()
+        if devices is None:
+            return False
+        signature = self.signature(devices)
+        force, self._force = self._force, False
+        if signature == self._signature and not force:
+            return False
+        if self._signature is not None and signature != self._signature:
+            logging.info("Device monitor: input device list changed (%d devices)", len(devices))
+        self._signature = signature
+        try:
+            self.on_change(devices)
+        except Exception:
+            logging.exception("Device monitor: change handler failed")
+        return True
+
+    def rescan(self):
+        """Request a report on the next poll even if the device list looks unchanged."""
+        self._force = True
+        self._wake.set()
+
+    def run(self):
+        self.running = True
+        try:
+            # The first poll only records the current state
+            devices = self.enumerate()
+            self._signature = self.signature(devices) if devices is not None else None
+            while self.running:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                if not self.running:
+                    break
+                self.poll()
+        finally:
+            self._stop_process()
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+
+
+class ReattachBackoff:
+    """
+    Spaces out re-attach attempts of slots whose device is listed but fails to open.
+
+    The wait doubles after each failed attempt, from BACKOFF_START up to
+    BACKOFF_MAX, and starts over when the device list changes (a replug is
+    worth trying at once).
+    """
+
+    def __init__(self, start=BACKOFF_START, maximum=BACKOFF_MAX):
+        self.start = start
+        self.maximum = maximum
+        self._delay = {}
+        self._next = {}
+
+    def due(self, slot, now):
+        """Whether a re-attach of the slot may be tried at (monotonic) time now."""
+        return now >= self._next.get(slot, 0.0)
+
+    def attempted(self, slot, now):
+        """Record an attempt; the next one waits twice as long as the previous wait."""
+        delay = min(self._delay.get(slot, self.start / 2) * 2, self.maximum)
+        self._delay[slot] = delay
+        self._next[slot] = now + delay
+
+    def reset(self):
+        self._delay.clear()
+        self._next.clear()
+
+
+class ReattachPlan:
+    """What to do about the slots after a device change (see plan_reattach)."""
+
+    def __init__(self):
+        self.detach = []        # slots whose device is gone: stop their detector
+        self.attach = {}        # slot -> device index of our PortAudio: re-attach just this slot
+        self.restart = False    # restart all inputs, so our PortAudio re-initialises and sees new devices
+        self.attempts = []      # slots tried now; record them with ReattachBackoff.attempted()
+
+
+def plan_reattach(config_devices, detectors, devices, own_devices, backoff, now):
+    """
+    Decide which slots to detach and re-attach after the device list changed.
+
+    A slot is left alone while its detector runs on a listed device, or while
+    it has no detector and its device is still missing. A running or failed
+    slot whose device is no longer listed is detached. A slot whose device
+    is listed but that has no healthy detector is re-attached once its retry
+    is due (see ReattachBackoff).
+
+    Re-attaching needs the device's index in the app's own PortAudio, which
+    only learns about hardware when it initialises from scratch, i.e. while
+    no input holds it open. A device missing from our view therefore needs
+    all inputs restarted; if nothing else is open, our view is fresh already
+    and the slot is attached alone.
+
+    Args:
+        config_devices: Configured input devices, by slot
+        detectors: Detector per slot (None where there is none); only `failed` is read
+        devices: Input devices listed by a fresh PortAudio (DeviceMonitor)
+        own_devices: Callable returning the input devices as our PortAudio lists them
+                     (list_input_devices); only called when a slot is to be re-attached
+        backoff: ReattachBackoff of the slots (not modified)
+        now: Monotonic time
+
+    Returns:
+        ReattachPlan
+    """
+    plan = ReattachPlan()
+    for i, (device, detector) in enumerate(zip(config_devices, detectors)):
+        present = resolve_device_from_list(devices, device) is not None
+        healthy = detector is not None and not detector.failed
+        if (healthy and present) or (detector is None and not present):
+            continue
+        if not present:
+            plan.detach.append(i)
+        elif backoff.due(i, now):
+            plan.attempts.append(i)
+    if plan.attempts:
+        own = own_devices()
+        attach = {i: resolve_device_from_list(own, config_devices[i]) for i in plan.attempts}
+        if any(index is None for index in attach.values()):
+            plan.restart = True
+        else:
+            plan.attach = attach
+    return plan
@@ -0,0 +1,130 @@
+"""
+CPU budget governor: keeps the detectors' total CPU use under a budget.
+
+Every step samples each slot's CPU time (AudioStreamDetector.cpu_time) and
+steps analysis quality down one level on the most expensive slots while the
+total is over budget, and back up once there is headroom. Slots feeding a
+MIDI clock are priority slots: they are degraded last and restored first.
+Detectors with a single quality level are measured but never changed.
+"""
+
+import logging
+import time
+
+
+GOVERNOR_INTERVAL = 5.0      # Seconds between governor steps
+UPGRADE_HEADROOM = 0.8       # Upgrade only while the predicted total stays below this share of the budget
+UPGRADE_COOLDOWN = 3         # Steps a slot keeps its level after being degraded
+COST_SMOOTHING = 0.5         # Weight of the newest sample in a level's cost average
+LEVEL_COST_RATIO = 0.5       # Assumed cost of the next level down (relative) until it was measured
+
+
+class _SlotState:
+    """What the governor knows about one detector."""
+
+    def __init__(self, cpu_time, now):
+        self.cpu_time = cpu_time
+        self.time = now
+        self.share = 0.0
+        self.costs = {}          # quality level -> average share of one core
+        self.cooldown = 0
+        self.switched = False    # level changed during the current window
+
+
+class QualityGovernor:
+    """
+    Steps detector quality levels to hold their total CPU share under a budget.
+
+    Call step() every GOVERNOR_INTERVAL seconds with the current detectors.
+    Shares are fractions of one core (1.0 = one core fully busy).
+    """
+
+    def __init__(self, budget, clock=time.monotonic):
+        """
+        Args:
+            budget: Total CPU share allowed for all detectors (fraction of one core)
+            clock: Monotonic time source (injectable for simulations)
+        """
+        self.budget = budget
+        self.clock = clock
+        self.total = 0.0
+        self._slots = {}
+
+    def step(self, detectors, priority_slots=()):
+        """
+        Measure every detector and adjust quality levels.
+
+        Args:
+            detectors: Detectors indexed by slot (None for empty slots)
+            priority_slots: Slots to degrade last and restore first
+
+        Returns:
+            Total measured CPU share of the detectors since the previous step
+        """
+        now = self.clock()
+        slots = {}
+        measured = []
+        for slot, detector in enumerate(detectors):
+            if detector is None or not hasattr(detector, 'cpu_time'):
+                continue
+            state = self._slots.get(id(detector))
+            if state is None:
+                # first sight: start the window now, measure on the next step
+                slots[id(detector)] = _SlotState(detector.cpu_time, now)
+                continue
+            slots[id(detector)] = state
+            elapsed = now - state.time
+            if elapsed <= 0:
+                continue
+            state.share = (detector.cpu_time - state.cpu_time) / elapsed
+            state.cpu_time, state.time = detector.cpu_time, now
+            if state.switched:
+                # the window mixed two levels; only its share counts
+                state.switched = False
+            else:
+                previous = state.costs.get(detector.quality)
+                state.costs[detector.quality] = state.share if previous is None else \
+                    (1.0 - COST_SMOOTHING) * previous + COST_SMOOTHING * state.share
+            if state.cooldown:
+                state.cooldown -= 1
+            measured.append((slot, detector, state))
+        # forget detectors that were replaced or removed
+        self._slots = slots
+
+        total = sum(state.share for _, _, state in measured)
+        self.total = total
+        if total > self.budget:
+            self._degrade(measured, priority_slots, total)
+        elif total < UPGRADE_HEADROOM * self.budget:
+            self._upgrade(measured, priority_slots, total)
+        return total
+
+    def _degrade(self, measured, priority_slots, total):
+        """Step the most expensive slots down one level each until the predicted total fits."""
+        candidates = [m for m in measured if m[1].quality < m[1].quality_levels - 1]
+        candidates.sort(key=lambda m: (m[0] in priority_slots, -m[2].share))
+        for slot, detector, state in candidates:
+            if total <= self.budget:
+                break
+            level = detector.quality + 1
+            predicted = state.costs.get(level, state.share * LEVEL_COST_RATIO)
+            total -= state.share - predicted
+            self._switch(slot, detector, state, level)
+            state.cooldown = UPGRADE_COOLDOWN
+
+    def _upgrade(self, measured, priority_slots, total):
+        """Step one slot up a level if its predicted cost still leaves headroom."""
+        candidates = [m for m in measured if m[1].quality > 0 and not m[2].cooldown]
+        candidates.sort(key=lambda m: (m[0] not in priority_slots, -m[1].quality))
+        for slot, detector, state in candidates:
+            level = detector.quality - 1
+            predicted = state.costs.get(level, state.share / LEVEL_COST_RATIO)
+            if total - state.share + predicted <= UPGRADE_HEADROOM * self.budget:
+                self._switch(slot, detector, state, level)
+                return
+
+    def _switch(self, slot, detector, state, level):
+        logging.info("Governor: slot %d quality %d -> %d (slot %.1f%%, total %.1f%% of %.1f%% budget)",
+                     slot, detector.quality, level, state.share * 100, self.total * 100, self.budget * 100)
+        detector.set_quality(level)
+        state.switched = True
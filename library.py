@@ -0,0 +1,220 @@
+"""
+Library analysis: the BPM of every track in a folder, with the live estimator.
+
+Each file is decoded block by block through a FileSource into a
+LibrosaBeatDetector, so the rolling window, IBI clustering and tempo filter
+are exactly the overlay's and the two numbers agree. Files are analysed in a
+process pool. Results are cached on disk by file content hash and detector
+settings, so a rerun only analyses new or changed files (and a moved or
+renamed file is still found).
+"""
+
+import csv
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+
+CACHE_FILE = 'analysis_cache.json'
+CACHE_VERSION = 1            # Bump when the result format or the estimator changes
+
+
+def file_digest(path):
+    """Content hash of a file, so cached results follow the audio rather than the name."""
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def settings_key(preset=None):
+    """Short hash of everything that changes the result: the preset and the detector's timing constants."""
+    import librosa_beat_detector as lbd
+
+    settings = dict(lbd.DEFAULT_PRESET)
+    settings.update((k, v) for k, v in (preset or {}).items() if k in lbd.DEFAULT_PRESET)
+    settings.update(version=CACHE_VERSION, buffer=lbd.BUFFER_DURATION, update=lbd.UPDATE_INTERVAL,
+                    n_fft=lbd.N_FFT, n_mels=lbd.N_MELS, fast_lock=lbd.FAST_LOCK, smoothing=lbd.ENABLE_SMOOTHING)
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def find_audio_files(folder):
+    """All audio files below a folder, sorted."""
+    from capture import AUDIO_EXTENSIONS
+
+    paths = []
+    for root, _, names in os.walk(folder):
+        paths.extend(os.path.join(root, n) for n in names if n.lower().endswith(AUDIO_EXTENSIONS))
+    return sorted(paths)
+
+
+def track_bpm(readings, duration, settle):
+    """
+    Summarize the BPM the overlay would show while a track plays.
+
+    Args:
+        readings: (audio time, bpm, confidence) each time the shown BPM changed
+        duration: Length of the track in seconds
+        settle: Seconds ignored at the start (the first window filling up)
+
+    Returns:
+        Tuple (bpm, confidence): the BPM shown for the longest time after
+        `settle` (time-weighted median) and its time-weighted mean confidence
+    """
+    spans = []
+    for i, (t, bpm, confidence) in enumerate(readings):
+        end = readings[i + 1][0] if i + 1 < len(readings) else duration
+        start = max(t, min(settle, end))
+        if bpm > 0 and end > start:
+            spans.append((bpm, end - start, confidence))
+    if not spans:
+        # shorter than the settle time: fall back to the last reading
+        return (readings[-1][1], readings[-1][2]) if readings else (0.0, 0.0)
+    total = sum(w for _, w, _ in spans)
+    confidence = sum(w * c for _, w, c in spans) / total
+    acc = 0.0
+    for bpm, w, _ in sorted(spans):
+        acc += w
+        if acc >= total / 2:
+            return bpm, confidence
+
+
+def analyze_file(task):
+    """
+    Worker: run the detector over one file.
+
+    Returns:
+        Tuple (digest, result dict with bpm, confidence, final, duration,
+        cpu_seconds), or (digest, {'error': message}) when the file can't be read or decoded
+    """
+    from capture import FileSource
+    from librosa_beat_detector import LibrosaBeatDetector
+
+    path, digest, preset = task
+    try:
+        source = FileSource(path)
+        bd = LibrosaBeatDetector(source=source, preset=preset)
+        readings = []
+        bd.add_bpm_listener(lambda bpm: readings.append((bd.audio_time, bpm, bd.confidence)))
+        start = time.process_time()
+        # decode errors in the middle of a file surface here, not when it is opened
+        bd.run()
+        bpm, confidence = track_bpm(readings, source.duration, bd.buffer_duration)
+        return digest, {
+            'bpm': round(float(bpm), 1),
+            'confidence': round(float(confidence), 2),
+            'final': round(float(bd.bpm), 1),
+            'duration': round(source.duration, 2),
+            'cpu_seconds': round(time.process_time() - start, 2),
+        }
+    except Exception as e:
+        return digest, {'error': f"{type(e).__name__}: {e}"}
+
+
+def load_cache(path):
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+        if cache.get('version') == CACHE_VERSION:
+            return cache
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError):
+        logging.exception("Analysis cache %s is unreadable, starting a new one", path)
+    return {'version': CACHE_VERSION, 'files': {}, 'results': {}}
+
+
+def save_cache(path, cache):
+    """Write atomically, so an interrupted run keeps the previous cache."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp, path)
+
+
+def analyze_folder(folder, preset=None, workers=None, cache_path=CACHE_FILE, progress=print):
+    """
+    Analyse every audio file below a folder, reusing cached results.
+
+    Files whose size and modification time are unchanged are not even hashed
+    again; results are looked up by content hash and settings_key(preset).
+
+    Args:
+        folder: Searched recursively for AUDIO_EXTENSIONS
+        preset: The "librosa_preset" to analyse with (None: defaults)
+        workers: Processes (default: one per CPU)
+        cache_path: JSON cache file
+        progress: Called with each progress line
+
+    Returns:
+        List of (path, result dict) in path order
+    """
+    paths = find_audio_files(folder)
+    cache = load_cache(cache_path)
+    key = settings_key(preset)
+    start = time.perf_counter()
+
+    # content hashes, from the stat index where the file is unchanged
+    digests, to_hash = {}, []
+    for path in paths:
+        st = os.stat(path)
+        known = cache['files'].get(os.path.abspath(path))
+        if known and known['size'] == st.st_size and known['mtime'] == st.st_mtime:
+            digests[path] = known['digest']
+        else:
+            to_hash.append((path, st))
+
+    for path, st in to_hash:
+        digests[path] = file_digest(path)
+        cache['files'][os.path.abspath(path)] = {'size': st.st_size, 'mtime': st.st_mtime, 'digest': digests[path]}
+
+    # identical files (same content) are analysed once
+    todo = {}
+    for path in paths:
+        if f"{digests[path]}:{key}" not in cache['results']:
+            todo.setdefault(digests[path], path)
+    progress(f"{len(paths)} files: {len(paths) - len(todo)} cached, {len(todo)} to analyse ({len(to_hash)} hashed)")
+
+    analyzed = 0
+    errors = {}
+    audio_seconds = 0.0
+    analyze_start = time.perf_counter()
+    if todo:
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(min(workers or os.cpu_count(), len(todo))) as pool:
+            tasks = [(path, digest, preset) for digest, path in todo.items()]
+            for digest, result in pool.imap_unordered(analyze_file, tasks):
+                if 'error' in result:
+                    # not cached: the file may be fixed, or a decoder installed, before the next run
+                    errors[digest] = result
+                    progress(f"  failed: {todo[digest]} ({result['error']})")
+                    continue
+                analyzed += 1
+                audio_seconds += result['duration']
+                cache['results'][f"{digest}:{key}"] = result
+                progress(f"  [{analyzed + len(errors)}/{len(todo)}] {result['bpm']:6.1f} BPM  {todo[digest]}")
+                if analyzed % 20 == 0:
+                    save_cache(cache_path, cache)
+    elapsed = time.perf_counter() - analyze_start
+    save_cache(cache_path, cache)
+
+    total = time.perf_counter() - start
+    if analyzed:
+        progress(f"Analysed {analyzed} files ({audio_seconds / 60:.1f} min of audio) in {elapsed:.1f}s: "
+                 f"{analyzed / elapsed:.2f} files/s, {audio_seconds / elapsed:.0f}x realtime")
+    progress(f"{len(paths)} files in {total:.1f}s ({len(paths) / total:.2f} files/s overall"
+             f"{f', {len(errors)} failed' if errors else ''})")
+    return [(path, cache['results'].get(f"{digests[path]}:{key}") or errors[digests[path]]) for path in paths]
+
+
+def write_csv(path, results):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['path', 'bpm', 'confidence', 'final', 'duration'])
+        for file_path, r in results:
+            writer.writerow([file_path, r.get('bpm', ''), r.get('confidence', ''), r.get('final', ''),
+                             r.get('duration', '')])
@@ -1,12 +1,13 @@
 """Librosa-based beat detector with rolling buffer."""
 
 import numpy as np
-import pyaudio
+from numpy.lib.stride_tricks import sliding_window_view
 import librosa
-import time
+import scipy.signal
 import os
 
-from beat_detector_base import BaseBeatDetector
+from analysis_plan import get_plan
+from beat_detector_base import AudioStreamDetector, LOW_CONFIDENCE, MAX_INPUT_AGE, TEMPO_MEASUREMENT_STD
 
 
 # =============================================================================
@@ -21,234 +22,604 @@ CHANNELS = 2                 # Mono audio # 1 bad results.
 # Rolling buffer settings
 BUFFER_DURATION = 8.0       # Seconds of audio to keep in rolling buffer
 UPDATE_INTERVAL = 2.0        # Seconds between BPM recalculations
+HISTORY_DTYPE = 'float32'    # Rolling buffer storage: float32, float16 or int16 (decoded at analysis time)
 
 # Librosa beat_track parameters
 HOP_LENGTH = 256             # Hop length for onset detection (larger = faster, less accurate) default: 256
 START_BPM = 120.0            # Starting tempo estimate for beat tracking
+TIGHTNESS = 100              # How strictly beats follow the tempo; 100 helps lock onto stable beats in electronic music
+
+# Fast lock: quick provisional reading after a tempo change (shares the onset frames)
+FAST_LOCK = False            # Default for slots without "fast_lock"; enabled per input device
+FAST_WINDOW = 3.0            # Seconds of onset frames used by the quick estimate
+FAST_INTERVAL = 0.5          # Seconds between quick estimates
+FAST_HOP_FACTOR = 2          # Quick estimate max-pools this many onset frames (coarser hop; at level 0)
+FAST_TOLERANCE = 0.03        # Relative difference at which two readings count as the same tempo
+FAST_CONFIRM = 2             # Consecutive agreeing quick readings needed to switch tempo
+
+# External tempo reference (MIDI clock input)
+REFERENCE_TOLERANCE = 0.01   # Relative BPM difference at which estimate and reference agree
+REFERENCE_MAX_SKIPS = 3      # Max consecutive updates skipped while they agree
 
 # Smoothing
-ENABLE_SMOOTHING = True      # Enable smoothing of BPM over time (exponential moving average)
-SMOOTHING_ALPHA = 0.6        # Weight for new detection (0.0-1.0). Higher = more responsive.
+ENABLE_SMOOTHING = True      # Smooth readings with the shared tempo filter (see beat_detector_base.TempoFilter)
 
 # Onset strength parameters (for advanced tuning if needed)
 DETREND = False              # Detrend onset envelope (can help with some audio)
 CENTER = True                # Center the onset envelope
 FMAX = 8000.0                # Max frequency for mel spectrogram (lower = less CPU) default: 8000.0
-FMIN = 20.0                  # Min frequency for mel spectrogram # default: 30.0 
+FMIN = 0.0                   # Min frequency for mel spectrogram (librosa default; tuning.py may propose higher)
+N_FFT = 2048                 # FFT size of the mel spectrogram (librosa default)
+N_MELS = 128                 # Mel bands (librosa default)
+STFT_BLOCK_FRAMES = 64       # STFT frames computed per pass; bounds the scratch buffers
+AMIN = 1e-10                 # power_to_db floor (librosa default)
+TOP_DB = 80.0                # power_to_db dynamic range (librosa default)
+
+# Quality ladder for the CPU governor (governor.py): level 0 is the settings above,
+# each further level costs less CPU. Hop length is in samples of the analysis rate
+# (the device rate divided by `decimate`); N_FFT is scaled down with it.
+QUALITY_LEVELS = (
+    {'hop_length': HOP_LENGTH, 'decimate': 1, 'buffer_duration': BUFFER_DURATION,
+     'update_interval': UPDATE_INTERVAL, 'fast_interval': FAST_INTERVAL},
+    {'hop_length': 512, 'decimate': 1, 'buffer_duration': 8.0, 'update_interval': 2.0, 'fast_interval': 0.5},
+    {'hop_length': 512, 'decimate': 1, 'buffer_duration': 8.0, 'update_interval': 3.0, 'fast_interval': 1.0},
+    {'hop_length': 384, 'decimate': 2, 'buffer_duration': 8.0, 'update_interval': 4.0, 'fast_interval': 1.0},
+    {'hop_length': 512, 'decimate': 2, 'buffer_duration': 8.0, 'update_interval': 6.0, 'fast_interval': 1.0},
+)
+DECIMATE_ORDER = 8           # Order of the anti-aliasing low-pass applied before decimation
+
+# Tunable settings (searched by tuning.py); "librosa_preset" in config.json overrides any of them.
+# hop_length only applies at quality level 0.
+DEFAULT_PRESET = {
+    'hop_length': HOP_LENGTH,
+    'fmin': FMIN,
+    'fmax': FMAX,
+    'tightness': TIGHTNESS,
+    'measurement_std': TEMPO_MEASUREMENT_STD,
+}
 
 # Debug
 DEBUG = os.environ.get("BPM_DEBUG", "0") == "1"
 
+HISTORY_DTYPES = ('float32', 'float16', 'int16')  # most to least precise
+INT16_SCALE = 32768.0
+# np.fft accepts `out` since NumPy 2.0; older versions allocate per block
+_FFT_OUT = np.lib.NumpyVersion(np.__version__) >= '2.0.0'
+
 
-class LibrosaBeatDetector(BaseBeatDetector):
+class LibrosaBeatDetector(AudioStreamDetector):
     """
     Beat detector using librosa with a rolling audio buffer.
     
     Captures audio continuously, maintains a rolling buffer of BUFFER_DURATION seconds,
     and recalculates BPM every UPDATE_INTERVAL seconds.
+    
+    Mel frames are computed incrementally as audio arrives and kept in a ring,
+    so each update only transforms the new audio. With `fast_lock` (off by
+    default, see FAST_LOCK), a quick estimate over the last FAST_WINDOW
+    seconds of the same frames runs every FAST_INTERVAL; when it confidently
+    reports a new tempo, that is shown as a provisional reading until the
+    full-window estimate agrees.
+    
+    Memory stays bounded: the rolling buffer is a preallocated ring stored as
+    `history_dtype` (float16/int16 halve it), and the mel spectrogram is computed
+    in blocks of STFT_BLOCK_FRAMES into scratch buffers that are reused every
+    update. With `memory_budget_mb` the most precise dtype that fits is chosen.
+    
+    Hop length, decimation, window length and update interval come from the
+    current `quality` level (QUALITY_LEVELS); set_quality() switches levels.
+    A `preset` dict overrides the tunable settings in DEFAULT_PRESET (unknown
+    keys are ignored).
     """
+    
+    quality_levels = len(QUALITY_LEVELS)
 
-    def __init__(self, input_device_index=None):
-        super().__init__(input_device_index)
+    def __init__(self, input_device_index=None, source=None, history_dtype=None, memory_budget_mb=None,
+                 fast_lock=None, preset=None):
+        super().__init__(input_device_index, source)
+        self.preset = dict(DEFAULT_PRESET)
+        self.preset.update((k, v) for k, v in (preset or {}).items() if k in DEFAULT_PRESET)
+        self.tempo_filter.measurement_std = self.preset['measurement_std']
+        self.requested_dtype = history_dtype
+        self.memory_budget_mb = memory_budget_mb
+        self.fast_lock = FAST_LOCK if fast_lock is None else fast_lock
         
-        self.sample_rate = SAMPLE_RATE
         self.buffer_size = BUFFER_SIZE
         self.channels = CHANNELS
+        self.reference_skips = 0
+        self.quality = 0
+        self.requested_quality = 0
         
-        # Calculate buffer sizes
-        self.buffer_samples = int(BUFFER_DURATION * self.sample_rate)
-        self.update_samples = int(UPDATE_INTERVAL * self.sample_rate)
+        self.set_sample_rate(SAMPLE_RATE)
+
+    def set_sample_rate(self, rate):
+        """Switch to a sample rate: size the rolling buffer and drop scratch buffers for the old rate."""
+        self.sample_rate = rate
+        # seconds of audio received; the tempo filter's time base, kept across quality changes
+        self.audio_time = 0.0
+        self.tempo_filter.reset()
+        self._configure()
+
+    def set_quality(self, level):
+        """
+        Request a quality level (0 = best, see QUALITY_LEVELS).
         
-        # Rolling audio buffer (circular buffer using numpy)
-        self.audio_buffer = np.zeros(self.buffer_samples, dtype=np.float32)
+        Thread-safe: the detector thread switches before its next block. The
+        rolling buffer restarts at the new settings; the shown BPM is kept.
+        """
+        self.requested_quality = min(max(0, int(level)), len(QUALITY_LEVELS) - 1)
+
+    def _configure(self):
+        """Size all buffers for the sample rate and the current quality level."""
+        level = QUALITY_LEVELS[self.quality]
+        self.hop_length = self.preset['hop_length'] if self.quality == 0 else level['hop_length']
+        self.decimate = level['decimate']
+        self.buffer_duration = level['buffer_duration']
+        self.update_interval = level['update_interval']
+        self.fast_interval = level['fast_interval']
+        self.analysis_rate = self.sample_rate / self.decimate
+        self.n_fft = N_FFT // self.decimate
+        self.fmax = min(self.preset['fmax'], self.analysis_rate / 2.0)
+        if self.decimate > 1:
+            # anti-aliasing low-pass just below the new Nyquist frequency, streamed block by block
+            self._decimate_sos = scipy.signal.butter(DECIMATE_ORDER, 0.9 / self.decimate, output='sos')
+            self._decimate_zi = np.zeros((self._decimate_sos.shape[0], 2))
+            self._decimate_phase = 0
+        
+        # Update counters count device-rate samples; everything below is at the analysis rate
+        self.update_samples = int(self.update_interval * self.sample_rate)
+        self.fast_samples = int(self.fast_interval * self.sample_rate)
         self.samples_since_update = 0
+        self.buffer_samples = int(self.buffer_duration * self.analysis_rate)
+        self.n_frames = 1 + self.buffer_samples // self.hop_length
+        self.fast_frames = int(FAST_WINDOW * self.analysis_rate / self.hop_length)
+        # the quick estimate's coarse hop is FAST_HOP_FACTOR level-0 hops; coarser levels pool less
+        self.fast_hop_factor = max(1, round(FAST_HOP_FACTOR * HOP_LENGTH / (self.hop_length * self.decimate)))
+        self.history_dtype = self._choose_dtype()
+        
+        # Rolling audio buffer: a ring, write_pos is the oldest sample
+        self.audio_buffer = np.zeros(self.buffer_samples, dtype=self.history_dtype)
+        self.write_pos = 0
+        self._scratch = None
+        self.plan = None
+        
+        # Stream position: samples stored, and onset frames computed (frame f is centered on sample f * hop_length)
+        self.samples_total = 0
+        self.frames_total = 0
+        self.mel_pos = 0
         
-        # PyAudio setup
-        self.pa = None
-        self.stream = None
+        # Fast lock state
+        self.samples_since_fast = 0
+        self.fast_candidate = 0.0
+        self.fast_streak = 0
+        self.provisional = False
+        self.provisional_since = 0
 
-    def run(self):
-        """Main thread loop - capture audio and periodically calculate BPM."""
-        self.running = True
-        self.pa = pyaudio.PyAudio()
+    def _choose_dtype(self):
+        if self.requested_dtype:
+            if self.requested_dtype not in HISTORY_DTYPES:
+                raise ValueError(f"history_dtype must be one of {HISTORY_DTYPES}, not {self.requested_dtype!r}")
+            return np.dtype(self.requested_dtype)
+        if not self.memory_budget_mb:
+            return np.dtype(HISTORY_DTYPE)
+        for name in HISTORY_DTYPES:
+            if self.estimate_memory(name) <= self.memory_budget_mb * 1024 * 1024:
+                return np.dtype(name)
+        if DEBUG:
+            print(f"[LibrosaBeatDetector] {self.memory_budget_mb} MB budget too small, using int16")
+        return np.dtype('int16')
+
+    def estimate_memory(self, dtype=None):
+        """
+        Bytes held by this detector's audio and analysis buffers at the current sample rate.
         
-        # Get device info to check native sample rate
-        if self.input_device_index is not None:
-            device_info = self.pa.get_device_info_by_index(self.input_device_index)
-            native_rate = int(device_info.get('defaultSampleRate', 44100))
-            
-            # Update sample rate to match device native rate (avoid resampling artifacts)
-            if native_rate != self.sample_rate:
-                if DEBUG:
-                    print(f"[LibrosaBeatDetector] Switching to native device rate: {native_rate} (was {self.sample_rate})")
-                self.sample_rate = native_rate
-                
-                # Recalculate buffer sizes based on new rate
-                self.buffer_samples = int(BUFFER_DURATION * self.sample_rate)
-                self.update_samples = int(UPDATE_INTERVAL * self.sample_rate)
-                
-                # Re-initialize rolling buffer with new size
-                self.audio_buffer = np.zeros(self.buffer_samples, dtype=np.float32)
-            elif DEBUG:
-                print(f"[LibrosaBeatDetector] Device rate matches default: {self.sample_rate}")
+        Args:
+            dtype: Storage dtype to estimate for (default: the one in use)
+        """
+        dtype = np.dtype(dtype or self.history_dtype)
+        block_samples = (STFT_BLOCK_FRAMES - 1) * self.hop_length + self.n_fft
+        bins = self.n_fft // 2 + 1
+        band = min(bins, int(self.fmax * self.n_fft / self.analysis_rate) + 2)  # see AnalysisPlan; shared plan not counted
+        scratch = (block_samples * 4                     # decoded block audio
+                   + STFT_BLOCK_FRAMES * self.n_fft * 4  # windowed frames
+                   + STFT_BLOCK_FRAMES * bins * 8        # spectrum (complex64)
+                   + STFT_BLOCK_FRAMES * band * 4        # power (filterbank band only)
+                   + 3 * self.n_frames * N_MELS * 4      # mel frame ring + window copy + frame diff
+                   + self.n_frames * 4)                  # onset envelope
+        return self.buffer_samples * dtype.itemsize + scratch
+
+    def _ensure_scratch(self):
+        if self._scratch is not None:
+            return self._scratch
+        # window and mel filterbank are shared by all detectors with the same parameters
+        self.plan = get_plan(self.analysis_rate, self.n_fft, self.hop_length, N_MELS,
+                             fmin=self.preset['fmin'], fmax=self.fmax)
+        block_samples = (STFT_BLOCK_FRAMES - 1) * self.hop_length + self.n_fft
+        self._scratch = {
+            'block': np.zeros(block_samples, dtype=np.float32),
+            'frames': np.zeros((STFT_BLOCK_FRAMES, self.n_fft), dtype=np.float32),
+            'spectrum': np.zeros((STFT_BLOCK_FRAMES, self.plan.n_bins), dtype=np.complex64),
+            'power': np.zeros((STFT_BLOCK_FRAMES, self.plan.band_bins), dtype=np.float32),
+            # log-mel frames (dB, before the top_db floor), stored frames-first so each
+            # block writes contiguous rows; starts as silence
+            'mel_db': np.full((self.n_frames, N_MELS), 10.0 * np.log10(AMIN), dtype=np.float32),
+            'mel': np.zeros((self.n_frames, N_MELS), dtype=np.float32),
+            'diff': np.zeros((self.n_frames - 1, N_MELS), dtype=np.float32),
+            'onset': np.zeros(self.n_frames, dtype=np.float32),
+        }
+        return self._scratch
+
+    def _store(self, samples):
+        """Write a block of samples into the ring, encoding to the storage dtype."""
+        n = len(samples)
+        if n >= self.buffer_samples:
+            samples = samples[-self.buffer_samples:]
+            n = self.buffer_samples
+        if self.history_dtype == np.int16:
+            samples = np.clip(samples, -1.0, 1.0) * (INT16_SCALE - 1)
+        first = min(n, self.buffer_samples - self.write_pos)
+        self.audio_buffer[self.write_pos:self.write_pos + first] = samples[:first]
+        self.audio_buffer[:n - first] = samples[first:]
+        self.write_pos = (self.write_pos + n) % self.buffer_samples
+
+    def _read_window(self, start, out):
+        """
+        Decode chronological samples [start, start + len(out)) into out (float32).
         
-        try:
-            self.stream = self.pa.open(
-                format=pyaudio.paFloat32,
-                channels=self.channels,
-                rate=self.sample_rate,
-                input=True,
-                input_device_index=self.input_device_index,
-                frames_per_buffer=self.buffer_size,
-            )
-        except Exception as e:
-            print(f"[LibrosaBeatDetector] Error opening audio stream: {e}")
-            self.running = False
+        Positions outside the buffer read as zero, which gives the centered STFT padding.
+        """
+        n = len(out)
+        lo = max(start, 0)
+        hi = min(start + n, self.buffer_samples)
+        out[:max(0, lo - start)] = 0.0
+        out[max(0, hi - start):] = 0.0
+        if hi <= lo:
+            return out
+        count = hi - lo
+        ring_start = (self.write_pos + lo) % self.buffer_samples
+        first = min(count, self.buffer_samples - ring_start)
+        dst = out[lo - start:hi - start]
+        dst[:first] = self.audio_buffer[ring_start:ring_start + first]
+        dst[first:] = self.audio_buffer[:count - first]
+        if self.history_dtype == np.int16:
+            dst *= 1.0 / INT16_SCALE
+        return out
+
+    def _peak(self):
+        peak = max(float(self.audio_buffer.max()), -float(self.audio_buffer.min()))
+        if self.history_dtype == np.int16:
+            peak /= INT16_SCALE
+        return peak
+
+    def _update_frames(self):
+        """Compute the log-mel frames for all audio that arrived since the last call."""
+        sc = self._ensure_scratch()
+        plan = self.plan
+        frames, spectrum, power, ring = sc['frames'], sc['spectrum'], sc['power'], sc['mel_db']
+        hop, n_fft = self.hop_length, self.n_fft
+        half = n_fft // 2
+        # frames whose window is complete, and the stream position of the ring's oldest sample
+        ready = max(0, (self.samples_total - half) // hop + 1)
+        oldest = self.samples_total - self.buffer_samples
+        if ready - self.frames_total > self.n_frames:
+            # more new audio than the ring holds; the older frames would be overwritten anyway
+            self.frames_total = ready - self.n_frames
+        while self.frames_total < ready:
+            t0 = self.frames_total
+            nf = min(STFT_BLOCK_FRAMES, ready - t0, self.n_frames - self.mel_pos)
+            block = sc['block'][:(nf - 1) * hop + n_fft]
+            self._read_window(t0 * hop - half - oldest, block)
+            np.multiply(sliding_window_view(block, n_fft)[::hop], plan.window, out=frames[:nf])
+            if _FFT_OUT:
+                np.fft.rfft(frames[:nf], axis=1, out=spectrum[:nf])
+            else:
+                spectrum[:nf] = np.fft.rfft(frames[:nf], axis=1)
+            # power and mel projection only over the bins the filterbank uses
+            np.abs(spectrum[:nf, plan.bin_lo:plan.bin_hi], out=power[:nf])
+            np.square(power[:nf], out=power[:nf])
+            rows = ring[self.mel_pos:self.mel_pos + nf]
+            np.dot(power[:nf], plan.mel_band_t, out=rows)
+            # power_to_db (ref=1.0); the top_db floor depends on the window, see _onset_strength
+            np.maximum(rows, AMIN, out=rows)
+            np.log10(rows, out=rows)
+            rows *= 10.0
+            self.mel_pos = (self.mel_pos + nf) % self.n_frames
+            self.frames_total += nf
+
+    def _onset_strength(self, n_frames=None):
+        """
+        Onset strength envelope of the last n_frames (default: the whole buffer).
+        
+        Same pipeline as librosa.onset.onset_strength (centered STFT, power mel
+        spectrogram, power_to_db, positive first difference averaged over bands),
+        but the spectrum is computed incrementally, STFT_BLOCK_FRAMES at a time
+        into reused scratch buffers, using the shared AnalysisPlan. Short and full
+        windows read the same frames.
+        """
+        self._update_frames()
+        sc = self._scratch
+        n = self.n_frames if n_frames is None else min(n_frames, self.n_frames)
+        
+        # oldest-first copy of the last n log-mel frames
+        mel = sc['mel'][:n]
+        start = (self.mel_pos - n) % self.n_frames
+        first = min(n, self.n_frames - start)
+        mel[:first] = sc['mel_db'][start:start + first]
+        mel[first:] = sc['mel_db'][:n - first]
+        np.maximum(mel, mel.max() - TOP_DB, out=mel)
+        
+        # Positive difference between frames, averaged over mel bands; shifted like librosa's centered envelope
+        diff = sc['diff'][:n - 1]
+        np.subtract(mel[1:], mel[:-1], out=diff)
+        np.maximum(diff, 0.0, out=diff)
+        onset = sc['onset'][:n]
+        pad = 1 + (self.n_fft // (2 * self.hop_length) if CENTER else 0)
+        onset[:pad] = 0.0
+        np.mean(diff[:n - pad], axis=1, out=onset[pad:])
+        if DETREND:
+            onset[:] = scipy.signal.lfilter([1.0, -1.0], [1.0, -0.99], onset)
+        return onset
+
+    def process_samples(self, samples):
+        """Add a block of mono samples to the rolling buffer and recalculate BPM when due."""
+        if self.requested_quality != self.quality:
+            if DEBUG:
+                print(f"[LibrosaBeatDetector] Quality level {self.quality} -> {self.requested_quality}")
+            self.quality = self.requested_quality
+            self._configure()
+        self.audio_time += len(samples) / self.sample_rate
+        self.samples_since_update += len(samples)
+        self.samples_since_fast += len(samples)
+        
+        if self.decimate > 1:
+            filtered, self._decimate_zi = scipy.signal.sosfilt(self._decimate_sos, samples, zi=self._decimate_zi)
+            samples = filtered[self._decimate_phase::self.decimate].astype(np.float32)
+            self._decimate_phase = (self._decimate_phase - len(filtered)) % self.decimate
+        self._store(samples)
+        self.samples_total += len(samples)
+        
+        # Keep the mel frames current in small batches, so an update only has to finish the last few
+        # (not while catching up on a backlog: frames that scroll out unanalysed are skipped)
+        if (self.samples_total - self.frames_total * self.hop_length >= STFT_BLOCK_FRAMES * self.hop_length
+                and self.backlog <= MAX_INPUT_AGE):
+            self._update_frames()
+        
+        update_due = self.samples_since_update >= self.update_samples
+        fast_due = self.fast_lock and self.samples_since_fast >= self.fast_samples
+        if not (update_due or fast_due) or not self.analysis_allowed():
             return
         
-        if DEBUG:
-            print(f"[LibrosaBeatDetector] Started - buffer: {BUFFER_DURATION}s, update: {UPDATE_INTERVAL}s")
+        # Recalculate BPM at update interval
+        if update_due:
+            with self.measure_analysis(self.update_interval) as timing:
+                self._calculate_bpm()
+            self.record_estimate()
+            # an overrun pushes the next update back (see AudioStreamDetector.measure_analysis)
+            self.samples_since_update = -int(timing.delay * self.sample_rate)
+            self.samples_since_fast = -int(self.timing('fast').delay * self.sample_rate)
+        else:
+            with self.measure_analysis(self.fast_interval, kind='fast') as timing:
+                changed = self._calculate_fast()
+            if changed:
+                self.record_estimate()
+            self.samples_since_fast = -int(timing.delay * self.sample_rate)
+
+    def _estimate(self, onset_env, hop_length, start_bpm):
+        """
+        Estimate the tempo of an onset envelope from its Inter-Beat Intervals (IBI).
         
-        while self.running:
-            try:
-                # Read audio chunk
-                audio_data = self.stream.read(self.buffer_size, exception_on_overflow=False)
-                samples = np.frombuffer(audio_data, dtype=np.float32)
-                
-                # Roll buffer and add new samples
-                self.audio_buffer = np.roll(self.audio_buffer, -len(samples))
-                self.audio_buffer[-len(samples):] = samples
-                
-                self.samples_since_update += len(samples)
+        Returns:
+            Tuple (raw_bpm, confidence); raw_bpm is None when no tempo was found
+        """
+        # Use beat_track to find beat locations
+        tempo, beats = librosa.beat.beat_track(
+            onset_envelope=onset_env,
+            sr=self.analysis_rate,
+            hop_length=hop_length,
+            start_bpm=start_bpm,
+            tightness=self.preset['tightness']
+        )
+        
+        if len(beats) < 2:
+            if DEBUG:
+                print("[LibrosaBeatDetector] Not enough beats detected")
+            return None, 0.0
+
+        # Refine beat locations using parabolic interpolation for sub-frame accuracy
+        refined_beats = []
+        for b in beats:
+            if 0 < b < len(onset_env) - 1:
+                alpha = onset_env[b - 1]
+                beta = onset_env[b]
+                gamma = onset_env[b + 1]
                 
-                # Recalculate BPM at update interval
-                if self.samples_since_update >= self.update_samples:
-                    self._calculate_bpm()
-                    self.samples_since_update = 0
-                    
-            except Exception as e:
-                if self.running:
-                    print(f"[LibrosaBeatDetector] Error reading audio: {e}")
-                    time.sleep(0.1)
+                # Only interpolate if distinct local peak
+                if beta >= alpha and beta >= gamma and (alpha - 2 * beta + gamma) != 0:
+                    p = 0.5 * (alpha - gamma) / (alpha - 2 * beta + gamma)
+                    refined_beats.append(b + p)
+                else:
+                    refined_beats.append(b)
+            else:
+                refined_beats.append(b)
+        
+        refined_beats = np.array(refined_beats)
+
+        # Analyze beat timestamps for higher precision
+        beat_times = refined_beats * hop_length / self.analysis_rate
+        ibis = np.diff(beat_times)
+        # seconds from each beat to the end of the window, for the timeline
+        self.beat_ages = len(onset_env) * hop_length / self.analysis_rate - beat_times
+
+        # Filter out unreasonable intervals (e.g. outside 40-220 BPM range)
+        # 220 BPM ~= 0.27s, 40 BPM = 1.5s
+        valid_ibis = ibis[(ibis > 0.27) & (ibis < 1.5)]
+        
+        if len(valid_ibis) == 0:
+            if DEBUG:
+                print("[LibrosaBeatDetector] No valid beat intervals found")
+            return None, 0.0
+        
+        # Cluster Averaging:
+        # 1. Get the median to find the "center" of the rhythm suitable for rejecting outliers
+        median_ibi = np.median(valid_ibis)
+        
+        # 2. Select intervals within 5% of the median (rejects outliers like missed/double beats)
+        tolerance = 0.05
+        cluster_ibis = valid_ibis[np.abs(valid_ibis - median_ibi) <= (tolerance * median_ibi)]
         
-        self._cleanup()
+        # 3. Take the MEAN of this cluster to get sub-sample precision
+        # This fixes the "snapping" issue of just using the single median value
+        if len(cluster_ibis) > 0:
+            mean_ibi = np.mean(cluster_ibis)
+            raw_bpm = 60.0 / mean_ibi
+        else:
+            raw_bpm = 60.0 / median_ibi
+        
+        return raw_bpm, self._estimate_confidence(onset_env, beats, ibis, cluster_ibis, tolerance)
 
     def _calculate_bpm(self):
-        """Calculate BPM from the current audio buffer using Inter-Beat Intervals (IBI)."""
+        """Calculate BPM from the full buffer (the long, precise estimate)."""
         try:
             # Skip if buffer is mostly silence
-            if np.max(np.abs(self.audio_buffer)) < 0.01:
+            if self._peak() < 0.01:
                 if DEBUG:
                     print("[LibrosaBeatDetector] Buffer is silent, skipping")
+                self.confidence = 0.0
                 return
             
+            # Skip the full rescan while a locked reference agrees with our estimate,
+            # but re-check regularly so we still notice when the audio drifts away
+            ref_bpm = self.reference_bpm()
+            if (ref_bpm and self.bpm > 0 and abs(self.bpm - ref_bpm) <= REFERENCE_TOLERANCE * ref_bpm
+                    and self.reference_skips < REFERENCE_MAX_SKIPS):
+                self.reference_skips += 1
+                if DEBUG:
+                    print(f"[LibrosaBeatDetector] Reference {ref_bpm:.2f} agrees, skipping rescan")
+                return
+            self.reference_skips = 0
+            
             # Calculate onset strength envelope
-            onset_env = librosa.onset.onset_strength(
-                y=self.audio_buffer,
-                sr=self.sample_rate,
-                hop_length=HOP_LENGTH,
-                fmax=FMAX,
-                center=CENTER,
-                detrend=DETREND,
-            )
+            onset_env = self._onset_strength()
+            self.history.set_onset(onset_env)
             
-            # Adaptive starting BPM: if we have a valid previous reading, use it
+            # Adaptive starting BPM: prefer a locked reference, else a valid previous reading
             # This prevents octave jumps (60 vs 120) and helps lock on
-            current_start_bpm = self.bpm if self.bpm > 0 else START_BPM
-
-            # Use beat_track to find beat locations
-            # tightness=100 helps lock onto stable beats in electronic music
-            tempo, beats = librosa.beat.beat_track(
-                onset_envelope=onset_env,
-                sr=self.sample_rate,
-                hop_length=HOP_LENGTH,
-                start_bpm=current_start_bpm,
-                tightness=100
-            )
+            if ref_bpm:
+                current_start_bpm = ref_bpm
+            else:
+                current_start_bpm = self.bpm if self.bpm > 0 else START_BPM
+
+            raw_bpm, confidence = self._estimate(onset_env, self.hop_length, current_start_bpm)
+            if raw_bpm is None:
+                self.confidence = 0.0
+                return
+            self.record_beats(self.beat_ages)
+            t = self.audio_time
             
-            if len(beats) < 2:
+            if self.provisional:
+                # Showing a quick reading after a tempo change: the buffer still holds the old
+                # track, so hand over only once the full window agrees (or has been replaced)
+                settled = self.samples_total - self.provisional_since >= self.buffer_samples
+                if abs(raw_bpm - self.bpm) > FAST_TOLERANCE * self.bpm and not settled:
+                    if DEBUG:
+                        print(f"[LibrosaBeatDetector] Full window {raw_bpm:.2f} BPM, keeping provisional {self.bpm}")
+                    return
+                self.provisional = False
+                # no smoothing across the tempo change
+                self.set_estimate(raw_bpm, confidence, t, smooth=False)
                 if DEBUG:
-                    print("[LibrosaBeatDetector] Not enough beats detected")
+                    print(f"[LibrosaBeatDetector] Full window took over: {self.bpm} BPM, Confidence: {self.confidence:.2f}")
                 return
-
-            # Refine beat locations using parabolic interpolation for sub-frame accuracy
-            refined_beats = []
-            for b in beats:
-                if 0 < b < len(onset_env) - 1:
-                    alpha = onset_env[b - 1]
-                    beta = onset_env[b]
-                    gamma = onset_env[b + 1]
-                    
-                    # Only interpolate if distinct local peak
-                    if beta >= alpha and beta >= gamma and (alpha - 2 * beta + gamma) != 0:
-                        p = 0.5 * (alpha - gamma) / (alpha - 2 * beta + gamma)
-                        refined_beats.append(b + p)
-                    else:
-                        refined_beats.append(b)
-                else:
-                    refined_beats.append(b)
             
-            refined_beats = np.array(refined_beats)
-
-            # Analyze beat timestamps for higher precision
-            beat_times = refined_beats * HOP_LENGTH / self.sample_rate
-            ibis = np.diff(beat_times)
-
-            # Filter out unreasonable intervals (e.g. outside 40-220 BPM range)
-            # 220 BPM ~= 0.27s, 40 BPM = 1.5s
-            valid_ibis = ibis[(ibis > 0.27) & (ibis < 1.5)]
+            # The IBIs span the whole buffer, so the reading describes the tempo half a buffer ago
+            self.set_estimate(raw_bpm, confidence, t, lag=self.buffer_duration / 2, smooth=ENABLE_SMOOTHING)
             
-            if len(valid_ibis) > 0:
-                # Cluster Averaging:
-                # 1. Get the median to find the "center" of the rhythm suitable for rejecting outliers
-                median_ibi = np.median(valid_ibis)
-                
-                # 2. Select intervals within 5% of the median (rejects outliers like missed/double beats)
-                tolerance = 0.05
-                cluster_ibis = valid_ibis[np.abs(valid_ibis - median_ibi) <= (tolerance * median_ibi)]
-                
-                # 3. Take the MEAN of this cluster to get sub-sample precision
-                # This fixes the "snapping" issue of just using the single median value
-                if len(cluster_ibis) > 0:
-                    mean_ibi = np.mean(cluster_ibis)
-                    raw_bpm = 60.0 / mean_ibi
-                else:
-                    raw_bpm = 60.0 / median_ibi
-                
-                # Apply smoothing if enabled
-                if ENABLE_SMOOTHING and self.bpm > 0:
-                    # Exponential moving average
-                    new_bpm = (self.bpm * (1 - SMOOTHING_ALPHA)) + (raw_bpm * SMOOTHING_ALPHA)
-                    self.bpm = round(new_bpm, 1)
+            if DEBUG:
+                if ENABLE_SMOOTHING:
+                    print(f"[LibrosaBeatDetector] Raw: {raw_bpm:.2f} BPM, Smoothed: {self.bpm} BPM, Confidence: {self.confidence:.2f}")
                 else:
-                    self.bpm = round(raw_bpm, 1)
-                
-                if DEBUG:
-                    if ENABLE_SMOOTHING:
-                        print(f"[LibrosaBeatDetector] Raw: {raw_bpm:.2f} BPM, Smoothed: {self.bpm} BPM")
-                    else:
-                        print(f"[LibrosaBeatDetector] BPM: {self.bpm}")
-            elif DEBUG:
-                print("[LibrosaBeatDetector] No valid beat intervals found")
+                    print(f"[LibrosaBeatDetector] BPM: {self.bpm}, Confidence: {self.confidence:.2f}")
                     
         except Exception as e:
             if DEBUG:
                 print(f"[LibrosaBeatDetector] Error calculating BPM: {e}")
 
-    def _cleanup(self):
-        """Clean up audio resources."""
-        if self.stream:
-            try:
-                self.stream.stop_stream()
-                self.stream.close()
-            except Exception:
-                pass
-        if self.pa:
-            try:
-                self.pa.terminate()
-            except Exception:
-                pass
-
-    def stop(self):
-        """Signal the thread to stop."""
-        self.running = False
+    def _calculate_fast(self):
+        """
+        Quick estimate over the last FAST_WINDOW seconds at a coarse hop.
+        
+        Switches to a provisional reading when FAST_CONFIRM consecutive quick
+        estimates agree on a tempo other than the one shown.
+        
+        Returns:
+            True if the shown BPM changed
+        """
+        try:
+            if self._peak() < 0.01 or self.samples_total < FAST_WINDOW * self.analysis_rate:
+                return False
+            ref_bpm = self.reference_bpm()
+            if ref_bpm and self.bpm > 0 and abs(self.bpm - ref_bpm) <= REFERENCE_TOLERANCE * ref_bpm:
+                return False
+            
+            onset_env = self._onset_strength(self.fast_frames)
+            # coarse hop: max-pool groups of frames so short onsets survive
+            factor = self.fast_hop_factor
+            usable = len(onset_env) - len(onset_env) % factor
+            coarse = onset_env[len(onset_env) - usable:].reshape(-1, factor).max(axis=1)
+            raw_bpm, confidence = self._estimate(coarse, self.hop_length * factor, ref_bpm or START_BPM)
+            if raw_bpm is None or confidence < LOW_CONFIDENCE:
+                self.fast_streak = 0
+                return False
+            
+            if self.bpm > 0:
+                # same tempo, or an octave of it (the short window is prone to those): nothing to do
+                ratio = raw_bpm / self.bpm
+                if any(abs(ratio - r) <= FAST_TOLERANCE * r for r in (0.5, 1.0, 2.0)):
+                    self.fast_streak = 0
+                    return False
+            
+            if self.fast_streak and abs(raw_bpm - self.fast_candidate) <= FAST_TOLERANCE * self.fast_candidate:
+                self.fast_streak += 1
+            else:
+                self.fast_streak = 1
+            self.fast_candidate = raw_bpm
+            if self.fast_streak < FAST_CONFIRM:
+                return False
+            
+            self.fast_streak = 0
+            self.provisional = True
+            self.provisional_since = self.samples_total
+            self.set_estimate(raw_bpm, confidence, self.audio_time, smooth=False)
+            if DEBUG:
+                print(f"[LibrosaBeatDetector] Provisional: {self.bpm} BPM, Confidence: {self.confidence:.2f}")
+            return True
+        
+        except Exception as e:
+            if DEBUG:
+                print(f"[LibrosaBeatDetector] Error in quick estimate: {e}")
+            return False
+
+    @staticmethod
+    def _estimate_confidence(onset_env, beats, ibis, cluster_ibis, tolerance):
+        """
+        Score how trustworthy an estimate is, from 0.0 to 1.0.
+        
+        Geometric mean of three cues:
+        - cluster fraction: share of all IBIs inside the tempo cluster
+        - IBI stability: spread of the cluster relative to the allowed tolerance
+        - onset prominence: how much the beat frames stand out from the median onset
+        """
+        if len(ibis) == 0 or len(cluster_ibis) == 0:
+            return 0.0
+        
+        cluster_fraction = len(cluster_ibis) / len(ibis)
+        
+        cv = np.std(cluster_ibis) / np.mean(cluster_ibis)
+        stability = max(0.0, 1.0 - cv / tolerance)
+        
+        beat_strength = float(np.mean(onset_env[beats]))
+        prominence = 0.0
+        if beat_strength > 0:
+            prominence = max(0.0, (beat_strength - float(np.median(onset_env))) / beat_strength)
+        
+        return float((cluster_fraction * stability * prominence) ** (1.0 / 3.0))
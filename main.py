@@ -1,23 +1,29 @@
 import pyaudio
 import argparse
 import logging
+import multiprocessing
 import threading
-import json
+import time
 import tkinter as tk
 import os
-from beat_detector import resolve_device_index, DeviceDetector
-from ui import OverlayController, SettingsWindow
-from midi_clock import MIDIClockSender
+from beat_detector import resolve_device_index, list_input_devices, DeviceDetector
+from capture import CaptureHub
+from config_store import ConfigStore
+from device_monitor import DeviceMonitor, ReattachBackoff, plan_reattach
+from ui import OverlayController, CanvasOverlayController, SettingsWindow
+from midi_clock import MIDIClockRouter, MIDIClockReceiver, DEFAULT_RAMP_RATE
+from governor import QualityGovernor, GOVERNOR_INTERVAL
+from recorder import SessionRecorder, RECORDINGS_DIR
+from timeline import TimelineWriter, TIMELINES_DIR
+from shared_state import SharedStateTable
 
 # =============================================================================
 # DETECTOR SELECTION - Toggle between aubio and librosa implementations
 # =============================================================================
 USE_LIBROSA = True  # Set to False to use original aubio-based detector
-
-if USE_LIBROSA:
-    from librosa_beat_detector import LibrosaBeatDetector
-else:
-    from beat_detector import BeatDetector
+# "detector_backend" in config.json overrides this: "librosa", "aubio" or "streaming"
+# (lightweight spectral-flux/comb-filter detector for low-power hardware)
+DETECTOR_BACKENDS = ('librosa', 'aubio', 'streaming')
 
 # Constants (used by aubio detector)
 BUFFER_SIZE = 256
@@ -26,18 +32,150 @@ FORMAT = pyaudio.paFloat32
 METHOD = "default"
 SAMPLE_RATE = 44100
 
+# How often the detectors' overload counters are logged (see AudioStreamDetector.get_stats)
+STATS_INTERVAL_MS = 30000
+
+# Seconds to wait for a stopping detector or capture to close its stream
+AUDIO_RELEASE_TIMEOUT = 3.0
+
 # Add a global event to signal threads to stop
 stop_event = threading.Event()
 
+# Slots that pick a `channel` share one stream per physical device
+capture_hub = CaptureHub()
+
+# With "batch_analysis", streaming detectors share one tempo analyzer (started on first use)
+tempo_batch = None
+
+# Session recorders and BPM timelines by slot index (slots with "record_seconds" / "timeline"),
+# kept across detector restarts
+recorders = {}
+timelines = {}
+
+# With "shared_state", every slot is published to other local processes (created on first use)
+shared_table = None
+
+
+def start_detector(device_index, slot=None, slot_index=None):
+    """Create and start a beat detector (see create_detector); if that fails, nothing stays subscribed."""
+    detector = create_detector(device_index, slot, slot_index)
+    try:
+        detector.start()
+    except Exception:
+        _close_source(detector.source)
+        raise
+    return detector
+
+
+def _close_source(source):
+    # the detector closes its source when its thread ends; one that never ran can't
+    if source is not None:
+        source.close()
+
+
+def create_detector(device_index, slot=None, slot_index=None):
+    """Create (not start) a beat detector of the selected backend for a device index and slot config."""
+    slot = slot or {}
+    detector = _create_backend(device_index, slot)
+    try:
+        _attach_session_outputs(detector, slot, slot_index)
+    except Exception:
+        _close_source(detector.source)
+        raise
+    return detector
+
+
+def _attach_session_outputs(detector, slot, slot_index):
+    """Attach the slot's session recorder, BPM timeline and shared state publisher, as configured."""
+    seconds = slot.get('record_seconds')
+    if seconds and slot_index is not None:
+        recorder = recorders.get(slot_index)
+        if recorder is None:
+            # created once: resizing a file a stopping detector may still write to is unsafe
+            path = os.path.join(RECORDINGS_DIR, f"slot{slot_index}.bpmrec")
+            try:
+                recorder = recorders[slot_index] = SessionRecorder(path, seconds)
+                logging.info("Recording the last %ss of slot %d to %s", seconds, slot_index, path)
+            except OSError:
+                # e.g. a full disk: run the slot without recording
+                logging.exception("Cannot create session recording %s", path)
+        detector.recorder = recorder
+    if slot.get('timeline') and slot_index is not None:
+        writer = timelines.get(slot_index)
+        if writer is None:
+            path = os.path.join(TIMELINES_DIR, f"slot{slot_index}.bpmtl")
+            try:
+                writer = timelines[slot_index] = TimelineWriter(path)
+            except OSError:
+                logging.exception("Cannot open BPM timeline %s", path)
+        detector.timeline = writer
+    if config.get('shared_state') and slot_index is not None:
+        global shared_table
+        if shared_table is None:
+            try:
+                shared_table = SharedStateTable()
+            except OSError:
+                logging.exception("Cannot create the shared state segment")
+        if shared_table is not None:
+            detector.shared_state = shared_table.slot(slot_index)
+
+
+def close_session_outputs():
+    """Write out the session recordings and BPM timelines and withdraw the shared state (on shutdown)."""
+    for writer in list(recorders.values()) + list(timelines.values()):
+        try:
+            writer.flush()
+        except Exception:
+            logging.exception("Error flushing %s", writer.path)
+    if shared_table is not None:
+        shared_table.close()
 
 
+def _create_backend(device_index, slot):
+    channel = slot.get('channel')
+    backend = config.get('detector_backend') or ('librosa' if USE_LIBROSA else 'aubio')
+    if backend not in DETECTOR_BACKENDS:
+        logging.warning("Unknown detector_backend %r, using librosa", backend)
+        backend = 'librosa'
 
+    source = capture_hub.subscribe(device_index, channel) if channel is not None else None
+    try:
+        if backend == 'aubio':
+            from beat_detector import BeatDetector
+            return BeatDetector(METHOD, BUFFER_SIZE, SAMPLE_RATE, CHANNELS, FORMAT, device_index, source=source)
+        if backend == 'streaming':
+            from streaming_beat_detector import StreamingBeatDetector, BatchTempoAnalyzer
+            global tempo_batch
+            if config.get('batch_analysis') and tempo_batch is None:
+                tempo_batch = BatchTempoAnalyzer()
+                tempo_batch.start()
+            return StreamingBeatDetector(input_device_index=device_index, source=source, batch=tempo_batch)
+        from librosa_beat_detector import LibrosaBeatDetector
+        return LibrosaBeatDetector(input_device_index=device_index, source=source,
+                                   history_dtype=slot.get('history_dtype'),
+                                   memory_budget_mb=slot.get('memory_budget_mb'),
+                                   fast_lock=slot.get('fast_lock'),
+                                   preset=config.get('librosa_preset'))
+    except Exception:
+        # e.g. a bad preset: release the channel (and the device, if it was its last listener)
+        _close_source(source)
+        raise
+
+
+# Worker processes of the frozen (PyInstaller) app start here; no-op otherwise
+multiprocessing.freeze_support()
 
 # Parse command line arguments
 parser = argparse.ArgumentParser()
 parser.add_argument("--list-devices", help="List all audio input devices", action="store_true")
 parser.add_argument("--settings", help="Open settings window on start", action="store_true")
 parser.add_argument("--debug", help="Enable debug logging", action="store_true")
+subcommands = parser.add_subparsers(dest='command')
+analyze_parser = subcommands.add_parser('analyze', help="Analyse the BPM of every audio file in a folder and exit")
+analyze_parser.add_argument("folder")
+analyze_parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+analyze_parser.add_argument("--cache", default="analysis_cache.json", help="Result cache file")
+analyze_parser.add_argument("--csv", help="Also write the results to this CSV file")
 args = parser.parse_args()
 
 # configure logging
@@ -48,19 +186,26 @@ if args.debug:
 if args.list_devices:
     device_detector = DeviceDetector()
     device_detector.list_audio_devices()
-else:
+elif args.command == 'analyze':
+    # Worker processes re-import this module (with our arguments); only the parent runs the analysis
+    if __name__ == '__main__':
+        from library import analyze_folder, write_csv
+        # same settings as the live overlay, so both show the same BPM
+        results = analyze_folder(args.folder, preset=ConfigStore('config.json').config.get('librosa_preset'),
+                                 workers=args.workers, cache_path=args.cache)
+        for path, result in results:
+            if 'error' in result:
+                print(f"{'error':>6}        {path}")
+            else:
+                print(f"{result['bpm']:6.1f} ({result['confidence']:.2f})  {path}")
+        if args.csv:
+            write_csv(args.csv, results)
+elif __name__ == '__main__':
+    # (the device monitor's helper process re-imports this module too; only the parent runs the overlay)
     logging.info('Starting BPM overlay (args: settings=%s, debug=%s)', args.settings, args.debug)
-    # Load config file
-    try:
-        with open('config.json', 'r') as f:
-            config = json.load(f)
-    except FileNotFoundError:
-        config = {'input_devices': [], 'font_size': 30, 'font_color': 'white', 'bg_color': 'black'}
-
-    # Cleanup deprecated keys
-    for d in config.get('input_devices', []):
-        if 'bpm_scale' in d:
-            del d['bpm_scale']
+    # Load and validate config file (writes are debounced and atomic)
+    config_store = ConfigStore('config.json')
+    config = config_store.config
 
     # Create BeatDetector instances and resolve devices robustly
     beat_detectors = []
@@ -84,18 +229,13 @@ else:
             info = p.get_device_info_by_index(resolved)
             if not device.get('name'):
                 config['input_devices'][i]['name'] = info.get('name')
-                with open('config.json', 'w') as f:
-                    json.dump(config, f, indent=4)
+                config_store.save()
             config['input_devices'][i]['_resolved'] = True
         except Exception:
             logging.exception("Error persisting device name for slot %d", i)
 
         try:
-            if USE_LIBROSA:
-                beat_detector = LibrosaBeatDetector(input_device_index=resolved)
-            else:
-                beat_detector = BeatDetector(METHOD, BUFFER_SIZE, SAMPLE_RATE, CHANNELS, FORMAT, resolved)
-            beat_detector.start()
+            beat_detector = start_detector(resolved, device, i)
             beat_detectors.append(beat_detector)
         except Exception:
             logging.exception("Failed to start BeatDetector for slot %d (device index %s)", i, resolved)
@@ -113,60 +253,109 @@ else:
     except Exception:
         logging.exception('Failed to set app icon')
 
-    # Initialize OverlayController
-    overlay_controller = OverlayController(root, beat_detectors, config, stop_event)
+    # Initialize overlay: one window per slot, or all slots on one canvas window
+    canvas_overlay = config.get('overlay_renderer') == 'canvas'
+    if canvas_overlay and not CanvasOverlayController.supported():
+        logging.warning("overlay_renderer 'canvas' needs a transparent window (Windows only); using one window per slot")
+        canvas_overlay = False
+    if canvas_overlay:
+        overlay_controller = CanvasOverlayController(root, beat_detectors, config, stop_event)
+    else:
+        overlay_controller = OverlayController(root, beat_detectors, config, stop_event)
     overlay_controller.create_windows()
 
-    # Initialize MIDI Clock sender
-    midi_sender = None
-    last_bpm_sent = None
+    # Initialize MIDI Clock router (one timing thread for all clock outputs)
+    midi_router = MIDIClockRouter()
+    # Optional MIDI Clock input used as tempo reference for one slot
+    midi_receiver = None
+    
+    def get_midi_routes():
+        """Return the configured (source slot, port name) clock mappings.
+        
+        `midi_routes` lists any number of {"slot", "port"} mappings; without it the
+        single `midi_source_slot` -> `midi_port` mapping is used.
+        """
+        if not config.get('midi_enabled', False):
+            return []
+        routes = config.get('midi_routes')
+        if routes is None:
+            routes = [{'slot': config.get('midi_source_slot', 0), 'port': config.get('midi_port')}]
+        mappings = []
+        for r in routes:
+            port = r.get('port')
+            if not port or port == "No MIDI ports found":
+                continue
+            if any(port == p for _, p in mappings):
+                logging.warning(f"MIDI Clock: Port '{port}' is mapped more than once, ignoring slot {r.get('slot')}")
+                continue
+            mappings.append((int(r.get('slot', 0)), port))
+        return mappings
+    
+    def update_midi_reference():
+        """Open/close the MIDI Clock input and hand it to the configured slot's detector.
+        
+        With `midi_input_port` set, the received clock is shown next to the
+        `midi_input_slot` estimate and seeds/confirms its analysis.
+        """
+        global midi_receiver
+        
+        port = config.get('midi_input_port')
+        if midi_receiver is not None and midi_receiver.port_name != port:
+            midi_receiver.close()
+            midi_receiver = None
+            logging.info("MIDI Clock: Reference input closed")
+        elif midi_receiver is not None and midi_receiver.port is None:
+            # The port failed to open (e.g. controller not plugged in yet): retry on this pass, like the routes
+            midi_receiver = None
+        if port and midi_receiver is None:
+            midi_receiver = MIDIClockReceiver(port)
+        
+        slot = config.get('midi_input_slot', 0)
+        for i, bd in enumerate(beat_detectors):
+            if bd is not None:
+                bd.reference = midi_receiver if i == slot else None
     
     def update_midi_clock():
-        """Monitor BPM and update MIDI clock. Called every second."""
-        global midi_sender, last_bpm_sent
+        """Apply MIDI config changes and keep each route attached to its source. Called every second.
         
+        BPM changes reach the routes directly through the detectors' BPM listeners;
+        this loop only reconciles ports, ramp rate and source slots with the config.
+        """
         if stop_event.is_set():
             return
         
         try:
-            midi_enabled = config.get('midi_enabled', False)
-            midi_port = config.get('midi_port')
-            source_slot = config.get('midi_source_slot', 0)
-            
-            # Start/stop MIDI sender based on config
-            if midi_enabled and midi_port and midi_port != "No MIDI ports found":
-                # Initialize sender if needed
-                if midi_sender is None or midi_sender.port_name != midi_port:
-                    if midi_sender:
-                        midi_sender.close()
-                    midi_sender = MIDIClockSender(midi_port)
-                    last_bpm_sent = None
-                    logging.info(f"MIDI Clock: Initialized with port '{midi_port}'")
+            wanted = get_midi_routes()
+            ramp_rate = float(config.get('midi_ramp_rate', DEFAULT_RAMP_RATE))
+
+            # Drop routes that are no longer configured or whose port failed
+            for route in list(midi_router.routes):
+                if (route.slot, route.port_name) not in wanted or route.port is None:
+                    midi_router.remove_route(route)
+                    logging.info(f"MIDI Clock: Removed route slot {route.slot} -> '{route.port_name}'")
+
+            existing = {(route.slot, route.port_name): route for route in midi_router.routes}
+            for slot, port in wanted:
+                route = existing.get((slot, port))
+                if route is None:
+                    route = midi_router.add_route(port, ramp_rate=ramp_rate, slot=slot)
+                    logging.info(f"MIDI Clock: Added route slot {slot} -> '{port}'")
+                route.ramp_rate = ramp_rate
                 
-                # Get BPM from selected source
-                if source_slot < len(beat_detectors) and beat_detectors[source_slot] is not None:
-                    current_bpm = beat_detectors[source_slot].bpm
-                    
-                    # Only update/start if BPM is valid and changed
-                    if current_bpm > 0:
-                        if not midi_sender.is_running():
-                            # First valid BPM - start the clock
-                            midi_sender.set_bpm(current_bpm)
-                            midi_sender.start()
-                            last_bpm_sent = current_bpm
-                            logging.info(f"MIDI Clock: Started with initial BPM {current_bpm:.2f}")
-                        elif current_bpm != last_bpm_sent:
-                            # BPM changed - update it
-                            midi_sender.set_bpm(current_bpm)
-                            last_bpm_sent = current_bpm
-                            logging.debug(f"MIDI Clock: Updated to BPM {current_bpm:.2f}")
-            else:
-                # MIDI disabled or no port - stop sender if running
-                if midi_sender:
-                    midi_sender.close()
-                    midi_sender = None
-                    last_bpm_sent = None
-                    logging.info("MIDI Clock: Disabled")
+                # Follow the selected source (re-attach when detectors were recreated)
+                source = beat_detectors[slot] if slot < len(beat_detectors) else None
+                if source is None:
+                    route.detach()
+                elif route.source is not source:
+                    route.attach(source)
+
+            if wanted and not midi_router.running:
+                midi_router.start()
+            elif not wanted and midi_router.running:
+                midi_router.close()
+                logging.info("MIDI Clock: Disabled")
+
+            update_midi_reference()
         except Exception:
             logging.exception("Error in MIDI clock update")
         
@@ -179,11 +368,17 @@ else:
     def quit_from_tray():
         # called from tray menu on main thread
         stop_event.set()
-        if midi_sender:
-            try:
-                midi_sender.close()
-            except Exception:
-                logging.exception('Error closing MIDI sender')
+        device_monitor.stop()
+        capture_hub.close()
+        if tempo_batch:
+            tempo_batch.stop()
+        close_session_outputs()
+        try:
+            midi_router.close()
+            if midi_receiver:
+                midi_receiver.close()
+        except Exception:
+            logging.exception('Error closing MIDI router')
         for bd in beat_detectors:
             if bd is not None:
                 try:
@@ -196,12 +391,16 @@ else:
             root.destroy()
 
     def sync_detectors_and_windows():
-        # Stop all existing
+        # Stop all existing; once every PyAudio of ours is terminated, the next one
+        # re-initialises PortAudio and sees devices plugged in since
         for bd in beat_detectors:
-            if bd: 
+            if bd:
                 bd.stop()
-                bd.join(timeout=1)
-        
+        for bd in beat_detectors:
+            if bd:
+                bd.join(timeout=AUDIO_RELEASE_TIMEOUT)
+        capture_hub.close(timeout=AUDIO_RELEASE_TIMEOUT)
+
         beat_detectors.clear()
         
         # Re-init
@@ -215,11 +414,7 @@ else:
                     continue
                 
                 config['input_devices'][i]['_resolved'] = True
-                if USE_LIBROSA:
-                    bd = LibrosaBeatDetector(input_device_index=resolved)
-                else:
-                    bd = BeatDetector(METHOD, BUFFER_SIZE, SAMPLE_RATE, CHANNELS, FORMAT, resolved)
-                bd.start()
+                bd = start_detector(resolved, device, i)
                 beat_detectors.append(bd)
             except Exception:
                 beat_detectors.append(None)
@@ -230,19 +425,131 @@ else:
         overlay_controller.config = config
         overlay_controller.create_windows()
 
+    def replace_detector(i, device, new_bd):
+        old = beat_detectors[i]
+        if old is not None:
+            old.stop()
+            old.join(timeout=AUDIO_RELEASE_TIMEOUT)
+        beat_detectors[i] = new_bd
+        config['input_devices'][i]['_resolved'] = True if new_bd is not None else None
+        overlay_controller.update_window_for_slot(i, new_bd, device)
+
+    def on_devices_changed(devices):
+        """
+        Re-attach the slots whose device vanished, came back or failed. Runs on the Tk thread.
+
+        The device list comes from a fresh PortAudio (see DeviceMonitor); what
+        to do is decided by plan_reattach(). Slots that keep failing are
+        retried with a growing delay (reattach_backoff).
+        """
+        global device_signature
+        if stop_event.is_set():
+            return
+        signature = DeviceMonitor.signature(devices)
+        if signature != device_signature:
+            # something was plugged or unplugged: worth trying every slot again at once
+            device_signature = signature
+            reattach_backoff.reset()
+
+        now = time.monotonic()
+        slots = config['input_devices'][:len(beat_detectors)]
+        plan = plan_reattach(slots, beat_detectors, devices, list_input_devices, reattach_backoff, now)
+        for i in plan.attempts:
+            reattach_backoff.attempted(i, now)
+
+        for i in plan.detach:
+            logging.warning("Device monitor: device for slot %d is gone: name=%s", i, slots[i].get('name'))
+            replace_detector(i, slots[i], None)
+        if plan.restart:
+            # our PortAudio predates the device: restart all inputs so it re-initialises
+            logging.info("Device monitor: device(s) of slot(s) %s are back, restarting all inputs", plan.attempts)
+            sync_detectors_and_windows()
+        for i, index in plan.attach.items():
+            device = slots[i]
+            new_bd = None
+            try:
+                new_bd = start_detector(index, device, i)
+                logging.info("Device monitor: re-attached slot %d to device index %s", i, index)
+            except Exception:
+                logging.exception("Failed to start BeatDetector for slot %d (device index %s)", i, index)
+                new_bd = None
+            replace_detector(i, device, new_bd)
+
+        if (plan.detach or plan.restart or plan.attach) and settings_window and settings_window.window:
+            settings_window.refresh_list()
+
+    # Watch for unplugged/replugged devices off the Tk thread
+    device_signature = None
+    reattach_backoff = ReattachBackoff()
+    device_monitor = DeviceMonitor(lambda devices: root.after(0, on_devices_changed, devices))
+    device_monitor.start()
+
+    def watch_failed_detectors():
+        """Ask the device monitor to re-check while a detector has lost its device and its retry is due."""
+        if stop_event.is_set():
+            return
+        now = time.monotonic()
+        if any(bd is not None and bd.failed and reattach_backoff.due(i, now) for i, bd in enumerate(beat_detectors)):
+            device_monitor.rescan()
+        root.after(2000, watch_failed_detectors)
+
+    last_overloads = {}
+    def log_detector_stats():
+        """Log the detectors' overload counters; warn when a slot fell behind since the last check."""
+        if stop_event.is_set():
+            return
+        for i, bd in enumerate(beat_detectors):
+            if bd is None or not hasattr(bd, 'get_stats'):
+                continue
+            stats = bd.get_stats()
+            logging.debug("Slot %d: %s", i, stats)
+            overloads = (stats['overruns'], stats['stale_skips'])
+            previous = last_overloads.get(id(bd), (0, 0))
+            if overloads != previous:
+                logging.warning("Slot %d is overloaded: %d analysis overrun(s), %d stale update(s) skipped "
+                                "(analysis %.0f ms)", i, overloads[0] - previous[0], overloads[1] - previous[1],
+                                stats['analysis_ms'])
+            last_overloads[id(bd)] = overloads
+        root.after(STATS_INTERVAL_MS, log_detector_stats)
+
+    root.after(STATS_INTERVAL_MS, log_detector_stats)
+
+    # With "cpu_budget" (percent of one core for all detectors), cheaper analysis settings
+    # are chosen while the detectors would exceed it; MIDI clock sources are degraded last
+    governor = None
+    def step_governor():
+        """Hold the detectors' total CPU use under the configured budget. Called every GOVERNOR_INTERVAL."""
+        global governor
+        if stop_event.is_set():
+            return
+        budget = config.get('cpu_budget')
+        if not budget:
+            governor = None
+        else:
+            if governor is None:
+                governor = QualityGovernor(budget / 100.0)
+            governor.budget = budget / 100.0
+            governor.step(beat_detectors, {route.slot for route in midi_router.routes})
+        root.after(int(GOVERNOR_INTERVAL * 1000), step_governor)
+
+    root.after(int(GOVERNOR_INTERVAL * 1000), step_governor)
+
+    root.after(2000, watch_failed_detectors)
+
     def on_settings_save(new_config):
         global config
         config = new_config
-        with open('config.json', 'w') as f:
-            json.dump(config, f, indent=4)
+        config_store.config = config
+        config_store.save()
         
         sync_detectors_and_windows()
 
-    def on_settings_change(new_config):
+    def on_settings_change(new_config, changes=None):
         global config
         config = new_config
         overlay_controller.config = config
-        overlay_controller.update_appearance()
+        # coalesced: applied once per Tk idle cycle, touching only affected slots
+        overlay_controller.request_update(changes)
 
     settings_window = None
     def open_settings_window():
@@ -280,9 +587,15 @@ else:
     except KeyboardInterrupt:
         logging.info('KeyboardInterrupt, shutting down')
         stop_event.set()
-        if midi_sender:
-            try: midi_sender.close()
-            except: pass
+        device_monitor.stop()
+        capture_hub.close()
+        if tempo_batch:
+            tempo_batch.stop()
+        close_session_outputs()
+        try:
+            midi_router.close()
+            if midi_receiver: midi_receiver.close()
+        except: pass
         for beat_detector in beat_detectors:
             if beat_detector is not None:
                 try:
@@ -296,9 +609,15 @@ else:
     except Exception:
         logging.exception('Unhandled exception in mainloop')
         stop_event.set()
-        if midi_sender:
-            try: midi_sender.close()
-            except: pass
+        device_monitor.stop()
+        capture_hub.close()
+        if tempo_batch:
+            tempo_batch.stop()
+        close_session_outputs()
+        try:
+            midi_router.close()
+            if midi_receiver: midi_receiver.close()
+        except: pass
         if tray is not None:
             try: tray.stop()
             except: pass
@@ -307,4 +626,6 @@ else:
                 try: bd.stop()
                 except: pass
         root.destroy()
-        
\ No newline at end of file
+        
+    # Write any debounced config change before exiting
+    config_store.flush()
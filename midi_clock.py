@@ -1,12 +1,17 @@
 """
 MIDI Clock output module for sending BPM synchronization signals.
 
-Implements standard MIDI Clock protocol (24 pulses per quarter note).
+Implements standard MIDI Clock protocol (24 pulses per quarter note), both
+sending (MIDIClockSender, MIDIClockRouter) and receiving (MIDIClockReceiver).
 """
 
+import os
 import threading
 import time
 import logging
+from collections import deque
+
+from beat_detector_base import LOW_CONFIDENCE
 
 try:
     import mido
@@ -16,6 +21,42 @@ except ImportError:
     logging.warning("mido library not available. MIDI Clock output disabled.")
 
 
+# Maximum tempo change applied to the outgoing clock, in BPM per second.
+# Detector updates glide at this rate instead of jumping; 0 disables ramping.
+DEFAULT_RAMP_RATE = 4.0
+
+
+def _ramp_bpm(bpm, target_bpm, ramp_rate, interval):
+    """
+    Move bpm towards target_bpm by at most ramp_rate BPM per second over interval seconds.
+    
+    Returns:
+        The new BPM (target_bpm itself once within reach or when ramping is disabled)
+    """
+    delta = target_bpm - bpm
+    max_step = ramp_rate * interval
+    if ramp_rate <= 0 or abs(delta) <= max_step:
+        return target_bpm
+    return bpm + max_step if delta > 0 else bpm - max_step
+
+
+def _raise_thread_priority():
+    """Best-effort bump of the calling thread's scheduling priority for clock timing."""
+    try:
+        if os.name == 'nt':
+            import ctypes
+            THREAD_PRIORITY_TIME_CRITICAL = 15
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_TIME_CRITICAL)
+        elif hasattr(os, 'sched_setscheduler'):
+            # pid 0 = calling thread on Linux; needs CAP_SYS_NICE, so failure is expected
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(os.sched_get_priority_min(os.SCHED_FIFO)))
+        return True
+    except Exception:
+        logging.debug("MIDI Clock: Could not raise timing thread priority")
+        return False
+
+
 def list_midi_ports():
     """
     List all available MIDI output ports.
@@ -35,23 +76,48 @@ def list_midi_ports():
         return []
 
 
+def list_midi_input_ports():
+    """
+    List all available MIDI input ports.
+    
+    Returns:
+        List of port name strings, or empty list if mido unavailable.
+    """
+    if not MIDO_AVAILABLE:
+        return []
+    
+    try:
+        ports = mido.get_input_names()
+        logging.debug(f"Available MIDI input ports: {ports}")
+        return ports
+    except Exception:
+        logging.exception("Failed to list MIDI input ports")
+        return []
+
+
 class MIDIClockSender:
     """
     Sends MIDI Clock messages at 24 PPQN (pulses per quarter note) based on BPM.
     
-    Runs in a background thread with drift-compensated timing.
+    Runs in a background thread with drift-compensated timing. Tempo changes
+    glide towards the target BPM at ramp_rate BPM per second, applied pulse by pulse.
+    The tempo is set with set_bpm(); to follow a detector, use a MIDIClockRouter
+    route (ClockRoute.attach).
     """
     
-    def __init__(self, port_name=None):
+    def __init__(self, port_name=None, ramp_rate=DEFAULT_RAMP_RATE):
         """
         Initialize MIDI Clock sender.
         
         Args:
             port_name: Name of MIDI output port, or None to skip initialization
+            ramp_rate: Maximum tempo change in BPM per second (0 = jump immediately)
         """
         self.port = None
         self.port_name = port_name
         self.bpm = 120.0
+        self.target_bpm = 120.0
+        self.ramp_rate = ramp_rate
         self.running = False
         self.started = False
         self.thread = None
@@ -73,25 +139,35 @@ class MIDIClockSender:
     
     def set_bpm(self, bpm):
         """
-        Update the BPM for clock output.
+        Update the target BPM for clock output.
+        
+        While the clock is running the output tempo glides towards the target
+        (see ramp_rate); before start it is applied immediately.
         
         Args:
             bpm: Beats per minute (can be fractional, e.g., 125.5)
         """
         with self._lock:
-            if bpm != self.bpm:
-                old_bpm = self.bpm
-                self.bpm = float(bpm)
-                logging.debug(f"MIDI Clock: BPM changed from {old_bpm:.2f} to {self.bpm:.2f}")
+            if bpm != self.target_bpm:
+                old_bpm = self.target_bpm
+                self.target_bpm = float(bpm)
+                if not self.running or self.ramp_rate <= 0:
+                    self.bpm = self.target_bpm
+                logging.debug(f"MIDI Clock: BPM changed from {old_bpm:.2f} to {self.target_bpm:.2f}")
     
     def _calculate_interval(self):
         """
-        Calculate time between MIDI clock pulses in seconds.
+        Calculate time until the next MIDI clock pulse in seconds.
+        
+        Moves the output tempo one pulse closer to the target BPM, limited to
+        ramp_rate BPM per second of elapsed clock time.
         
         Returns:
             Interval in seconds (60 / (BPM * 24))
         """
         with self._lock:
+            if self.bpm != self.target_bpm:
+                self.bpm = _ramp_bpm(self.bpm, self.target_bpm, self.ramp_rate, 60.0 / (self.bpm * 24.0))
             return 60.0 / (self.bpm * 24.0)
     
     def _clock_loop(self):
@@ -107,13 +183,13 @@ class MIDIClockSender:
                 logging.debug("MIDI Clock: Port not available, exiting clock loop")
                 break
             
-            interval = self._calculate_interval()
             now = time.perf_counter()
             
             if now >= next_tick:
                 try:
                     self.port.send(mido.Message('clock'))
-                    next_tick += interval  # Drift compensation
+                    # Drift compensation; the tempo ramp advances once per pulse
+                    next_tick += self._calculate_interval()
                 except Exception:
                     logging.exception("MIDI Clock: Failed to send clock message")
                     # Port likely disconnected
@@ -196,3 +272,453 @@ class MIDIClockSender:
     def is_running(self):
         """Check if MIDI clock is currently running."""
         return self.running and self.port is not None
+
+
+class JitterStats:
+    """
+    Running statistics of pulse lateness (actual send time minus scheduled time).
+    
+    Uses Welford's algorithm so no per-pulse history is kept.
+    """
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        """Clear all collected statistics."""
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.max = 0.0
+    
+    def add(self, lateness):
+        """Record the lateness of one pulse in seconds."""
+        self.count += 1
+        d = lateness - self._mean
+        self._mean += d / self.count
+        self._m2 += d * (lateness - self._mean)
+        if lateness > self.max:
+            self.max = lateness
+    
+    def snapshot(self):
+        """
+        Get the current statistics.
+        
+        Returns:
+            Dict with pulse count and mean/std/max lateness in milliseconds
+        """
+        std = (self._m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
+        return {
+            'count': self.count,
+            'mean_ms': self._mean * 1000.0,
+            'std_ms': std * 1000.0,
+            'max_ms': self.max * 1000.0,
+        }
+
+
+class ClockRoute:
+    """
+    One (source detector -> MIDI output port) mapping driven by MIDIClockRouter.
+    
+    Holds the per-port tempo ramp and pulse schedule. Pulses are sent on the
+    router's timing thread; detector callbacks only update the target BPM.
+    Port I/O is serialized by the route's own port lock (never the router's),
+    so a slow port does not block other threads adding or removing routes.
+    """
+    
+    def __init__(self, port_name, port=None, ramp_rate=DEFAULT_RAMP_RATE, slot=None):
+        """
+        Args:
+            port_name: Name of the MIDI output port
+            port: Already opened mido-compatible output port (opened by name if None)
+            ramp_rate: Maximum tempo change in BPM per second (0 = jump immediately)
+            slot: Config slot index of the source, for bookkeeping
+        """
+        self.port_name = port_name
+        self.slot = slot
+        self.port = port
+        self.ramp_rate = ramp_rate
+        self.min_confidence = LOW_CONFIDENCE
+        self.bpm = 120.0
+        self.target_bpm = 0.0
+        self.source = None
+        self.started = False
+        self.next_tick = 0.0
+        self.jitter = JitterStats()
+        self._lock = threading.Lock()
+        self._port_lock = threading.Lock()
+        
+        if self.port is None and port_name and MIDO_AVAILABLE:
+            try:
+                self.port = mido.open_output(port_name)
+                logging.info(f"MIDI Clock: Opened port '{port_name}'")
+            except Exception:
+                logging.exception(f"MIDI Clock: Failed to open port '{port_name}'")
+                self.port = None
+    
+    def set_bpm(self, bpm):
+        """Update the target BPM; the output glides towards it once started."""
+        with self._lock:
+            self.target_bpm = float(bpm)
+            if not self.started or self.ramp_rate <= 0:
+                self.bpm = self.target_bpm
+    
+    def attach(self, detector):
+        """
+        Follow the BPM of a beat detector.
+        
+        The route subscribes to the detector's BPM updates, so tempo changes are
+        applied as soon as they are estimated; the router starts the clock on the
+        first valid BPM.
+        
+        Args:
+            detector: BaseBeatDetector instance to follow
+        """
+        self.detach()
+        self.source = detector
+        detector.add_bpm_listener(self._on_source_bpm)
+        if detector.bpm > 0:
+            self._on_source_bpm(detector.bpm)
+    
+    def detach(self):
+        """Stop following the current source detector."""
+        if self.source is not None:
+            self.source.remove_bpm_listener(self._on_source_bpm)
+            self.source = None
+    
+    def _on_source_bpm(self, bpm):
+        # Hold the current tempo while the estimate is unreliable
+        if bpm and bpm > 0 and getattr(self.source, 'confidence', 1.0) >= self.min_confidence:
+            self.set_bpm(bpm)
+    
+    def follow_source(self):
+        """
+        Take over the source's BPM if it differs and its confidence now allows it.
+        
+        Listeners only hear about BPM changes: a reading held back at low
+        confidence whose confidence then rises is never announced again. The
+        router calls this on every pass of its timing loop.
+        """
+        source = self.source
+        if source is None:
+            return
+        bpm = source.bpm
+        if bpm and bpm > 0 and bpm != self.target_bpm and getattr(source, 'confidence', 1.0) >= self.min_confidence:
+            self.set_bpm(bpm)
+    
+    def _advance(self):
+        """Step the tempo ramp by one pulse and return the interval to the next pulse."""
+        with self._lock:
+            if self.bpm != self.target_bpm:
+                self.bpm = _ramp_bpm(self.bpm, self.target_bpm, self.ramp_rate, 60.0 / (self.bpm * 24.0))
+            return 60.0 / (self.bpm * 24.0)
+    
+    def _send(self, message_type):
+        with self._port_lock:
+            return self._send_locked(message_type)
+    
+    def _send_locked(self, message_type):
+        if self.port is None:
+            # closed meanwhile
+            return False
+        try:
+            self.port.send(mido.Message(message_type))
+            return True
+        except Exception:
+            logging.exception(f"MIDI Clock: Failed to send {message_type} to '{self.port_name}'")
+            self.port = None
+            return False
+    
+    def close(self):
+        """Send STOP if started and close the port."""
+        self.detach()
+        with self._port_lock:
+            if self.port and self.started:
+                self._send_locked('stop')
+            self.started = False
+            if self.port:
+                try:
+                    self.port.close()
+                    logging.info(f"MIDI Clock: Closed port '{self.port_name}'")
+                except Exception:
+                    logging.exception("MIDI Clock: Failed to close port")
+                self.port = None
+
+
+class MIDIClockRouter:
+    """
+    Sends MIDI Clock to any number of ports, each following its own source detector.
+    
+    A single high-priority timing thread schedules the pulses of all routes on
+    one perf_counter timeline, instead of one busy-waiting thread per sender.
+    """
+    
+    def __init__(self):
+        self.routes = []
+        self.running = False
+        self.thread = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+    
+    def add_route(self, port_name, detector=None, ramp_rate=DEFAULT_RAMP_RATE, port=None, slot=None):
+        """
+        Add a (source -> port) mapping.
+        
+        Args:
+            port_name: Name of the MIDI output port
+            detector: Beat detector to follow, or None to attach later
+            ramp_rate: Maximum tempo change in BPM per second
+            port: Already opened mido-compatible output port (opened by name if None)
+            slot: Config slot index of the source, for bookkeeping
+        
+        Returns:
+            The new ClockRoute
+        """
+        route = ClockRoute(port_name, port=port, ramp_rate=ramp_rate, slot=slot)
+        if detector is not None:
+            route.attach(detector)
+        with self._lock:
+            self.routes.append(route)
+        self._wake.set()
+        return route
+    
+    def remove_route(self, route):
+        """Remove a mapping, sending STOP to its port and closing it."""
+        with self._lock:
+            if route in self.routes:
+                self.routes.remove(route)
+        route.close()
+    
+    def get_stats(self):
+        """
+        Get per-port jitter statistics.
+        
+        Returns:
+            Dict mapping port name to JitterStats.snapshot() plus the current BPM
+        """
+        with self._lock:
+            routes = list(self.routes)
+        stats = {}
+        for route in routes:
+            s = route.jitter.snapshot()
+            s['bpm'] = route.bpm
+            stats[route.port_name] = s
+        return stats
+    
+    def _clock_loop(self):
+        """
+        Timing thread: sends every due pulse, then sleeps towards the earliest next one.
+        Each route keeps drift compensation by advancing its own scheduled tick.
+        """
+        _raise_thread_priority()
+        
+        while self.running:
+            now = time.perf_counter()
+            next_due = None
+            
+            # Port I/O happens outside the router lock (see ClockRoute)
+            with self._lock:
+                routes = list(self.routes)
+            for route in routes:
+                if route.port is None:
+                    continue
+                route.follow_source()
+                if not route.started:
+                    # Start as soon as the route has a valid tempo
+                    if route.target_bpm > 0 and route._send('start'):
+                        logging.info(f"MIDI Clock: Sent START to '{route.port_name}' at {route.bpm:.2f} BPM")
+                        route.started = True
+                        route.next_tick = now
+                    else:
+                        continue
+                
+                if now >= route.next_tick:
+                    if not route._send('clock'):
+                        continue
+                    route.jitter.add(time.perf_counter() - route.next_tick)
+                    route.next_tick += route._advance()
+                    # Fell behind by more than a pulse (e.g. system stall): resync instead of bursting
+                    if route.next_tick < now:
+                        route.next_tick = now
+                
+                if next_due is None or route.next_tick < next_due:
+                    next_due = route.next_tick
+            
+            if next_due is None:
+                # Nothing to send yet; wait for a route or a tempo
+                self._wake.wait(0.05)
+                self._wake.clear()
+                continue
+            
+            remaining = next_due - time.perf_counter()
+            if remaining > 0:
+                # Sleep for a fraction of the gap to reduce CPU usage
+                time.sleep(max(0.0001, remaining * 0.5))
+        
+        logging.debug("MIDI Clock: Router loop exited")
+    
+    def start(self):
+        """Start the timing thread."""
+        if not MIDO_AVAILABLE:
+            logging.warning("MIDI Clock: Cannot start router - mido not available")
+            return
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._clock_loop, daemon=True, name="MIDIClockRouter")
+        self.thread.start()
+        logging.info("MIDI Clock: Started router thread")
+    
+    def close(self):
+        """Stop the timing thread and close all routes."""
+        self.running = False
+        self._wake.set()
+        if self.thread:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        with self._lock:
+            routes = list(self.routes)
+            self.routes = []
+        for route in routes:
+            route.close()
+        logging.info("MIDI Clock: Router stopped")
+
+
+class MIDIClockReceiver:
+    """
+    Receives MIDI Clock (24 PPQN) and derives a filtered reference BPM and beat phase.
+    
+    Incoming pulses are timestamped on arrival. The BPM is the least-squares slope
+    of the last window_pulses pulse times, which averages out per-pulse jitter far
+    better than single intervals. Messages can also be pushed with feed(), e.g. to
+    replay recorded pulse timings through an in-memory port.
+    """
+    
+    def __init__(self, port_name=None, port=None, window_pulses=96):
+        """
+        Initialize MIDI Clock receiver.
+        
+        Args:
+            port_name: Name of MIDI input port to open, or None
+            port: Already opened mido-compatible input port (its callback is replaced)
+            window_pulses: Number of recent pulses used for the BPM fit (96 = 4 beats)
+        """
+        self.port = port
+        self.port_name = port_name
+        self.bpm = 0.0
+        self.playing = False
+        self.pulse_count = 0
+        self.last_pulse_time = None
+        self._times = deque(maxlen=window_pulses)
+        self._lock = threading.Lock()
+        
+        if self.port is not None:
+            self.port.callback = self._on_message
+        elif port_name and MIDO_AVAILABLE:
+            try:
+                self.port = mido.open_input(port_name, callback=self._on_message)
+                logging.info(f"MIDI Clock: Listening on input port '{port_name}'")
+            except Exception:
+                logging.exception(f"MIDI Clock: Failed to open input port '{port_name}'")
+                self.port = None
+    
+    def _on_message(self, message):
+        """mido callback, called on the backend's input thread."""
+        self.feed(message, time.perf_counter())
+    
+    def feed(self, message, timestamp=None):
+        """
+        Process one incoming MIDI message.
+        
+        Args:
+            message: mido Message (clock/start/continue/stop are used)
+            timestamp: Arrival time in perf_counter seconds (now if None)
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        
+        with self._lock:
+            if message.type == 'clock':
+                if self.last_pulse_time is not None and timestamp - self.last_pulse_time > 1.0:
+                    # Clock paused (below 2.5 BPM): don't fit across the gap
+                    self._times.clear()
+                self._times.append(timestamp)
+                self.last_pulse_time = timestamp
+                self.pulse_count += 1
+                self._update_bpm()
+            elif message.type == 'start':
+                self.playing = True
+                self.pulse_count = 0
+                self._times.clear()
+            elif message.type == 'continue':
+                self.playing = True
+            elif message.type == 'stop':
+                self.playing = False
+    
+    def _update_bpm(self):
+        n = len(self._times)
+        if n < 3:
+            return
+        # Least-squares slope of pulse time over pulse index = seconds per pulse
+        t = list(self._times)
+        mean_i = (n - 1) / 2.0
+        mean_t = sum(t) / n
+        num = 0.0
+        den = 0.0
+        for i, ti in enumerate(t):
+            di = i - mean_i
+            num += di * (ti - mean_t)
+            den += di * di
+        period = num / den
+        if period > 0:
+            self.bpm = 60.0 / (period * 24.0)
+    
+    def is_locked(self, now=None, timeout=0.5):
+        """
+        Check whether the reference is usable.
+        
+        Args:
+            now: Current time in the timestamp domain (perf_counter if None)
+            timeout: Maximum age of the last pulse in seconds
+        
+        Returns:
+            True when at least one beat of pulses was seen and the clock is still ticking
+        """
+        if now is None:
+            now = time.perf_counter()
+        with self._lock:
+            return (len(self._times) >= 24 and self.last_pulse_time is not None
+                    and now - self.last_pulse_time <= timeout)
+    
+    def get_phase(self, now=None):
+        """
+        Get the position within the current beat.
+        
+        The pulse counter is reset by MIDI Start, so phase 0.0 is on the beat when
+        the sender started cleanly.
+        
+        Args:
+            now: Current time in the timestamp domain (perf_counter if None)
+        
+        Returns:
+            Beat phase in the range [0, 1), extrapolated since the last pulse
+        """
+        if now is None:
+            now = time.perf_counter()
+        with self._lock:
+            if not self.bpm or self.last_pulse_time is None:
+                return 0.0
+            period = 60.0 / (self.bpm * 24.0)
+            since = min(max(now - self.last_pulse_time, 0.0), period)
+            # pulse_count counts the pulse at last_pulse_time, so the beat started at count 1
+            return (((self.pulse_count - 1) % 24) + since / period) / 24.0
+    
+    def close(self):
+        """Close the MIDI input port."""
+        if self.port:
+            try:
+                self.port.close()
+                logging.info(f"MIDI Clock: Closed input port '{self.port_name}'")
+            except Exception:
+                logging.exception("MIDI Clock: Failed to close input port")
+            self.port = None
@@ -0,0 +1,209 @@
+"""
+Session recorder: the raw input of a slot, kept in a memory-mapped ring file.
+
+The file is preallocated to hold the last `seconds` of input, so disk use is
+bounded however long the set runs. Each block handed to the detector is
+copied straight into the mapping on the detector thread (the capture thread
+is not involved), together with its position in the input stream, so the
+recording can be replayed block for block through any detector backend
+(see RecordingSource and `python benchmark.py replay`) and shows where
+blocks were dropped.
+
+Layout: a header of HEADER_FIELDS int64s, the float32 sample ring, then the
+block index ring of (samples written, stream position) int64 pairs, both
+counted at the end of each block.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+
+MAGIC = 0x31304345524D5042   # b'BPMREC01' little-endian
+HEADER_FIELDS = 8            # magic, sample_rate, capacity, index_capacity, written, blocks, 2 reserved
+MIN_BLOCK = 128              # Smallest block size the index ring is sized for
+RECORDINGS_DIR = 'recordings'
+
+_MAGIC, _RATE, _CAPACITY, _INDEX_CAPACITY, _WRITTEN, _BLOCKS = range(6)
+
+
+def _file_size(capacity, index_capacity):
+    return HEADER_FIELDS * 8 + capacity * 4 + index_capacity * 16
+
+
+class _RingFile:
+    """Maps a recording file as header, sample ring and block index views."""
+
+    def __init__(self, path, mode, size=None):
+        self.mm = np.memmap(path, dtype=np.uint8, mode=mode, shape=size)
+        self.header = self.mm[:HEADER_FIELDS * 8].view(np.int64)
+        if self.header[_MAGIC] != MAGIC and mode == 'r':
+            raise ValueError(f"{path} is not a session recording")
+        self._map_rings()
+
+    def _map_rings(self):
+        capacity, index_capacity = int(self.header[_CAPACITY]), int(self.header[_INDEX_CAPACITY])
+        data_start = HEADER_FIELDS * 8
+        index_start = data_start + capacity * 4
+        self.data = self.mm[data_start:index_start].view(np.float32)
+        self.index = self.mm[index_start:index_start + index_capacity * 16].view(np.int64).reshape(-1, 2)
+
+
+class SessionRecorder:
+    """
+    Appends the blocks of one slot to a preallocated ring file.
+
+    Attach it as a detector's `recorder`; AudioStreamDetector calls write()
+    with every block before analysing it. A recorder can outlive its
+    detector, so a slot re-attached after a device change keeps recording to
+    the same file (its stream position restarting shows in the index). For a
+    moment both detectors may then write; write() is serialized by a lock.
+    """
+
+    def __init__(self, path, seconds, max_rate=96000):
+        """
+        Args:
+            path: Recording file (created or reused)
+            seconds: Input kept at max_rate; more at lower rates
+            max_rate: Highest sample rate the size is planned for
+        """
+        self.path = path
+        self.capacity = int(seconds * max_rate)
+        self.index_capacity = self.capacity // MIN_BLOCK + 1
+        size = _file_size(self.capacity, self.index_capacity)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a+b') as f:
+            if os.fstat(f.fileno()).st_size != size:
+                f.truncate(size)
+                if hasattr(os, 'posix_fallocate'):
+                    # reserve the blocks now, so a full disk shows up here and not mid-set
+                    os.posix_fallocate(f.fileno(), 0, size)
+        self.ring = _RingFile(path, 'r+', size)
+        self.sample_rate = 0
+        self._lock = threading.Lock()
+
+    def _reset(self, sample_rate):
+        """Start a new recording (the previous session is overwritten)."""
+        header = self.ring.header
+        header[_MAGIC] = 0   # invalid while the header is rewritten
+        header[_RATE] = sample_rate
+        header[_CAPACITY] = self.capacity
+        header[_INDEX_CAPACITY] = self.index_capacity
+        header[_WRITTEN] = 0
+        header[_BLOCKS] = 0
+        header[_MAGIC] = MAGIC
+        self.ring._map_rings()
+        self.sample_rate = sample_rate
+
+    def write(self, samples, stream_position, sample_rate):
+        """
+        Append one block. Called from the detector thread.
+
+        Args:
+            samples: float32 block as passed to process_samples()
+            stream_position: Samples read from the input stream up to the end of this block
+            sample_rate: Current sample rate; a change starts a new recording
+        """
+        with self._lock:
+            if sample_rate != self.sample_rate:
+                self._reset(sample_rate)
+            ring, header = self.ring, self.ring.header
+            written = int(header[_WRITTEN])
+            samples = samples[-self.capacity:]
+            n = len(samples)
+            pos = written % self.capacity
+            first = min(n, self.capacity - pos)
+            ring.data[pos:pos + first] = samples[:first]
+            ring.data[:n - first] = samples[first:]
+            blocks = int(header[_BLOCKS])
+            ring.index[blocks % self.index_capacity] = (written + n, stream_position)
+            # the counters go last, so a reader never sees a block before its samples
+            header[_WRITTEN] = written + n
+            header[_BLOCKS] = blocks + 1
+
+    def flush(self):
+        """Push the mapped pages to disk (the OS also does this on its own, even if the app crashes)."""
+        self.ring.mm.flush()
+
+
+class RecordingSource:
+    """
+    Replays a recording block for block, in place of a capture subscription.
+
+    Like capture.FileSource, blocks are delivered as fast as they are read.
+    Only blocks whose samples are still in the ring are replayed.
+    `gaps` lists (time, seconds) of input that never reached the detector
+    while recording (dropped blocks; negative for a restarted stream).
+    """
+
+    def __init__(self, path):
+        ring = _RingFile(path, 'r')
+        header = ring.header
+        self.path = path
+        self.channel = 0
+        self.sample_rate = int(header[_RATE])
+        capacity, index_capacity = int(header[_CAPACITY]), int(header[_INDEX_CAPACITY])
+        written, blocks = int(header[_WRITTEN]), int(header[_BLOCKS])
+        first_block = max(0, blocks - index_capacity)
+        index = np.array([ring.index[b % index_capacity] for b in range(first_block, blocks)],
+                         dtype=np.int64).reshape(-1, 2)
+        ends, positions = index[:, 0], index[:, 1]
+        if first_block:
+            # the index wrapped: the oldest entry only tells where the next block starts
+            starts, ends, positions = ends[:-1], ends[1:], positions[1:]
+        else:
+            starts = np.concatenate(([0], ends[:-1]))
+        keep = starts >= written - capacity
+        self.block_starts, self.block_ends, positions = starts[keep], ends[keep], positions[keep]
+        lengths = self.block_ends - self.block_starts
+        self.gaps = [(float(self.block_starts[i] - self.block_starts[0]) / self.sample_rate,
+                      float(positions[i] - lengths[i] - positions[i - 1]) / self.sample_rate)
+                     for i in range(1, len(positions)) if positions[i] - lengths[i] != positions[i - 1]]
+        # a copy, so the slot may go on recording while it is replayed
+        self._data = np.array(self._unwrap(ring.data, capacity, self.block_starts[0], self.block_ends[-1])) \
+            if len(self.block_ends) else np.zeros(0, dtype=np.float32)
+        self._offset = int(self.block_starts[0]) if len(self.block_ends) else 0
+        # blocks the recording overwrote while they were copied are dropped
+        first = int(np.searchsorted(self.block_starts, int(header[_WRITTEN]) - capacity))
+        self.block = first
+        del ring
+        self.failed = False
+        self.closed = False
+
+    @staticmethod
+    def _unwrap(data, capacity, start, end):
+        pos = start % capacity
+        n = end - start
+        if pos + n <= capacity:
+            return data[pos:pos + n]
+        return np.concatenate((data[pos:], data[:n - (capacity - pos)]))
+
+    @property
+    def finished(self):
+        return self.block >= len(self.block_ends)
+
+    @property
+    def duration(self):
+        return len(self._data) / self.sample_rate if self.sample_rate else 0.0
+
+    def backlog(self):
+        # like a file: the recording is replayed without falling behind
+        return 0.0
+
+    def read(self, timeout=0.5):
+        """
+        Get the next recorded block.
+
+        Returns:
+            1D float32 array (a view), or None once the recording is finished
+        """
+        if self.finished or self.closed:
+            return None
+        start = int(self.block_starts[self.block]) - self._offset
+        end = int(self.block_ends[self.block]) - self._offset
+        self.block += 1
+        return self._data[start:end]
+
+    def close(self):
+        self.closed = True
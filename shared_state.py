@@ -0,0 +1,256 @@
+"""
+Shared-memory BPM state: the live state of every slot for other local processes.
+
+With "shared_state" enabled the app publishes each slot into a named shared
+memory segment (SHARED_STATE_NAME) of fixed layout, all little-endian:
+
+    header, 64 bytes:  magic  u8 (MAGIC), version u4, slots u4, slot_size u4, writer pid u4
+    slot i at 64 + i * 128, nine 8-byte fields (the rest is reserved):
+        seq          u8   sequence counter, odd while the slot is being written
+        bpm          f8   current BPM (0 = none yet)
+        confidence   f8   0.0-1.0
+        phase        f8   beat phase at `updated` (0.0-1.0, NaN while no beat was seen)
+        updated      f8   wall-clock time of the update (Unix seconds)
+        beat_time    f8   wall-clock time of the last beat (0 = none)
+        beat_sample  f8   position of the last beat in the slot's input stream, in samples
+        sample_rate  f8   sample rate of the input stream
+        check        u8   XOR of the 64-bit patterns of the seven fields above and the even seq
+
+Writes follow a seqlock: seq is incremented to odd, the fields and check are
+stored, and seq is incremented to even. A reader copies seq, the slot and seq
+again, and retries while the two differ or are odd, or the check does not
+match the fields, so it never sees half an update and never blocks the writer
+or makes a system call (SharedStateReader does this). On x86 the seq test
+alone is enough; on weakly ordered CPUs (ARM, e.g. a Raspberry Pi) stores may
+become visible out of order and Python has no memory fences, so there the
+check word is what rejects a torn copy.
+
+Slots of inputs that stopped keep their last state: readers should look at
+`updated` (the librosa detector updates every 2 s, aubio on every beat).
+"""
+
+import logging
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+SHARED_STATE_NAME = 'bpm_overlay_state'
+MAGIC = 0x31304154534D5042   # b'BPMSTA01' little-endian
+VERSION = 2
+MAX_SLOTS = 32               # Fixed, so readers can map the table before the app has any inputs
+HEADER_SIZE = 64
+SLOT_SIZE = 128              # Room for more fields without moving the slots
+FIELDS = ('seq', 'bpm', 'confidence', 'phase', 'updated', 'beat_time', 'beat_sample', 'sample_rate')
+_PHASE = FIELDS.index('phase')
+_CHECK = len(FIELDS)         # Column of the check word
+READ_TIMEOUT = 0.1           # Seconds a reader retries before giving up (the writer stalled mid-update)
+
+_HEADER = np.dtype([('magic', '<u8'), ('version', '<u4'), ('slots', '<u4'), ('slot_size', '<u4'), ('pid', '<u4')])
+SEGMENT_SIZE = HEADER_SIZE + MAX_SLOTS * SLOT_SIZE
+NAN = float('nan')
+
+
+def _views(buf):
+    """Header record, seq column (uint64) and field matrix (uint64, FIELDS + check) over a segment buffer."""
+    header = np.ndarray((), dtype=_HEADER, buffer=buf)
+    seq = np.ndarray((MAX_SLOTS,), dtype='<u8', buffer=buf, offset=HEADER_SIZE, strides=(SLOT_SIZE,))
+    fields = np.ndarray((MAX_SLOTS, len(FIELDS) + 1), dtype='<u8', buffer=buf, offset=HEADER_SIZE,
+                        strides=(SLOT_SIZE, 8))
+    return header, seq, fields
+
+
+def _check(bits, seq):
+    """Check word of the field bit patterns (uint64 array) written with an (even) seq."""
+    # plain ints: a numpy reduction costs more than the whole update for seven values
+    for word in bits.tolist():
+        seq ^= word
+    return seq
+
+
+class SlotPublisher:
+    """
+    Writes one slot of the table. Attach it as a detector's `shared_state`.
+
+    Safe to call from several threads: a stopping detector and its
+    replacement may publish to the same slot for a moment, and updates are
+    serialized by a per-slot lock (readers never take it).
+    """
+
+    def __init__(self, table, slot):
+        self.table = table
+        self.slot = slot
+        self.beat_time = 0.0
+        self.beat_sample = 0.0
+        self._lock = threading.Lock()
+
+    def publish(self, bpm, confidence, sample_rate, beat_time=None, beat_sample=None):
+        """
+        Publish the current estimate, and the latest beat if one was detected.
+
+        Args:
+            bpm: Current BPM
+            confidence: Current confidence
+            sample_rate: Sample rate of the input stream
+            beat_time: Wall-clock time of the latest beat (None: unchanged)
+            beat_sample: Stream position of that beat in samples
+        """
+        seq, fields, i = self.table.seq, self.table.fields, self.slot
+        with self._lock:
+            if beat_time is not None:
+                self.beat_time, self.beat_sample = beat_time, beat_sample
+            now = time.time()
+            beat = self.beat_time
+            phase = ((now - beat) * bpm / 60.0) % 1.0 if beat and bpm > 0 else NAN
+            bits = np.array((bpm, confidence, phase, now, beat, self.beat_sample, sample_rate),
+                            dtype='<f8').view('<u8')
+            s = int(seq[i])
+            seq[i] = s + 1          # odd: readers retry
+            fields[i, 1:_CHECK] = bits
+            fields[i, _CHECK] = _check(bits, s + 2)
+            seq[i] = s + 2
+
+
+class SharedStateTable:
+    """
+    Creates (or takes over) the shared segment and hands out slot publishers.
+
+    Raises:
+        OSError: If the segment can't be created
+    """
+
+    def __init__(self, name=SHARED_STATE_NAME):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=SEGMENT_SIZE)
+        except FileExistsError:
+            # left behind by a crashed run (or another instance, which then loses its readers)
+            logging.warning("Shared state %s already exists, taking it over", name)
+            self.shm = shared_memory.SharedMemory(name=name)
+            if self.shm.size < SEGMENT_SIZE:
+                self.shm.close()
+                self.shm.unlink()
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=SEGMENT_SIZE)
+        self.header, self.seq, self.fields = _views(self.shm.buf)
+        self.fields[:] = 0
+        self.fields[:, _PHASE] = np.array(np.nan).view('<u8')
+        self.fields[:, _CHECK] = [_check(row[1:_CHECK], 0) for row in self.fields]
+        self.header['version'] = VERSION
+        self.header['slots'] = MAX_SLOTS
+        self.header['slot_size'] = SLOT_SIZE
+        self.header['pid'] = os.getpid()
+        # valid from here on
+        self.header['magic'] = MAGIC
+        self._publishers = {}
+        logging.info("Publishing slot state in shared memory %s", name)
+
+    def slot(self, index):
+        """Publisher for a slot index, or None beyond MAX_SLOTS."""
+        if not 0 <= index < MAX_SLOTS:
+            return None
+        return self._publishers.setdefault(index, SlotPublisher(self, index))
+
+    def close(self):
+        """
+        Remove the segment's name (readers keep their mapping until they close it).
+
+        Our own mapping stays until the process exits: a detector thread may
+        still be publishing.
+        """
+        self.header['magic'] = 0
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedStateReader:
+    """
+    Reads consistent slot snapshots from another process.
+
+        reader = SharedStateReader()
+        state = reader.read(0)
+        print(state['bpm'], reader.phase(state))
+
+    Raises:
+        FileNotFoundError: If the app is not publishing
+        ValueError: If the segment has an unknown layout
+    """
+
+    def __init__(self, name=SHARED_STATE_NAME):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+            tracked = False
+        except TypeError:
+            self.shm = shared_memory.SharedMemory(name=name)
+            tracked = os.name == 'posix'
+        self.header, self.seq, self.fields = _views(self.shm.buf)
+        if tracked and int(self.header['pid']) != os.getpid():
+            # before Python 3.13 the resource tracker would unlink the app's segment when this process exits
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        if int(self.header['magic']) != MAGIC or int(self.header['version']) != VERSION:
+            self.close()
+            raise ValueError(f"Shared memory {name} is not a BPM state table (version {VERSION})")
+        self.slots = int(self.header['slots'])
+        self.retries = 0
+
+    def read_row(self, slot, timeout=READ_TIMEOUT):
+        """
+        Consistent copy of one slot.
+
+        Args:
+            slot: Slot index
+            timeout: Seconds to keep retrying while the slot is being written
+
+        Returns:
+            Tuple (seq, float64 array of the fields after seq, in FIELDS order)
+
+        Raises:
+            TimeoutError: If no consistent copy could be made in time (the app stalled mid-update)
+        """
+        seq, row = self.seq, self.fields[slot]
+        deadline = None
+        while True:
+            s = int(seq[slot])
+            if not s & 1:
+                bits = row.copy()
+                if int(seq[slot]) == s and _check(bits[1:_CHECK], s) == int(bits[_CHECK]):
+                    return s, bits[1:_CHECK].view('<f8')
+            self.retries += 1
+            # the clock is only read once the fast path failed
+            now = time.perf_counter()
+            if deadline is None:
+                deadline = now + timeout
+            elif now > deadline:
+                raise TimeoutError(f"Slot {slot} of the shared state stayed inconsistent for {timeout}s")
+
+    def read(self, slot):
+        """
+        Consistent snapshot of one slot.
+
+        Returns:
+            Dict of FIELDS; 'seq' is twice the number of updates
+        """
+        s, values = self.read_row(slot)
+        state = dict(zip(FIELDS[1:], values.tolist()))
+        state['seq'] = s
+        return state
+
+    def read_all(self):
+        """Snapshots of all slots that were published at least once."""
+        return {i: self.read(i) for i in range(self.slots) if self.seq[i]}
+
+    @staticmethod
+    def phase(state, t=None):
+        """Beat phase (0.0-1.0) of a snapshot at wall-clock time t (default now), or NaN without beats."""
+        if not state['beat_time'] or state['bpm'] <= 0:
+            return float('nan')
+        t = time.time() if t is None else t
+        return ((t - state['beat_time']) * state['bpm'] / 60.0) % 1.0
+
+    def close(self):
+        del self.header, self.seq, self.fields
+        self.shm.close()
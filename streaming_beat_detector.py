@@ -0,0 +1,543 @@
+"""Lightweight streaming beat detector for low-power hardware (no librosa)."""
+
+import functools
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from beat_detector_base import AudioStreamDetector
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+
+# =============================================================================
+# CONFIGURABLE PARAMETERS - Tune these for CPU/accuracy tradeoff
+# =============================================================================
+
+# Audio capture settings
+SAMPLE_RATE = 44100          # Replaced by the device's native rate
+BUFFER_SIZE = 1024           # PyAudio buffer size per read (samples)
+CHANNELS = 1                 # Mono; the onset detector does not need stereo
+
+# Onset detection (spectral flux), computed hop by hop
+FRAME_SIZE = 1024            # FFT size per hop
+HOP_SIZE = 256               # Samples between onset frames (~190 frames/s at 48 kHz)
+N_BANDS = 24                 # Log-spaced bands summed into the flux
+FMIN = 40.0                  # Lowest band edge
+FMAX = 8000.0                # Highest band edge
+LOG_GAMMA = 100.0            # Log compression of band energies: log(1 + gamma * energy)
+
+# Tempo estimation (comb filter over the onset envelope autocorrelation)
+ONSET_DURATION = 8.0         # Seconds of onset envelope kept
+UPDATE_INTERVAL = 1.0        # Seconds between BPM recalculations
+MIN_BPM = 60.0
+MAX_BPM = 200.0
+BPM_STEP = 0.1               # Resolution of the tempo candidates
+HARMONICS = 4                # Comb teeth at 1..HARMONICS beat periods
+OFFBEAT_WEIGHT = 0.5         # Penalty for autocorrelation halfway between the teeth (octave errors)
+PRIOR_BPM = 120.0            # Center of the tempo prior (a locked reference replaces it)
+PRIOR_OCTAVES = 1.0          # Width of the log-normal tempo prior, in octaves
+CONFIDENCE_SCALE = 1.5       # Comb score -> confidence (clean beats score ~0.55-0.7, noise < 0.1)
+
+# Smoothing
+ENABLE_SMOOTHING = True      # Smooth readings with the shared tempo filter (see beat_detector_base.TempoFilter)
+
+SILENCE_RMS = 0.003          # Below this RMS over an update the input counts as silent
+
+# Batched analysis (BatchTempoAnalyzer): one tempo computation for all slots that are due
+BATCH_WAIT = 0.05            # Seconds to wait for other slots after the first one is due
+BATCH_MIN_SLOTS = 8          # With numba, smaller groups run the compiled per-slot kernels (faster for a few slots)
+
+# Debug
+DEBUG = os.environ.get("BPM_DEBUG", "0") == "1"
+
+
+# =============================================================================
+# Kernels: NumPy versions, replaced by compiled ones when numba is available.
+# Compiled kernels are cached on disk (numba cache=True), so only the very first
+# start compiles them.
+# =============================================================================
+
+def _flux_frames_np(spectra, weights, prev, gamma, out):
+    """
+    Spectral flux of consecutive frames; updates `prev` (last band energies) in place.
+
+    Args:
+        spectra: Complex spectra, one frame per row (only the bins the bands use)
+        weights: Band filterbank, (bins, bands)
+        prev: Log band energies of the previous frame
+        gamma: Log compression factor
+        out: Receives one flux value per frame
+    """
+    power = spectra.real ** 2 + spectra.imag ** 2
+    bands = np.log1p(gamma * (power @ weights))
+    previous = np.vstack([prev[None, :], bands[:-1]])
+    np.sum(np.maximum(bands - previous, 0.0), axis=1, out=out)
+    prev[:] = bands[-1]
+
+
+def _comb_scores_np(ac, lags, harmonics, offbeat_weight, out):
+    """
+    Comb filter score per (fractional) lag.
+
+    Mean autocorrelation at 1..harmonics multiples of the lag, minus
+    offbeat_weight times the mean at the offbeats in between. The offbeat term stops half tempo from
+    scoring as high as the real tempo, since its combs also hit every beat.
+    """
+    k = np.arange(1, harmonics + 1)[None, :]
+    index = np.arange(len(ac))
+    beats = np.interp(lags[:, None] * k, index, ac)
+    offbeats = np.interp(lags[:, None] * (k - 0.5), index, ac)
+    np.subtract(beats.mean(axis=1), offbeat_weight * offbeats.mean(axis=1), out=out)
+
+
+@functools.lru_cache(maxsize=None)
+def fft_length(n):
+    """Smallest length >= n with no prime factors above 5 (fast for NumPy's FFT)."""
+    m = n
+    while True:
+        r = m
+        for p in (2, 3, 5):
+            while r % p == 0:
+                r //= p
+        if r == 1:
+            return m
+        m += 1
+
+
+def autocorrelation(envs, max_lag):
+    """
+    Autocorrelation of each row via FFT, normalized per lag so long lags are not penalized.
+
+    Args:
+        envs: Onset envelopes, one per row (same length)
+        max_lag: Highest lag returned
+
+    Returns:
+        (rows, max_lag + 1) array; divide by column 0 to normalize
+    """
+    x = envs - envs.mean(axis=1, keepdims=True)
+    n = x.shape[1]
+    # zero padding to n + max_lag is enough for lags up to max_lag not to wrap around
+    size = fft_length(n + max_lag)
+    spec = np.fft.rfft(x, size, axis=1)
+    ac = np.fft.irfft(spec.real ** 2 + spec.imag ** 2, size, axis=1)[:, :max_lag + 1]
+    ac /= np.arange(n, n - max_lag - 1, -1)
+    return ac
+
+
+@functools.lru_cache(maxsize=None)
+def comb_matrix(frame_rate, n, harmonics=HARMONICS, offbeat_weight=OFFBEAT_WEIGHT):
+    """
+    The comb filter as a matrix: scores = ac @ matrix for every row of ac at once.
+
+    Each column holds the linear-interpolation weights of one candidate's beat
+    teeth (+1/harmonics) and offbeat teeth (-offbeat_weight/harmonics), so it
+    gives exactly _comb_scores_np, and a batch of slots is one BLAS matmul.
+    Shared by all detectors with the same frame rate and lag range.
+
+    Args:
+        frame_rate: Onset frames per second
+        n: Autocorrelation length (max_lag + 1)
+
+    Returns:
+        Read-only (n, candidates) float32 array
+    """
+    candidates = np.arange(MIN_BPM, MAX_BPM + BPM_STEP / 2, BPM_STEP)
+    lags = 60.0 * frame_rate / candidates
+    k = np.arange(1, harmonics + 1)
+    positions = np.concatenate([lags[:, None] * k, lags[:, None] * (k - 0.5)], axis=1)
+    weights = np.concatenate([np.full(harmonics, 1.0), np.full(harmonics, -offbeat_weight)]) / harmonics
+    # positions past the end clamp to the last value, like np.interp
+    positions = np.minimum(positions, n - 1)
+    index = np.minimum(positions.astype(np.intp), n - 2)
+    frac = positions - index
+    columns = np.broadcast_to(np.arange(len(candidates))[:, None], index.shape)
+    matrix = np.zeros((n, len(candidates)))
+    np.add.at(matrix, (index, columns), weights * (1.0 - frac))
+    np.add.at(matrix, (index + 1, columns), weights * frac)
+    matrix = matrix.astype(np.float32)
+    matrix.flags.writeable = False
+    return matrix
+
+
+def pick_tempo(scores, candidates, centers):
+    """
+    Best candidate per row, weighted by the log-normal tempo prior around each row's center.
+
+    Returns:
+        Tuple (raw_bpm, score): arrays with one value per row; the BPM is refined by
+        parabolic interpolation between neighbouring candidates
+    """
+    prior = np.exp(-0.5 * (np.log2(candidates[None, :] / centers[:, None]) / PRIOR_OCTAVES) ** 2)
+    weighted = np.maximum(scores, 0.0) * prior
+    rows = np.arange(len(scores))
+    best = np.argmax(weighted, axis=1)
+    raw_bpm = candidates[best].astype(np.float64)
+    inner = (best > 0) & (best < weighted.shape[1] - 1)
+    a = weighted[rows, np.maximum(best - 1, 0)]
+    b = weighted[rows, best]
+    c = weighted[rows, np.minimum(best + 1, weighted.shape[1] - 1)]
+    denom = a - 2 * b + c
+    refine = inner & (denom != 0)
+    raw_bpm[refine] += 0.5 * (a - c)[refine] / denom[refine] * BPM_STEP
+    return raw_bpm, scores[rows, best]
+
+
+if HAVE_NUMBA:
+    @njit(cache=True, fastmath=True)
+    def _flux_frames_nb(spectra, weights, prev, gamma, out):
+        n_frames, n_bins = spectra.shape
+        n_bands = weights.shape[1]
+        energy = np.zeros(n_bands, dtype=np.float32)
+        for t in range(n_frames):
+            energy[:] = 0.0
+            for k in range(n_bins):
+                c = spectra[t, k]
+                p = c.real * c.real + c.imag * c.imag
+                if p == 0.0:
+                    continue
+                for b in range(n_bands):
+                    w = weights[k, b]
+                    if w != 0.0:
+                        energy[b] += w * p
+            flux = 0.0
+            for b in range(n_bands):
+                v = np.log1p(gamma * energy[b])
+                d = v - prev[b]
+                if d > 0.0:
+                    flux += d
+                prev[b] = v
+            out[t] = flux
+
+    @njit(cache=True, fastmath=True)
+    def _interp_lag(ac, x):
+        n = ac.shape[0]
+        j = int(x)
+        if j + 1 >= n:
+            return ac[n - 1]
+        f = x - j
+        return ac[j] * (1.0 - f) + ac[j + 1] * f
+
+    @njit(cache=True, fastmath=True)
+    def _comb_scores_nb(ac, lags, harmonics, offbeat_weight, out):
+        for i in range(lags.shape[0]):
+            beats = 0.0
+            offbeats = 0.0
+            for k in range(1, harmonics + 1):
+                beats += _interp_lag(ac, lags[i] * k)
+                offbeats += _interp_lag(ac, lags[i] * (k - 0.5))
+            out[i] = (beats - offbeat_weight * offbeats) / harmonics
+
+
+def band_filterbank(sample_rate, frame_size, n_bands=N_BANDS, fmin=FMIN, fmax=FMAX):
+    """
+    Triangular, log-spaced band filterbank.
+
+    Returns:
+        Tuple (weights, bin_lo, bin_hi): weights is (bin_hi - bin_lo, n_bands) float32
+        covering only the FFT bins the bands touch
+    """
+    fmax = min(fmax, sample_rate / 2.0)
+    freqs = np.fft.rfftfreq(frame_size, 1.0 / sample_rate)
+    edges = np.geomspace(fmin, fmax, n_bands + 2)
+    weights = np.zeros((len(freqs), n_bands), dtype=np.float32)
+    for b in range(n_bands):
+        lo, mid, hi = edges[b], edges[b + 1], edges[b + 2]
+        rising = (freqs - lo) / (mid - lo)
+        falling = (hi - freqs) / (hi - mid)
+        weights[:, b] = np.maximum(0.0, np.minimum(rising, falling))
+        if not weights[:, b].any():
+            # band narrower than a bin (low frequencies): use the nearest bin
+            weights[np.argmin(np.abs(freqs - mid)), b] = 1.0
+    used = np.flatnonzero(weights.any(axis=1))
+    bin_lo, bin_hi = int(used[0]), int(used[-1]) + 1
+    return np.ascontiguousarray(weights[bin_lo:bin_hi]), bin_lo, bin_hi
+
+
+class StreamingBeatDetector(AudioStreamDetector):
+    """
+    Beat detector for low-power hardware.
+
+    Each hop of HOP_SIZE samples adds one spectral-flux value (log band energy
+    increase) to a ring of ONSET_DURATION seconds. Every UPDATE_INTERVAL seconds
+    the tempo is taken from a comb filter over the envelope's autocorrelation:
+    each candidate BPM scores the autocorrelation at 1..HARMONICS beat periods,
+    weighted by a log-normal prior around PRIOR_BPM (or a locked reference).
+
+    The per-hop and per-candidate loops run as numba-compiled kernels when numba
+    is installed, else as NumPy. Nothing here needs librosa.
+    """
+
+    def __init__(self, input_device_index=None, source=None, use_numba=None, batch=None):
+        """
+        Args:
+            input_device_index: PyAudio input device (own stream)
+            source: Shared capture subscription, used instead of an own stream
+            use_numba: Force compiled (True) or NumPy (False) kernels; default: numba if installed
+            batch: BatchTempoAnalyzer to hand the tempo stage to, instead of computing it here
+        """
+        super().__init__(input_device_index, source)
+        self.batch = batch
+        self.batch_pending = False
+        self.use_numba = HAVE_NUMBA if use_numba is None else (use_numba and HAVE_NUMBA)
+        self._flux_frames = _flux_frames_nb if self.use_numba else _flux_frames_np
+        self._comb_scores = _comb_scores_nb if self.use_numba else _comb_scores_np
+
+        self.buffer_size = BUFFER_SIZE
+        self.channels = CHANNELS
+        self.candidates = np.arange(MIN_BPM, MAX_BPM + BPM_STEP / 2, BPM_STEP)
+        self.set_sample_rate(SAMPLE_RATE)
+
+    def set_sample_rate(self, rate):
+        """Switch to a sample rate and reset all analysis state."""
+        self.sample_rate = rate
+        self.frame_rate = rate / HOP_SIZE
+        self.update_hops = max(1, int(round(UPDATE_INTERVAL * self.frame_rate)))
+        self.window = np.hanning(FRAME_SIZE + 1)[:-1].astype(np.float32)
+        self.weights, self.bin_lo, self.bin_hi = band_filterbank(rate, FRAME_SIZE)
+        self.prev_bands = np.zeros(N_BANDS, dtype=np.float32)
+
+        # Audio not yet consumed by a hop; the last FRAME_SIZE - HOP_SIZE samples overlap the next frame
+        self.pending = np.zeros(FRAME_SIZE - HOP_SIZE, dtype=np.float32)
+
+        # Onset envelope ring
+        self.n_onset = int(ONSET_DURATION * self.frame_rate)
+        self.onset = np.zeros(self.n_onset, dtype=np.float32)
+        self.onset_pos = 0
+        self.onset_count = 0
+        self.hops_since_update = 0
+        self.energy = 0.0
+        self.energy_samples = 0
+        # the filter's time base (audio seconds) restarts with the counters
+        self.tempo_filter.reset()
+
+        # Autocorrelation lags needed by the longest comb
+        self.lags = (60.0 * self.frame_rate / self.candidates).astype(np.float64)
+        self.max_lag = min(self.n_onset - 1, int(np.ceil(self.lags.max() * HARMONICS)) + 2)
+        self.scores = np.zeros(len(self.candidates), dtype=np.float64)
+        self.comb = comb_matrix(self.frame_rate, self.max_lag + 1)
+
+    def process_samples(self, samples):
+        """Add a block of mono samples: compute onset frames hop by hop, and BPM when due."""
+        self.energy += float(np.dot(samples, samples))
+        self.energy_samples += len(samples)
+
+        audio = np.concatenate((self.pending, samples))
+        n_hops = (len(audio) - FRAME_SIZE) // HOP_SIZE + 1
+        if n_hops <= 0:
+            self.pending = audio
+            return
+        frames = sliding_window_view(audio, FRAME_SIZE)[::HOP_SIZE][:n_hops] * self.window
+        spectra = np.fft.rfft(frames, axis=1)[:, self.bin_lo:self.bin_hi].astype(np.complex64)
+        flux = np.empty(n_hops, dtype=np.float32)
+        self._flux_frames(spectra, self.weights, self.prev_bands, np.float32(LOG_GAMMA), flux)
+        self.pending = audio[n_hops * HOP_SIZE:].copy()
+
+        for value in flux:
+            self.onset[self.onset_pos] = value
+            self.onset_pos = (self.onset_pos + 1) % self.n_onset
+        self.onset_count += n_hops
+        self.hops_since_update += n_hops
+
+        if self.hops_since_update >= self.update_hops and self.analysis_allowed():
+            # in batch mode only the hand-off runs here; the batch analyzer times the tempo stage
+            # of each slot as its 'update' (see BatchTempoAnalyzer)
+            with self.measure_analysis(UPDATE_INTERVAL, 'update' if self.batch is None else 'submit'):
+                updated = self._calculate_bpm()
+            if updated:
+                self.record_estimate()
+            # an overrun pushes the next update back (see AudioStreamDetector.measure_analysis)
+            self.hops_since_update = -int(self.timing('update').delay * self.frame_rate)
+
+    def envelope(self):
+        """Onset envelope in chronological order (only the part filled so far)."""
+        env = np.roll(self.onset, -self.onset_pos)
+        return env[-min(self.onset_count, self.n_onset):]
+
+    def _calculate_bpm(self):
+        """
+        Estimate the tempo from the onset envelope.
+
+        Returns:
+            True if a new reading was made here, to be recorded; False if
+            there is none, or in batch mode, where the batch analyzer
+            publishes and records every reading (so this thread never does)
+        """
+        rms = np.sqrt(self.energy / max(1, self.energy_samples))
+        self.energy = 0.0
+        self.energy_samples = 0
+        if self.batch is not None and self.batch_pending:
+            # previous batch not finished yet; its result is the next reading
+            return False
+        if rms < SILENCE_RMS:
+            if DEBUG:
+                print("[StreamingBeatDetector] Input is silent, skipping")
+            if self.batch is not None:
+                self.batch_pending = True
+                self.batch.submit(self, None)
+                return False
+            self.confidence = 0.0
+            return True
+
+        env = self.envelope()
+        if len(env) <= self.max_lag:
+            # not enough history for the longest comb yet
+            return False
+        self.history.set_onset(env)
+
+        if self.batch is not None:
+            self.batch_pending = True
+            self.batch.submit(self, env)
+            return False
+        self._analyze_tempo(env)
+        return True
+
+    def _analyze_tempo(self, env):
+        """Tempo stage for this slot alone: autocorrelation, comb filter, peak picking."""
+        ac = autocorrelation(env[None, :], self.max_lag)[0]
+        if ac[0] <= 0:
+            self.confidence = 0.0
+            return
+        ac /= ac[0]
+
+        self._comb_scores(ac, self.lags, HARMONICS, OFFBEAT_WEIGHT, self.scores)
+        raw_bpm, score = pick_tempo(self.scores[None, :], self.candidates,
+                                    np.array([self.reference_bpm() or PRIOR_BPM]))
+        self.publish_tempo(float(raw_bpm[0]), float(score[0]), len(env))
+
+    def publish_tempo(self, raw_bpm, score, env_length):
+        """Publish the result of the tempo stage (called by the batch analyzer in batch mode)."""
+        # The autocorrelation spans the whole envelope: the reading describes the tempo half of it ago
+        t = self.onset_count * HOP_SIZE / self.sample_rate
+        self.set_estimate(raw_bpm, score * CONFIDENCE_SCALE, t,
+                          lag=env_length * HOP_SIZE / self.sample_rate / 2, smooth=ENABLE_SMOOTHING)
+
+        if DEBUG:
+            print(f"[StreamingBeatDetector] Raw: {raw_bpm:.2f} BPM, BPM: {self.bpm}, Confidence: {self.confidence:.2f}")
+
+
+class BatchTempoAnalyzer(threading.Thread):
+    """
+    Runs the tempo stage of many StreamingBeatDetectors together.
+
+    Detectors whose update is due submit their onset envelope instead of
+    analysing it on their own thread. After the first submission the analyzer
+    waits BATCH_WAIT seconds for others, stacks the envelopes of equal length
+    and rate into one array, and computes autocorrelation, comb scores and
+    peak picking with one vectorized call per group, so NumPy's per-call
+    overhead and the GIL hand-offs are paid once per batch instead of once
+    per slot. Results are published and recorded from this thread only, so
+    a batched detector's readings have a single writer; silent input is
+    submitted as a None envelope and recorded here with zero confidence.
+
+    Each detector's share of a group's analysis time is accounted as its
+    'update' AnalysisTiming, so the overload counters and the delay after an
+    overrun reflect the tempo stage, not just the hand-off.
+    """
+
+    def __init__(self, wait=BATCH_WAIT, min_slots=BATCH_MIN_SLOTS):
+        super().__init__(daemon=True, name="TempoBatch")
+        self.wait = wait
+        self.min_slots = min_slots
+        self.queue = queue.Queue()
+        self.running = True
+        self.batches = 0
+        self.analyzed = 0
+
+    def submit(self, detector, env):
+        """Queue a detector's envelope (a copy; the detector keeps writing its ring), or None for silence."""
+        self.queue.put((detector, env))
+
+    def run(self):
+        while self.running:
+            try:
+                pending = [self.queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.wait
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.analyze(pending)
+
+    def analyze(self, pending):
+        """Analyse a list of (detector, envelope) submissions and publish the results."""
+        groups = {}
+        for detector, env in pending:
+            if env is None:
+                self._record_silence(detector)
+            else:
+                groups.setdefault((detector.sample_rate, len(env)), []).append((detector, env))
+
+        for members in groups.values():
+            if len(members) < self.min_slots and members[0][0].use_numba:
+                for detector, env in members:
+                    self._analyze_one(detector, env)
+                continue
+            detectors = [d for d, _ in members]
+            first = detectors[0]
+            start = time.perf_counter()
+            try:
+                ac = autocorrelation(np.stack([env for _, env in members]), first.max_lag)
+                valid = ac[:, 0] > 0
+                ac[valid] /= ac[valid, :1]
+                scores = ac.astype(np.float32) @ first.comb
+                centers = np.array([d.reference_bpm() or PRIOR_BPM for d in detectors])
+                raw_bpm, score = pick_tempo(scores, first.candidates, centers)
+            except Exception as e:
+                print(f"[BatchTempoAnalyzer] Error analysing batch: {e}")
+                valid = np.zeros(len(detectors), dtype=bool)
+            self.batches += 1
+            self.analyzed += len(detectors)
+            share = (time.perf_counter() - start) / len(detectors)
+
+            for i, detector in enumerate(detectors):
+                try:
+                    if valid[i]:
+                        detector.publish_tempo(float(raw_bpm[i]), float(score[i]), len(members[i][1]))
+                    else:
+                        detector.confidence = 0.0
+                    detector.timing('update').add(share, UPDATE_INTERVAL)
+                    detector.record_estimate()
+                except Exception as e:
+                    print(f"[BatchTempoAnalyzer] Error publishing tempo: {e}")
+                finally:
+                    detector.batch_pending = False
+
+    def _record_silence(self, detector):
+        try:
+            detector.confidence = 0.0
+            detector.record_estimate()
+        except Exception as e:
+            print(f"[BatchTempoAnalyzer] Error publishing tempo: {e}")
+        finally:
+            detector.batch_pending = False
+
+    def _analyze_one(self, detector, env):
+        try:
+            start = time.perf_counter()
+            detector._analyze_tempo(env)
+            detector.timing('update').add(time.perf_counter() - start, UPDATE_INTERVAL)
+            detector.record_estimate()
+        except Exception as e:
+            print(f"[BatchTempoAnalyzer] Error analysing tempo: {e}")
+        finally:
+            detector.batch_pending = False
+        self.analyzed += 1
+
+    def stop(self):
+        self.running = False
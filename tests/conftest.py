@@ -0,0 +1,99 @@
+import time
+import wave
+
+import numpy as np
+import pytest
+
+
+def click_track(bpm, seconds, rate=22050):
+    """Float32 click track: a short decaying 1 kHz burst on every beat."""
+    audio = np.zeros(int(seconds * rate), dtype=np.float32)
+    n = int(0.03 * rate)
+    click = (np.sin(2 * np.pi * 1000 * np.arange(n) / rate) * np.exp(-np.arange(n) / (0.005 * rate))).astype(np.float32)
+    for start in (np.arange(0, seconds, 60.0 / bpm) * rate).astype(int):
+        end = min(start + n, len(audio))
+        audio[start:end] += 0.8 * click[:end - start]
+    return audio
+
+
+def write_wav(path, audio, rate=22050):
+    with wave.open(str(path), 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes((np.clip(audio, -1, 1) * 32767).astype('<i2').tobytes())
+    return str(path)
+
+
+@pytest.fixture
+def click_wav(tmp_path):
+    """Factory: click_wav(bpm, seconds=16, name=None) -> path of a mono 16-bit WAV."""
+    def make(bpm, seconds=16.0, name=None, rate=22050):
+        return write_wav(tmp_path / (name or f"click_{bpm:g}bpm.wav"), click_track(bpm, seconds, rate), rate)
+    return make
+
+
+class FakeStream:
+    """
+    PortAudio input stream stand-in: channel c of frame n holds n + c / 4 (exact in float32),
+    where n counts all frames read from the device, across reopened streams.
+    """
+
+    def __init__(self, pa, channels, frames_per_buffer, **kwargs):
+        self.pa = pa
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.is_open = True
+
+    def read(self, frames, exception_on_overflow=True):
+        time.sleep(self.pa.read_delay)
+        n = np.arange(self.pa.frames, self.pa.frames + frames, dtype=np.float32)
+        self.pa.frames += frames
+        return (n[:, None] + np.arange(self.channels, dtype=np.float32) / 4).astype(np.float32).tobytes()
+
+    def get_read_available(self):
+        return 0
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+class FakePyAudio:
+    """PyAudio stand-in with one multichannel device; every instance and stream is kept for inspection."""
+
+    instances = []
+    device = {'name': 'Fake Interface', 'maxInputChannels': 4, 'defaultSampleRate': 48000}
+    read_delay = 0.001
+
+    def __init__(self):
+        self.streams = []
+        self.frames = 0
+        self.terminated = False
+        FakePyAudio.instances.append(self)
+
+    def get_device_info_by_index(self, index):
+        return dict(self.device)
+
+    def open(self, **kwargs):
+        stream = FakeStream(self, **kwargs)
+        self.streams.append(stream)
+        return stream
+
+    def terminate(self):
+        self.terminated = True
+
+    @classmethod
+    def streams_opened(cls):
+        return [stream for pa in cls.instances for stream in pa.streams]
+
+
+@pytest.fixture
+def fake_pyaudio(monkeypatch):
+    """Replace pyaudio.PyAudio with FakePyAudio (fresh instance list) for the test."""
+    import pyaudio
+    monkeypatch.setattr(FakePyAudio, 'instances', [])
+    monkeypatch.setattr(pyaudio, 'PyAudio', FakePyAudio)
+    return FakePyAudio
@@ -0,0 +1,29 @@
+import time
+import types
+
+import beat_detector_base
+from streaming_beat_detector import StreamingBeatDetector
+
+
+def test_analysis_kinds_have_their_own_budget(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(beat_detector_base, 'time',
+                        types.SimpleNamespace(perf_counter=lambda: now[0], thread_time=time.thread_time))
+    bd = StreamingBeatDetector()
+
+    # a full update at 2 s intervals takes 1.5 s: over its 1 s budget
+    with bd.measure_analysis(2.0) as update:
+        now[0] += 1.5
+    # fast-lock passes at 0.5 s intervals take 0.1 s: within theirs
+    for _ in range(3):
+        with bd.measure_analysis(0.5, kind='fast') as fast:
+            now[0] += 0.1
+
+    assert update is bd.timing('update') and fast is bd.timing('fast')
+    assert update.overruns == 1 and update.delay == 1.0
+    assert fast.overruns == 0 and fast.delay == 0.0
+    assert abs(fast.average - 0.1) < 1e-9
+    stats = bd.get_stats()
+    assert stats['analyses'] == 4 and stats['overruns'] == 1
+    assert stats['analysis_ms'] == 1500.0
+    assert abs(stats['analysis_ms_by_kind']['fast'] - 100.0) < 1e-6
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+aubio = pytest.importorskip('aubio')
+
+from beat_detector import BeatDetector
+
+
+class ScriptedTempo:
+    """Stands in for aubio.tempo: a beat every `every` hops, with scripted BPM readings."""
+
+    def __init__(self, readings, every=40):
+        self.readings = list(readings)
+        self.every = every
+        self.hops = 0
+        self.bpm = 0.0
+
+    def __call__(self, hop):
+        self.hops += 1
+        if self.hops % self.every or not self.readings:
+            return np.zeros(1)
+        self.bpm = self.readings.pop(0)
+        return np.ones(1)
+
+    def get_bpm(self):
+        return self.bpm
+
+    def get_confidence(self):
+        return 0.9
+
+
+def test_readings_go_through_the_tempo_filter():
+    bd = BeatDetector("default", 256, 44100, 1, None)
+    shown = []
+    bd.add_bpm_listener(shown.append)
+    # steady 128 with one octave error in between
+    bd.tempo = ScriptedTempo([128.0] * 10 + [64.0] + [128.2] * 10)
+    bd.process_samples(np.zeros(256 * 40 * 21, dtype=np.float32))
+
+    assert bd.tempo_filter.initialized
+    assert bd.bpm == round(bd.tempo_filter.bpm, 1)
+    assert abs(bd.bpm - 128.1) <= 0.2
+    assert min(shown) >= 127.5         # the single outlier never reached the display
+    times, bpms, confidences = bd.history.read_last(bd.history.capacity)
+    assert len(bpms) == 21 and np.all(confidences == pytest.approx(0.9))
@@ -0,0 +1,93 @@
+import time
+
+import numpy as np
+
+from capture import CaptureHub, QUEUE_BLOCKS
+
+
+BLOCK = 64
+
+
+def read_blocks(subscription, count):
+    blocks = []
+    while len(blocks) < count:
+        samples = subscription.read(timeout=5)
+        assert samples is not None, "capture stalled"
+        blocks.append((subscription.position, np.array(samples)))
+    return blocks
+
+
+def assert_channel(blocks, channel):
+    for position, samples in blocks:
+        assert len(samples) == BLOCK
+        # the block ending at frame `position`, from this channel only
+        expected = np.arange(position - BLOCK, position, dtype=np.float32) + channel / 4
+        np.testing.assert_array_equal(samples, expected)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_channel_slots_share_one_stream(fake_pyaudio):
+    hub = CaptureHub(buffer_size=BLOCK)
+    first = hub.subscribe(3, channel=1)
+    assert_channel(read_blocks(first, 5), 1)
+    capture = first.capture
+    assert capture.channels == 2
+
+    # a slot on a higher channel reopens the stream with more channels; the first keeps running
+    second = hub.subscribe(3, channel=3)
+    assert second.capture is capture
+    assert_channel(read_blocks(second, 5), 3)
+    assert_channel(read_blocks(first, 20), 1)
+    assert capture.channels == 4
+
+    # a lower channel fits the open stream
+    third = hub.subscribe(3, channel=0)
+    assert_channel(read_blocks(third, 5), 0)
+
+    assert len(fake_pyaudio.instances) == 1
+    streams = fake_pyaudio.streams_opened()
+    assert [s.channels for s in streams] == [2, 4]
+    assert [s.is_open for s in streams] == [False, True]
+
+    first.close()
+    second.close()
+    assert_channel(read_blocks(third, 5), 0)
+    assert streams[-1].is_open
+    # the last unsubscribe closes the device
+    third.close()
+    capture.join(timeout=5)
+    assert not capture.is_alive()
+    assert not streams[-1].is_open
+    assert fake_pyaudio.instances[0].terminated
+    assert hub.captures == {}
+
+
+def test_slow_subscriber_drops_without_stalling_others(fake_pyaudio):
+    hub = CaptureHub(buffer_size=BLOCK)
+    slow = hub.subscribe(0, channel=0)
+    fast = hub.subscribe(0, channel=1)
+    try:
+        # `slow` never reads: its queue fills, then it drops blocks
+        blocks = read_blocks(fast, 3 * QUEUE_BLOCKS)
+        wait_until(lambda: slow.dropped > 0)
+        assert slow.queue.qsize() == QUEUE_BLOCKS
+        assert fast.dropped == 0
+        assert_channel(blocks, 1)
+        # the reader kept up: consecutive blocks, no gaps
+        positions = [position for position, _ in blocks]
+        assert np.all(np.diff(positions) == BLOCK)
+
+        # the dropped blocks show as a jump in the slow subscriber's position
+        queued = [slow.read(timeout=0) is not None and slow.position for _ in range(QUEUE_BLOCKS)]
+        assert queued == list(range(BLOCK, (QUEUE_BLOCKS + 1) * BLOCK, BLOCK))
+        assert_channel(read_blocks(slow, 1), 0)
+        assert slow.position > (QUEUE_BLOCKS + 1) * BLOCK
+    finally:
+        hub.close(timeout=5)
+    assert not fake_pyaudio.streams_opened()[-1].is_open
@@ -0,0 +1,94 @@
+import json
+import os
+import time
+
+from config_store import ConfigStore, validate_config
+
+
+def test_librosa_preset_types_and_ranges():
+    config = validate_config({'librosa_preset': {
+        'hop_length': 384.0,        # integral float from JSON: accepted as int
+        'fmin': '30',
+        'fmax': 6000,
+        'tightness': 0,             # out of range
+        'measurement_std': 'high',  # wrong type
+    }})
+    preset = config['librosa_preset']
+    assert preset == {'hop_length': 384, 'fmin': 30.0, 'fmax': 6000}
+    assert isinstance(preset['hop_length'], int)
+
+    preset = validate_config({'librosa_preset': {'hop_length': 256.5, 'fmin': 500, 'fmax': 1000}})['librosa_preset']
+    assert preset == {'fmin': 500, 'fmax': 1000}
+
+    preset = validate_config({'librosa_preset': {'hop_length': 512, 'fmin': 1500, 'fmax': 1200}})['librosa_preset']
+    assert preset == {'hop_length': 512}
+
+    assert 'librosa_preset' not in validate_config({'librosa_preset': [256]})
+
+
+def make_store(tmp_path, debounce=0.05):
+    path = tmp_path / 'config.json'
+    # as the app writes it, so loading changes nothing
+    path.write_text(json.dumps(validate_config({}), indent=4))
+    store = ConfigStore(str(path), debounce=debounce)
+    writes = []
+    write = store._atomic_write
+    store._atomic_write = lambda text: (writes.append(text), write(text))
+    return store, path, writes
+
+
+def test_saves_within_the_debounce_window_write_once(tmp_path):
+    store, path, writes = make_store(tmp_path)
+    for size in (31, 32, 33):
+        store.config['font_size'] = size
+        store.save()
+    time.sleep(0.3)
+    assert len(writes) == 1
+    assert json.loads(path.read_text())['font_size'] == 33
+
+    # nothing changed since: not rewritten
+    store.save()
+    time.sleep(0.3)
+    store.flush()
+    assert len(writes) == 1
+
+
+def test_unchanged_config_is_not_rewritten(tmp_path):
+    store, path, writes = make_store(tmp_path)
+    before = path.stat().st_mtime_ns
+    store.save()
+    store.flush()
+    assert writes == []
+    assert path.stat().st_mtime_ns == before
+
+
+def test_flush_writes_the_pending_change(tmp_path):
+    store, path, writes = make_store(tmp_path, debounce=60.0)
+    store.config['font_color'] = 'red'
+    store.save()
+    assert writes == []
+    store.flush()
+    assert len(writes) == 1
+    assert json.loads(path.read_text())['font_color'] == 'red'
+    assert store._timer is None
+
+
+def test_failed_replace_keeps_the_old_file(tmp_path, monkeypatch):
+    store, path, writes = make_store(tmp_path)
+    original = path.read_text()
+
+    def fail(src, dst):
+        raise OSError("disk gone")
+    monkeypatch.setattr(os, 'replace', fail)
+    store.config['font_size'] = 99
+    store.save()
+    store.flush()
+    assert len(writes) == 1
+    assert path.read_text() == original
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['config.json']
+
+    # the change is still pending for the next save
+    monkeypatch.undo()
+    store.save()
+    store.flush()
+    assert json.loads(path.read_text())['font_size'] == 99
@@ -0,0 +1,188 @@
+import json
+import os
+import queue
+import time
+
+from beat_detector import list_input_devices
+from device_monitor import DeviceMonitor, ReattachBackoff, plan_reattach
+
+
+MIC = {'name': 'Built-in Mic', 'maxInputChannels': 1, 'defaultSampleRate': 44100}
+USB = {'name': 'USB Interface', 'maxInputChannels': 2, 'defaultSampleRate': 48000}
+
+
+class FakePortAudio:
+    """
+    Scripted PortAudio: like the real one, the device list (read from the JSON
+    file named by $FAKE_PORTAUDIO_DEVICES) is only scanned when the first
+    instance of the process is created, and kept while any instance is alive.
+    """
+    instances = 0
+    devices = []
+
+    def __init__(self):
+        if FakePortAudio.instances == 0:
+            with open(os.environ['FAKE_PORTAUDIO_DEVICES']) as f:
+                FakePortAudio.devices = json.load(f)
+        FakePortAudio.instances += 1
+        self.devices = FakePortAudio.devices
+        self.terminated = False
+
+    def get_device_count(self):
+        return len(self.devices)
+
+    def get_device_info_by_index(self, index):
+        return self.devices[index]
+
+    def terminate(self):
+        if not self.terminated:
+            self.terminated = True
+            FakePortAudio.instances -= 1
+
+
+def plug(path, *devices):
+    with open(path, 'w') as f:
+        json.dump(list(devices), f)
+
+
+def names(devices):
+    return [d['name'] for d in devices]
+
+
+def test_monitor_sees_replug_while_a_stream_is_open(tmp_path, monkeypatch):
+    path = str(tmp_path / 'devices.json')
+    monkeypatch.setenv('FAKE_PORTAUDIO_DEVICES', path)
+    plug(path, MIC, USB)
+    held = FakePortAudio()        # a running detector's instance
+    changes = queue.Queue()
+    monitor = DeviceMonitor(changes.put, interval=0.05, pa_factory=FakePortAudio)
+    try:
+        monitor.start()
+        deadline = time.monotonic() + 30
+        while monitor._signature is None and time.monotonic() < deadline:
+            time.sleep(0.01)    # the first poll records the current devices
+
+        plug(path, MIC)
+        # within this process the unplug goes unnoticed while `held` is alive
+        assert names(list_input_devices(FakePortAudio)) == ['Built-in Mic', 'USB Interface']
+        assert names(changes.get(timeout=30)) == ['Built-in Mic']
+
+        plug(path, MIC, USB)
+        assert names(changes.get(timeout=30)) == ['Built-in Mic', 'USB Interface']
+
+        monitor.rescan()
+        assert names(changes.get(timeout=30)) == ['Built-in Mic', 'USB Interface']
+    finally:
+        monitor.stop()
+        monitor.join(timeout=5)
+        held.terminate()
+    assert not monitor.is_alive()
+    assert monitor._process is None
+
+
+def test_monitor_restarts_a_dead_enumeration_process(tmp_path, monkeypatch):
+    path = str(tmp_path / 'devices.json')
+    monkeypatch.setenv('FAKE_PORTAUDIO_DEVICES', path)
+    plug(path, MIC)
+    monitor = DeviceMonitor(lambda devices: None, pa_factory=FakePortAudio)
+    try:
+        assert names(monitor.enumerate()) == ['Built-in Mic']
+        monitor._process.kill()
+        monitor._process.join()
+        plug(path, MIC, USB)
+        assert names(monitor.enumerate()) == ['Built-in Mic', 'USB Interface']
+    finally:
+        monitor._stop_process()
+
+
+def test_reattach_backoff_doubles_and_resets():
+    backoff = ReattachBackoff(start=2.0, maximum=10.0)
+    now = 100.0
+    waits = []
+    for _ in range(5):
+        assert backoff.due(0, now)
+        backoff.attempted(0, now)
+        wait = 0.0
+        while not backoff.due(0, now + wait):
+            wait += 1.0
+        waits.append(wait)
+        now += wait
+    assert waits == [2.0, 4.0, 8.0, 10.0, 10.0]
+    assert backoff.due(1, now)    # other slots are unaffected
+
+    backoff.reset()
+    assert backoff.due(0, now)
+
+
+class Detector:
+    def __init__(self, failed=False):
+        self.failed = failed
+
+
+def listed(*names):
+    return [{'id': i, 'name': name} for i, name in enumerate(names)]
+
+
+SLOTS = [{'id': 10, 'name': 'Deck A'}, {'id': 11, 'name': 'Deck B'}, {'id': 12, 'name': 'Mixer'}]
+
+
+def own_view(*names):
+    calls = []
+
+    def own_devices():
+        calls.append(True)
+        return listed(*names)
+    return own_devices, calls
+
+
+def test_plan_leaves_healthy_and_still_missing_slots_alone():
+    own, calls = own_view('Deck A', 'Mixer')
+    plan = plan_reattach(SLOTS, [Detector(), None, Detector()], listed('Deck A', 'Mixer'),
+                         own, ReattachBackoff(), 0.0)
+    assert (plan.detach, plan.attach, plan.restart, plan.attempts) == ([], {}, False, [])
+    assert calls == []      # our PortAudio is not touched when nothing is to be attached
+
+
+def test_plan_detaches_a_slot_whose_device_is_gone():
+    own, _ = own_view('Deck A')
+    plan = plan_reattach(SLOTS, [Detector(), Detector(failed=True), None], listed('Deck A'),
+                         own, ReattachBackoff(), 0.0)
+    assert plan.detach == [1]
+    assert plan.attach == {} and not plan.restart
+
+
+def test_plan_reattaches_a_slot_alone_when_our_portaudio_knows_its_device():
+    # e.g. no other input was open, so our enumeration is fresh as well
+    own, _ = own_view('Mixer', 'Deck B', 'Deck A')
+    plan = plan_reattach(SLOTS, [Detector(), None, Detector()], listed('Deck A', 'Deck B', 'Mixer'),
+                         own, ReattachBackoff(), 0.0)
+    assert plan.attach == {1: 1}
+    assert plan.attempts == [1] and not plan.restart
+
+    # a slot whose detector failed although its device is listed is retried the same way
+    plan = plan_reattach(SLOTS, [Detector(failed=True), Detector(), Detector()], listed('Deck A', 'Deck B', 'Mixer'),
+                         own, ReattachBackoff(), 0.0)
+    assert plan.attach == {0: 2}
+
+
+def test_plan_restarts_all_inputs_for_a_device_our_portaudio_has_not_seen():
+    own, _ = own_view('Deck A', 'Mixer')      # initialised before Deck B was plugged in
+    plan = plan_reattach(SLOTS, [Detector(), None, Detector()], listed('Deck A', 'Deck B', 'Mixer'),
+                         own, ReattachBackoff(), 0.0)
+    assert plan.restart
+    assert plan.attempts == [1] and plan.attach == {}
+
+
+def test_plan_applies_the_backoff():
+    backoff = ReattachBackoff(start=2.0)
+    own, calls = own_view('Deck A', 'Deck B', 'Mixer')
+    devices = listed('Deck A', 'Deck B', 'Mixer')
+    detectors = [Detector(), Detector(failed=True), Detector()]
+    backoff.attempted(1, 100.0)
+
+    plan = plan_reattach(SLOTS, detectors, devices, own, backoff, 101.0)
+    assert plan.attempts == [] and plan.attach == {} and calls == []
+    plan = plan_reattach(SLOTS, detectors, devices, own, backoff, 102.0)
+    assert plan.attempts == [1] and plan.attach == {1: 1}
+    # the plan only reads the backoff; the caller records the attempt
+    assert backoff.due(1, 102.0)
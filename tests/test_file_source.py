@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from capture import FileSource
+
+
+BACKENDS = ['librosa', 'aubio', 'streaming']
+
+
+def make_detector(backend, source=None, device=None):
+    if backend == 'aubio':
+        pytest.importorskip('aubio')
+        import pyaudio
+        from beat_detector import BeatDetector
+        return BeatDetector("default", 256, source.sample_rate if source else 44100, 1, pyaudio.paFloat32,
+                            input_device_index=device, source=source)
+    if backend == 'streaming':
+        from streaming_beat_detector import StreamingBeatDetector
+        return StreamingBeatDetector(input_device_index=device, source=source)
+    pytest.importorskip('librosa')
+    from librosa_beat_detector import LibrosaBeatDetector
+    return LibrosaBeatDetector(input_device_index=device, source=source)
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_backend_finds_tempo_of_click_file(backend, click_wav):
+    source = FileSource(click_wav(128, seconds=20.0))
+    detector = make_detector(backend, source)
+    detector.start()
+    detector.join(timeout=120)
+    assert not detector.is_alive()
+    assert not detector.failed
+    assert abs(detector.bpm - 128) <= 2
+    # the detector stopped at the end of the file and released it
+    assert source.finished and source.closed
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_stop_closes_file_source(backend, click_wav):
+    source = FileSource(click_wav(128, seconds=60.0), realtime=True)
+    detector = make_detector(backend, source)
+    detector.start()
+    time.sleep(0.3)
+    detector.stop()
+    detector.join(timeout=10)
+    assert not detector.is_alive()
+    assert not source.finished
+    assert source.closed
+    assert detector.stream is None and detector.pa is None
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_own_stream_opened_on_run_and_released_on_stop(backend, fake_pyaudio):
+    detector = make_detector(backend, device=0)
+    # nothing is opened before the detector thread runs
+    assert fake_pyaudio.instances == []
+    assert detector.stream is None and detector.pa is None
+
+    detector.start()
+    wait_for(lambda: detector.stream_position > 0)
+    [pa] = fake_pyaudio.instances
+    [stream] = fake_pyaudio.streams_opened()
+    assert stream.is_open and not pa.terminated
+
+    detector.stop()
+    detector.join(timeout=10)
+    assert not detector.is_alive()
+    assert not stream.is_open and pa.terminated
+    assert detector.stream is None and detector.pa is None
@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import soundfile
+
+from library import analyze_folder, load_cache
+
+
+def _corrupt_flac(path, rate=22050):
+    """A FLAC whose header is fine but whose middle is overwritten, so decoding fails partway."""
+    noise = (np.random.default_rng(0).standard_normal(rate * 12) * 0.1).astype(np.float32)
+    soundfile.write(path, noise, rate)
+    data = bytearray(open(path, 'rb').read())
+    data[len(data) // 3:len(data) // 3 + 20000] = bytes(20000)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_bad_files_are_reported_and_do_not_abort_the_run(tmp_path, click_wav):
+    good = [click_wav(120), click_wav(140)]
+    bad = str(tmp_path / "corrupt.flac")
+    _corrupt_flac(bad)
+    with open(tmp_path / "not_audio.wav", 'wb') as f:
+        f.write(b"not a wav file")
+    cache = str(tmp_path / "cache.json")
+
+    results = dict(analyze_folder(str(tmp_path), workers=1, cache_path=cache, progress=lambda line: None))
+
+    assert len(results) == 4
+    assert abs(results[good[0]]['bpm'] - 120) <= 1.0
+    assert abs(results[good[1]]['bpm'] - 140) <= 1.0
+    assert 'error' in results[bad]
+    assert 'error' in results[str(tmp_path / "not_audio.wav")]
+    # good results are cached, failures are not
+    assert len(load_cache(cache)['results']) == 2
+    assert os.path.exists(cache)
@@ -0,0 +1,18 @@
+import pytest
+
+pytest.importorskip('librosa')
+
+from capture import FileSource
+from librosa_beat_detector import LibrosaBeatDetector
+
+
+@pytest.mark.parametrize('fast_lock', [None, True])
+def test_fast_lock_is_opt_in_per_slot(fast_lock, click_wav):
+    source = FileSource(click_wav(128, seconds=12.0))
+    bd = LibrosaBeatDetector(source=source, fast_lock=fast_lock)
+    bd.start()
+    bd.join(timeout=120)
+    assert bd.fast_lock is bool(fast_lock)
+    # the quick estimate only runs on slots that enable it
+    assert (bd.timing('fast').count > 0) is bool(fast_lock)
+    assert bd.timing('update').count > 0
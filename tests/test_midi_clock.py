@@ -0,0 +1,270 @@
+import random
+import statistics
+import threading
+import time
+import types
+
+import mido
+import pytest
+
+import midi_clock
+from midi_clock import ClockRoute, MIDIClockReceiver, MIDIClockRouter, MIDIClockSender
+
+
+class ReplayPort:
+    """In-memory input port: replays recorded (arrival time, message) pairs through the callback."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.callback = None
+        self.closed = False
+
+    def replay(self, events):
+        for t, message in events:
+            self.clock.now = t
+            self.callback(message)
+
+    def close(self):
+        self.closed = True
+
+
+def recorded_clock(bpm, beats, start=10.0, jitter=0.0005, seed=1):
+    """Start + 24 PPQN pulses as a USB interface timestamps them: jittered, with an occasional late pulse."""
+    rng = random.Random(seed)
+    period = 60.0 / bpm / 24
+    events = [(start - 0.001, mido.Message('start'))]
+    for i in range(beats * 24):
+        late = 0.003 if i % 50 == 49 else 0.0
+        events.append((start + i * period + rng.gauss(0.0, jitter) + late, mido.Message('clock')))
+    return events
+
+
+class RecordingPort:
+    """In-memory output port: keeps (send time, message type) of everything sent."""
+
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    def send(self, message):
+        self.sent.append((time.perf_counter(), message.type))
+
+    def close(self):
+        self.closed = True
+
+    def ticks(self):
+        return [t for t, kind in self.sent if kind == 'clock']
+
+
+def assert_24_ppqn(port, bpm):
+    ticks = port.ticks()
+    assert len(ticks) > 24
+    period = 60.0 / (bpm * 24)
+    spacing = [b - a for a, b in zip(ticks, ticks[1:])]
+    assert statistics.median(spacing) == pytest.approx(period, abs=0.001)
+    # drift-compensated: the schedule, not each sleep, sets the average rate
+    assert (ticks[-1] - ticks[0]) / len(spacing) == pytest.approx(period, rel=0.01)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=0.0)
+    monkeypatch.setattr(midi_clock, 'time', types.SimpleNamespace(perf_counter=lambda: clock.now))
+    return clock
+
+
+def test_receiver_locks_to_replayed_clock(clock):
+    port = ReplayPort(clock)
+    receiver = MIDIClockReceiver('Replay', port=port)
+    events = recorded_clock(124.0, beats=16)
+
+    # not locked before a whole beat of pulses
+    port.replay(events[:12])
+    assert not receiver.is_locked()
+    port.replay(events[12:])
+
+    last = events[-1][0]
+    assert receiver.playing
+    assert receiver.pulse_count == 16 * 24
+    assert receiver.is_locked(now=last + 0.01)
+    assert abs(receiver.bpm - 124.0) < 0.1
+
+    # the last pulse is the 24th of the 16th beat: the next beat starts one pulse later
+    period = 60.0 / 124.0 / 24
+    assert receiver.get_phase(now=last) == pytest.approx(23 / 24, abs=0.01)
+    assert receiver.get_phase(now=last + period / 2) == pytest.approx(23.5 / 24, abs=0.01)
+
+    # half-way through a beat
+    port.replay(recorded_clock(124.0, beats=1, start=last + period, seed=2)[1:13])
+    assert receiver.get_phase() == pytest.approx(11 / 24, abs=0.01)
+
+    # the clock stopped: no longer usable
+    assert not receiver.is_locked(now=clock.now + 1.0)
+    receiver.close()
+    assert port.closed
+
+
+def test_receiver_does_not_fit_across_a_pause(clock):
+    port = ReplayPort(clock)
+    receiver = MIDIClockReceiver('Replay', port=port)
+    port.replay(recorded_clock(100.0, beats=4))
+    resumed = recorded_clock(140.0, beats=2, start=clock.now + 3.0)[1:]
+    port.replay(resumed)
+    assert receiver.is_locked()
+    assert abs(receiver.bpm - 140.0) < 0.2
+
+
+def test_sender_ticks_at_24_ppqn():
+    port = RecordingPort()
+    sender = MIDIClockSender(ramp_rate=0)
+    sender.port = port
+    sender.set_bpm(125.0)
+    sender.start()
+    time.sleep(1.0)
+    sender.close()
+    assert [kind for _, kind in port.sent[:1]] == ['start']
+    assert port.sent[-1][1] == 'stop'
+    assert port.closed
+    assert_24_ppqn(port, 125.0)
+
+
+def test_router_ticks_each_route_at_24_ppqn():
+    router = MIDIClockRouter()
+    ports = {bpm: RecordingPort() for bpm in (90.0, 140.0)}
+    for bpm, port in ports.items():
+        router.add_route(f"fake {bpm:g}", port=port, ramp_rate=0).set_bpm(bpm)
+    router.start()
+    time.sleep(1.0)
+    router.close()
+    for bpm, port in ports.items():
+        assert port.sent[0][1] == 'start' and port.sent[-1][1] == 'stop'
+        assert_24_ppqn(port, bpm)
+
+
+class FakeDetector:
+    def __init__(self):
+        self.bpm = 0.0
+        self.confidence = 0.0
+        self.listeners = []
+
+    def add_bpm_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_bpm_listener(self, callback):
+        self.listeners.remove(callback)
+
+    def update(self, bpm, confidence):
+        self.confidence = confidence
+        changed = bpm != self.bpm
+        self.bpm = bpm
+        if changed:
+            for callback in list(self.listeners):
+                callback(bpm)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_route_takes_held_bpm_once_confidence_rises():
+    detector = FakeDetector()
+    router = MIDIClockRouter()
+    port = RecordingPort()
+    route = router.add_route("fake", detector=detector, port=port, ramp_rate=0)
+    router.start()
+    try:
+        detector.update(128.0, 0.1)     # unreliable: held back, the clock does not start
+        time.sleep(0.2)
+        assert route.target_bpm == 0.0 and not route.started
+
+        detector.update(128.0, 0.9)     # same BPM, so no listener call
+        assert wait_for(lambda: route.started)
+        assert route.bpm == 128.0
+
+        detector.update(132.0, 0.1)
+        time.sleep(0.2)
+        assert route.target_bpm == 128.0
+        detector.update(132.0, 0.8)
+        assert wait_for(lambda: route.bpm == 132.0)
+    finally:
+        router.close()
+
+
+
+def beat_tempos(ticks):
+    """Tempo of each whole beat (24 consecutive pulses) of recorded ticks."""
+    return [60.0 / (ticks[i + 24] - ticks[i]) for i in range(0, len(ticks) - 24, 24)]
+
+
+def test_route_glides_to_a_new_tempo():
+    ramp_rate = 20.0
+    route = ClockRoute("fake", port=RecordingPort(), ramp_rate=ramp_rate)
+    route.set_bpm(200.0)        # not started yet: applied immediately
+    route.started = True        # as the router does after sending START
+    # the router schedules each pulse one _advance() interval after the previous one
+    ticks, bpms = [0.0], [route.bpm]
+
+    def play_until(end):
+        while ticks[-1] < end:
+            ticks.append(ticks[-1] + route._advance())
+            bpms.append(route.bpm)
+
+    play_until(1.0)
+    changed = ticks[-1]
+    route.set_bpm(230.0)        # a 1.5 s glide
+    play_until(changed + 3.0)
+
+    before = ticks[:ticks.index(changed) + 1]
+    after = ticks[ticks.index(changed):]
+    assert beat_tempos(before) == pytest.approx([200.0] * len(beat_tempos(before)))
+    tempos = beat_tempos(after)
+    assert all(b >= a - 1e-6 for a, b in zip(tempos, tempos[1:])), tempos
+    # at most ramp_rate BPM per second of clock time, i.e. per beat
+    assert all(b - a <= ramp_rate * 60.0 / a + 1e-6 for a, b in zip(tempos, tempos[1:])), tempos
+    assert tempos[0] < 215.0    # it did not jump
+    arrived = ticks[bpms.index(230.0)]
+    assert arrived - changed == pytest.approx(30.0 / ramp_rate, abs=0.05)
+    # settled on the new tempo, at 24 PPQN
+    settled = [t for t in after if t >= arrived]
+    assert_24_ppqn(types.SimpleNamespace(ticks=lambda: settled), 230.0)
+
+
+class SlowPort(RecordingPort):
+    """Output port whose sends block, like a stalled USB MIDI driver."""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.sending = False
+
+    def send(self, message):
+        self.sending = True
+        time.sleep(self.delay)
+        super().send(message)
+        self.sending = False
+
+
+def test_router_lock_is_not_held_during_port_io():
+    router = MIDIClockRouter()
+    slow = SlowPort(0.3)
+    router.add_route("slow", port=slow, ramp_rate=0).set_bpm(120.0)
+    router.start()
+    try:
+        assert wait_for(lambda: slow.sending)
+        done = threading.Event()
+
+        def reconfigure():
+            route = router.add_route("other", port=RecordingPort(), ramp_rate=0)
+            router.get_stats()
+            router.remove_route(route)
+            done.set()
+
+        threading.Thread(target=reconfigure, daemon=True).start()
+        assert done.wait(0.1)
+        assert slow.sending
+    finally:
+        router.close()
+    assert slow.closed and slow.sent[-1][1] == 'stop'
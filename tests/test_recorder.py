@@ -0,0 +1,35 @@
+import threading
+
+import numpy as np
+
+from recorder import SessionRecorder, RecordingSource
+
+
+def test_stopping_and_new_detector_share_a_recorder(tmp_path):
+    path = str(tmp_path / 'slot0.bpmrec')
+    recorder = SessionRecorder(path, seconds=2.5, max_rate=48000)   # holds all blocks
+    blocks, size, rate = 200, 256, 48000
+    start = threading.Barrier(2)
+
+    def detector(value):
+        # a stopping detector still writes while its replacement starts
+        block = np.full(size, value, dtype=np.float32)
+        start.wait()
+        for i in range(blocks):
+            recorder.write(block, (i + 1) * size, rate)
+
+    threads = [threading.Thread(target=detector, args=(value,)) for value in (1.0, 2.0)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    source = RecordingSource(path)
+    assert source.sample_rate == rate
+    assert source.block_ends[-1] == 2 * blocks * size
+    replayed = []
+    while (block := source.read()) is not None:
+        # every block is whole: its samples all come from one writer
+        assert len(block) == size and len(np.unique(block)) == 1
+        replayed.append(block[0])
+    assert replayed.count(1.0) == replayed.count(2.0) == blocks
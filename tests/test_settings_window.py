@@ -0,0 +1,80 @@
+import ui
+from ui import SettingsWindow
+
+
+def make_window(slots, saved):
+    config = {
+        'font_size': 30,
+        'input_devices': [{'id': i, 'name': f'Input {i}', 'x': 100, 'y': 10 * i, 'text_size': 30}
+                          for i in range(slots)],
+    }
+    window = SettingsWindow(None, config, saved.append, lambda: None)
+    window.load_row_values()
+    return window
+
+
+def test_save_validates_rows_out_of_view(monkeypatch):
+    errors = []
+    monkeypatch.setattr(ui.messagebox, 'showerror', lambda title, message: errors.append(message))
+    saved = []
+    window = make_window(50, saved)
+
+    # an invalid edit in a row that has since been scrolled out of view (no widgets)
+    window.set_row_values(40, dict(window.row_values[40], x='12a'))
+    assert window.config['input_devices'][40]['x'] == 100
+    window.save()
+    assert errors == ["Invalid values in row 40"]
+    assert saved == []
+
+    window.set_row_values(40, dict(window.row_values[40], x='120', text_size='48'))
+    window.save()
+    assert len(saved) == 1
+    assert window.config['input_devices'][40]['x'] == 120
+    assert window.config['input_devices'][40]['text_size'] == 48
+    assert window.row_values[40]['x'] == '120'
+
+
+class IdleRoot:
+    """Tk root stand-in that keeps after_idle callbacks until run_idle()."""
+
+    def __init__(self):
+        self.idle = []
+
+    def after_idle(self, func):
+        self.idle.append(func)
+        return len(self.idle)
+
+    def run_idle(self):
+        idle, self.idle = self.idle, []
+        for func in idle:
+            func()
+
+
+def test_burst_of_edits_is_one_update_per_slot(monkeypatch):
+    root = IdleRoot()
+    window = make_window(8, [])
+    overlay = ui.OverlayController(root, [None] * 8, window.config, None)
+    window.on_change = lambda config, changes: overlay.request_update(changes)
+    calls = []
+    monkeypatch.setattr(overlay, '_update_slot', lambda i, fields=None: calls.append(
+        (i, fields, {key: overlay.config['input_devices'][i][key] for key in ('x', 'y', 'text_size')})))
+
+    # typing in two rows before Tk gets idle
+    for x in ('1', '12', '120'):
+        window.set_row_values(3, dict(window.row_values[3], x=x))
+    window.set_row_values(3, dict(window.row_values[3], text_size='48'))
+    window.set_row_values(5, dict(window.row_values[5], y='7'))
+    window.set_row_values(5, dict(window.row_values[5], y='75'))
+    assert calls == []
+    assert len(root.idle) == 1
+
+    root.run_idle()
+    assert sorted(calls) == [
+        (3, {'x', 'text_size'}, {'x': 120, 'y': 30, 'text_size': 48}),
+        (5, {'y'}, {'x': 100, 'y': 75, 'text_size': 30}),
+    ]
+
+    # the next edit schedules a new idle update
+    window.set_row_values(3, dict(window.row_values[3], x='130'))
+    root.run_idle()
+    assert calls[-1] == (3, {'x'}, {'x': 130, 'y': 30, 'text_size': 48})
@@ -0,0 +1,80 @@
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from shared_state import SharedStateReader, SharedStateTable
+
+
+@pytest.fixture
+def table():
+    table = SharedStateTable(f"bpm_test_{os.getpid()}")
+    yield table
+    table.close()
+
+
+def test_publish_and_read(table):
+    reader = SharedStateReader(table.shm.name.lstrip('/'))
+    table.slot(2).publish(124.0, 0.9, 44100, beat_time=1000.0, beat_sample=4410)
+    state = reader.read(2)
+    assert state['seq'] == 2
+    assert state['bpm'] == 124.0 and state['confidence'] == 0.9
+    assert state['beat_time'] == 1000.0 and state['beat_sample'] == 4410 and state['sample_rate'] == 44100
+    assert 0.0 <= state['phase'] < 1.0
+    assert list(reader.read_all()) == [2]
+    reader.close()
+
+
+def test_concurrent_writers_keep_seq_consistent(table):
+    reader = SharedStateReader(table.shm.name.lstrip('/'))
+    publisher = table.slot(0)
+    n = 20000
+    torn = []
+    done = threading.Event()
+
+    def write(offset):
+        for k in range(n):
+            value = float(offset + k)
+            publisher.publish(value, 0.5, value, beat_time=value, beat_sample=value)
+
+    def read():
+        while not done.is_set():
+            _, values = reader.read_row(0, timeout=5.0)
+            if not values[0] == values[4] == values[5] == values[6]:
+                torn.append(values)
+
+    writers = [threading.Thread(target=write, args=(offset,)) for offset in (1e6, 2e6)]
+    checker = threading.Thread(target=read)
+    # switch threads as often as possible, so unserialized writes would interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        checker.start()
+        for t in writers:
+            t.start()
+        for t in writers:
+            t.join()
+    finally:
+        done.set()
+        checker.join()
+        sys.setswitchinterval(interval)
+    assert int(table.seq[0]) == 2 * 2 * n
+    assert not torn
+    reader.close()
+
+
+def test_reader_rejects_torn_and_stalled_slots(table):
+    reader = SharedStateReader(table.shm.name.lstrip('/'))
+    table.slot(1).publish(128.0, 0.8, 48000)
+    # a field store that became visible without the matching check word (weakly ordered CPU)
+    table.fields[1, 1] = np.array(64.0).view('<u8')
+    with pytest.raises(TimeoutError):
+        reader.read_row(1, timeout=0.01)
+    # a writer stopped between the two seq stores
+    table.slot(3).publish(128.0, 0.8, 48000)
+    table.seq[3] += 1
+    with pytest.raises(TimeoutError):
+        reader.read_row(3, timeout=0.01)
+    reader.close()
@@ -0,0 +1,55 @@
+import threading
+
+import numpy as np
+
+from streaming_beat_detector import StreamingBeatDetector, BatchTempoAnalyzer, UPDATE_INTERVAL
+from conftest import click_track
+
+
+def feed(detector, audio, block=1024):
+    for start in range(0, len(audio) - block + 1, block):
+        detector.process_samples(audio[start:start + block])
+
+
+def test_batch_thread_is_the_only_writer():
+    batch = BatchTempoAnalyzer(min_slots=1)
+    bd = StreamingBeatDetector(batch=batch)
+    writers = []
+    bd.record_estimate = lambda: writers.append(threading.current_thread().name)
+
+    # several updates are due while the first batch is still pending: none is recorded here
+    feed(bd, click_track(120, 16.0, bd.sample_rate))
+    assert writers == []
+    assert bd.batch_pending
+    assert batch.queue.qsize() == 1
+
+    worker = threading.Thread(target=lambda: batch.analyze([batch.queue.get()]), name="TempoBatch")
+    worker.start()
+    worker.join()
+    assert writers == ["TempoBatch"]
+    assert not bd.batch_pending
+    assert abs(bd.bpm - 120) <= 2
+    # the tempo stage is timed on the batch thread, the hand-off on the detector thread
+    assert bd.timing('update').count == 1
+    assert bd.timing('submit').count >= 1
+
+    # silence goes through the batch thread as well
+    feed(bd, np.zeros(int((UPDATE_INTERVAL + 1) * bd.sample_rate), dtype=np.float32))
+    assert writers == ["TempoBatch"]
+    detector, env = batch.queue.get_nowait()
+    assert detector is bd and env is None
+    batch.analyze([(detector, env)])
+    assert bd.confidence == 0.0
+    assert len(writers) == 2 and not bd.batch_pending
+
+
+def test_unbatched_detector_records_each_reading_once():
+    bd = StreamingBeatDetector()
+    readings = []
+    bd.record_estimate = lambda: readings.append(bd.bpm)
+    seconds = 16.0
+    feed(bd, click_track(120, seconds, bd.sample_rate))
+    # no reading (and nothing recorded) until the envelope covers the longest comb
+    first = (bd.max_lag + 1) / bd.frame_rate
+    assert 0 < len(readings) <= (seconds - first) / UPDATE_INTERVAL + 1
+    assert all(bpm > 0 for bpm in readings)
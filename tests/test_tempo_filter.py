@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from beat_detector_base import TempoFilter
+
+
+def settled(bpm=120.0, readings=20):
+    tempo_filter = TempoFilter()
+    for t in range(readings):
+        tempo_filter.update(bpm, 1.0, float(t))
+    return tempo_filter
+
+
+def run_ramp(lag, seconds=40, start=120.0, rate=0.5, seed=0):
+    """Readings once a second of a tempo rising by `rate` BPM/s, each describing the tempo `lag` s earlier."""
+    rng = np.random.default_rng(seed)
+    tempo_filter = TempoFilter()
+    for t in range(1, seconds + 1):
+        measured = start + rate * max(0.0, t - lag) + rng.normal(0.0, 0.2)
+        tempo_filter.update(measured, 0.9, float(t), lag=lag)
+    return tempo_filter, start + rate * seconds
+
+
+def test_tracks_drift_across_a_tempo_ramp():
+    tempo_filter, true_bpm = run_ramp(lag=0.0)
+    assert tempo_filter.bpm == pytest.approx(true_bpm, abs=0.5)
+    assert tempo_filter.drift == pytest.approx(0.5, abs=0.15)
+
+
+def test_lagged_readings_are_corrected_towards_the_current_tempo():
+    corrected, true_bpm = run_ramp(lag=4.0)
+    # the same readings taken at face value trail the ramp by about drift * lag = 2 BPM
+    rng = np.random.default_rng(0)
+    uncorrected = TempoFilter()
+    for t in range(1, 41):
+        uncorrected.update(120.0 + 0.5 * (t - 4.0) + rng.normal(0.0, 0.2), 0.9, float(t))
+    trailing = true_bpm - uncorrected.bpm
+    assert trailing > 1.5
+    # the drift decay holds the drift estimate below the true 0.5 BPM/s, so the
+    # correction is partial; it must still remove a good part of the trailing
+    assert 0.0 < true_bpm - corrected.bpm < 0.65 * trailing
+    assert corrected.drift > 0.1
+
+
+def test_gain_follows_confidence():
+    moves = {}
+    for confidence in (1.0, 0.2):
+        tempo_filter = settled()
+        tempo_filter.update(122.0, confidence, 20.0)
+        moves[confidence] = tempo_filter.bpm - 120.0
+    assert 0.0 < moves[0.2] < moves[1.0] / 2
+
+
+def test_single_outlier_is_ignored_and_a_sustained_jump_accepted():
+    tempo_filter = settled()
+    # an octave error
+    assert tempo_filter.update(240.0, 0.9, 20.0) == pytest.approx(120.0, abs=0.01)
+    assert tempo_filter.update(120.0, 1.0, 21.0) == pytest.approx(120.0, abs=0.01)
+    assert tempo_filter.outliers == []
+    # two far-off readings that disagree with each other are not a track change either
+    tempo_filter.update(150.0, 0.9, 22.0)
+    assert tempo_filter.update(100.0, 0.9, 23.0) == pytest.approx(120.0, abs=0.01)
+    # a new track: the second agreeing reading restarts the filter there
+    assert tempo_filter.update(128.0, 0.9, 24.0) == pytest.approx(120.0, abs=0.01)
+    assert tempo_filter.update(128.2, 0.9, 25.0) == 128.2
+    assert tempo_filter.drift == 0.0
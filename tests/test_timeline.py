@@ -0,0 +1,87 @@
+import csv
+from datetime import datetime
+
+import numpy as np
+
+import timeline
+from timeline import TimelineWriter, load, tracks, write_tracks_csv, export_csv, HEADER_SIZE, RECORD
+
+
+T0 = 1_700_000_000.0
+BEAT = 60.0 / 128
+
+
+def clock(t):
+    return datetime.fromtimestamp(t).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def write_session(path):
+    """Two tempos: a 120/121 BPM track, a short transition, 128 BPM until a silence, 128 BPM again."""
+    writer = TimelineWriter(path)
+    # track A: 80 s at 121 (sparse readings), then 30 s at 120 (dense readings)
+    for t in range(0, 80, 8):
+        writer.estimate(T0 + t, 121.0, 0.8)
+    for t in range(80, 110):
+        writer.estimate(T0 + t, 120.0, 0.8)
+    writer.close()
+
+    # the app crashed in the middle of a record; the next session appends to the same file
+    with open(path, 'ab') as f:
+        f.write(b'\x01\x02\x03')
+    writer = TimelineWriter(path)
+    writer.estimate(T0 + 110, 100.0, 0.5)     # 4 s transition: not a track
+    beats = T0 + 114 + np.arange(0, 58 + 1e-9, BEAT)
+    for t in range(114, 174, 2):
+        writer.estimate(T0 + t, 128.0, 0.9)
+        # each analysis window reports the beats of the last 4 s again, slightly shifted
+        window = beats[(beats > T0 + t - 4) & (beats <= T0 + t)]
+        writer.beats(window + 0.01, 128.0, 0.9)
+    writer.estimate(T0 + 174, 128.0, 0.0)      # silence: the shown BPM is stale
+    # track C, after a 28 s gap
+    for t in range(200, 240):
+        writer.estimate(T0 + t, 128.0, 0.9)
+    writer.close()
+    return len(beats[beats <= T0 + 172])
+
+
+def test_two_tempo_session_report(tmp_path):
+    path = str(tmp_path / 'slot0.bpmtl')
+    beat_count = write_session(path)
+
+    records = load(path)
+    # fixed-size records after the header; the partial record was cut off
+    assert (tmp_path / 'slot0.bpmtl').stat().st_size == HEADER_SIZE + len(records) * RECORD.itemsize
+    estimates = records[records['kind'] == timeline.ESTIMATE]
+    assert len(estimates) == 10 + 30 + 1 + 30 + 1 + 40
+    assert estimates['time'][40] == T0 + 110 and estimates['bpm'][40] == 100.0
+    # every beat once, despite the overlapping windows
+    assert np.count_nonzero(records['kind'] == timeline.BEAT) == beat_count
+
+    rows = tracks(records)
+    assert [(r['start'] - T0, r['end'] - T0, r['duration']) for r in rows] == [
+        (0.0, 110.0, 110.0), (114.0, 172.0, 58.0), (200.0, 239.0, 39.0)]
+    # time-weighted: 80 s at 121 outweigh 30 readings at 120
+    assert [r['bpm'] for r in rows] == [121.0, 128.0, 128.0]
+    assert (rows[0]['min_bpm'], rows[0]['max_bpm']) == (120.0, 121.0)
+    assert [r['beats'] for r in rows] == [0, beat_count, 0]
+    assert abs(rows[1]['confidence'] - 0.9) < 1e-3
+
+    tracks_csv = str(tmp_path / 'tracks.csv')
+    write_tracks_csv(tracks_csv, rows)
+    with open(tracks_csv, newline='') as f:
+        table = list(csv.reader(f))
+    assert table[0] == ['start', 'end', 'duration', 'bpm', 'min_bpm', 'max_bpm', 'confidence', 'beats']
+    assert table[1:] == [
+        [clock(T0), clock(T0 + 110), '110.0', '121.0', '120.0', '121.0', '0.8', '0'],
+        [clock(T0 + 114), clock(T0 + 172), '58.0', '128.0', '128.0', '128.0', '0.9', str(beat_count)],
+        [clock(T0 + 200), clock(T0 + 239), '39.0', '128.0', '128.0', '128.0', '0.9', '0'],
+    ]
+
+    export = str(tmp_path / 'export.csv')
+    export_csv(export, records)
+    with open(export, newline='') as f:
+        table = list(csv.reader(f))
+    assert table[0] == ['time', 'kind', 'bpm', 'confidence']
+    assert len(table) == len(records) + 1
+    assert table[1] == [str(T0), 'estimate', '121.0', '0.8']
+    assert sum(row[1] == 'beat' for row in table[1:]) == beat_count
@@ -0,0 +1,73 @@
+import argparse
+import json
+import logging
+
+import pytest
+
+import tuning
+from config_store import ConfigStore, validate_config
+
+
+def trial(cost, accuracy, error=1.0):
+    return {'preset': {}, 'cost': cost, 'accuracy': accuracy, 'error': error}
+
+
+def test_pareto_front_excludes_dominated_trials():
+    cheap = trial(0.01, 0.80)
+    worse_at_same_cost = trial(0.01, 0.60)
+    dearer_and_worse = trial(0.02, 0.70)
+    same_accuracy_dearer = trial(0.03, 0.80)
+    best = trial(0.04, 0.95)
+    front = tuning.pareto_front([best, dearer_and_worse, same_accuracy_dearer, cheap, worse_at_same_cost])
+    assert front == [cheap, best]
+
+
+def test_pareto_front_prefers_smaller_error_on_a_tie():
+    rough = trial(0.01, 0.80, error=0.4)
+    close = trial(0.01, 0.80, error=0.1)
+    assert tuning.pareto_front([rough, close]) == [close]
+
+
+def test_written_preset_validates_and_loads_back(tmp_path, caplog):
+    from librosa_beat_detector import DEFAULT_PRESET, LibrosaBeatDetector
+
+    args = argparse.Namespace(hop='256,512', fmin='20', fmax='6000', tightness='100,400',
+                              measurement_std='0.3', random=0, seed=0)
+    presets = tuning.candidates(args, DEFAULT_PRESET)
+    preset = presets[-1]
+    assert preset != presets[0]     # not the default
+
+    path = tmp_path / 'config.json'
+    config = validate_config({'font_size': 42})
+    path.write_text(json.dumps(config, indent=4))
+    with caplog.at_level(logging.WARNING):
+        tuning.write_preset(str(path), preset)
+
+        written = json.loads(path.read_text())
+        assert written == dict(config, librosa_preset=preset)
+        # nothing of it is dropped or fixed by validation
+        assert validate_config(json.loads(path.read_text())) == written
+        assert ConfigStore(str(path)).config['librosa_preset'] == preset
+    assert caplog.records == []
+
+    bd = LibrosaBeatDetector(preset=written['librosa_preset'])
+    assert bd.hop_length == preset['hop_length']
+
+
+@pytest.mark.parametrize('label, correct', [(128.0, True), (100.0, False)])
+def test_score_replays_cached_windows(tmp_path, click_wav, label, correct):
+    pytest.importorskip('librosa')
+    from librosa_beat_detector import DEFAULT_PRESET
+
+    preset = {key: DEFAULT_PRESET[key] for key in ('hop_length', 'fmin', 'fmax', 'tightness', 'measurement_std')}
+    out = str(tmp_path / 'windows.npz')
+    tuning._record_windows((click_wav(128, seconds=20.0), out, tuning.onset_key(preset)))
+
+    score = tuning._score((preset, [(out, label)]))
+    assert score['readings'] > 0
+    if correct:
+        assert score['correct'] == score['readings']
+        assert score['errors'][0] <= tuning.TOLERANCE
+    else:
+        assert score['correct'] == 0
+        assert score['errors'][0] > 20
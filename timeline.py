@@ -0,0 +1,243 @@
+"""
+BPM timeline: an append-only log of every slot's estimates and beats, for post-show reports.
+
+Each slot with "timeline" enabled appends fixed-size records to
+timelines/slot<N>.bpmtl, across sessions. Records are collected in a
+preallocated buffer on the detector thread and written in batches, so
+logging costs one array store per estimate. The report reads the file
+memory-mapped and splits it into tracks with array operations, so even a
+multi-hour file takes well under a second:
+
+    python timeline.py timelines/slot0.bpmtl
+    python timeline.py timelines/slot0.bpmtl --since 2024-05-04T22:00 --csv tracks.csv
+    python timeline.py timelines/slot0.bpmtl --export estimates.csv
+
+A new track starts where the BPM jumps by more than TRACK_CHANGE or there was
+no reading for TRACK_GAP seconds (silence, app stopped); pitch-fader moves
+stay within one track. Segments shorter than MIN_TRACK_SECONDS (transitions)
+are left out of the report.
+"""
+
+import argparse
+import csv
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+
+TIMELINES_DIR = 'timelines'
+MAGIC = b'BPMTL01\0'
+HEADER_SIZE = 16             # MAGIC + record size (uint32) + 4 reserved bytes
+RECORD = np.dtype([('time', '<f8'), ('bpm', '<f4'), ('confidence', '<f2'), ('kind', '<u2')])
+ESTIMATE, BEAT = 0, 1        # Record kinds; a beat record carries the BPM shown at that moment
+BUFFER_RECORDS = 256         # Records collected before they are written
+FLUSH_INTERVAL = 5.0         # Seconds after which collected records are written anyway
+BEAT_DEDUP = 0.15            # Beats closer than this to the last logged one are repeats (overlapping windows)
+
+TRACK_CHANGE = 0.04          # Relative BPM jump between two estimates that starts a new track
+TRACK_GAP = 10.0             # Seconds without readings that start a new track
+MIN_TRACK_SECONDS = 30.0     # Shorter segments are transitions, not tracks
+
+
+class TimelineWriter:
+    """
+    Appends records to one slot's timeline file.
+
+    Attach it as a detector's `timeline`; BaseBeatDetector.record_estimate()
+    and record_beats() call it on the detector thread. flush() may be called
+    from any thread.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC + np.array([RECORD.itemsize, 0], dtype='<u4').tobytes())
+        else:
+            # a record cut short by a crash would shift every later one
+            size = self.file.tell()
+            partial = (size - HEADER_SIZE) % RECORD.itemsize
+            if partial:
+                self.file.truncate(size - partial)
+                self.file.seek(0, os.SEEK_END)
+        self.buffer = np.zeros(BUFFER_RECORDS, dtype=RECORD)
+        self.count = 0
+        self.last_beat = 0.0
+        self.last_write = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _append(self, kind, t, bpm, confidence):
+        with self._lock:
+            self.buffer[self.count] = (t, bpm, confidence, kind)
+            self.count += 1
+            if self.count == BUFFER_RECORDS or time.monotonic() - self.last_write >= FLUSH_INTERVAL:
+                self._write()
+
+    def estimate(self, t, bpm, confidence):
+        """Log an estimate shown at wall-clock time t."""
+        self._append(ESTIMATE, t, bpm, confidence)
+
+    def beats(self, times, bpm, confidence):
+        """Log beats at wall-clock times (ascending); beats already logged are skipped."""
+        for t in times:
+            if t > self.last_beat + BEAT_DEDUP:
+                self._append(BEAT, t, bpm, confidence)
+                self.last_beat = t
+
+    def _write(self):
+        if self.count:
+            self.file.write(memoryview(self.buffer[:self.count]).cast('B'))
+            self.file.flush()
+            self.count = 0
+        self.last_write = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    def close(self):
+        with self._lock:
+            self._write()
+            self.file.close()
+
+
+def load(path):
+    """
+    Map a timeline file read-only.
+
+    Returns:
+        Structured array of RECORD (empty when nothing was logged yet)
+
+    Raises:
+        ValueError: If the file is not a timeline
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    if header[:8] != MAGIC or int.from_bytes(header[8:12], 'little') != RECORD.itemsize:
+        raise ValueError(f"{path} is not a BPM timeline")
+    n = (os.path.getsize(path) - HEADER_SIZE) // RECORD.itemsize
+    if n == 0:
+        return np.zeros(0, dtype=RECORD)
+    return np.memmap(path, dtype=RECORD, mode='r', offset=HEADER_SIZE, shape=(n,))
+
+
+def select(records, since=None, until=None):
+    """Records within [since, until) (wall-clock seconds)."""
+    # not a binary search: beats are logged once their window is analysed, up to a few seconds late
+    keep = np.ones(len(records), dtype=bool)
+    if since is not None:
+        keep &= records['time'] >= since
+    if until is not None:
+        keep &= records['time'] < until
+    return records[keep]
+
+
+def tracks(records):
+    """
+    Split a timeline into tracks and summarize each one.
+
+    Returns:
+        List of dicts (start, end, duration, bpm: the time-weighted median,
+        min_bpm, max_bpm, confidence: time-weighted mean, beats), in time order
+    """
+    # readings with zero confidence are silence (or no beat found): the BPM shown is stale
+    estimates = records[(records['kind'] == ESTIMATE) & (records['bpm'] > 0) & (records['confidence'] > 0)]
+    if len(estimates) == 0:
+        return []
+    t = estimates['time']
+    bpm = estimates['bpm'].astype(np.float64)
+    confidence = estimates['confidence'].astype(np.float64)
+
+    # each estimate is shown until the next one, unless the log stopped in between
+    shown = np.diff(t, append=t[-1])
+    breaks = (shown[:-1] > TRACK_GAP) | (np.abs(np.diff(bpm)) > TRACK_CHANGE * bpm[:-1])
+    shown[shown > TRACK_GAP] = 0.0
+    starts = np.flatnonzero(np.concatenate(([True], breaks)))
+    ends = np.append(starts[1:], len(t))
+    segment = np.repeat(np.arange(len(starts)), ends - starts)
+
+    total = np.add.reduceat(shown, starts)
+    weighted_conf = np.add.reduceat(shown * confidence, starts)
+    min_bpm = np.minimum.reduceat(bpm, starts)
+    max_bpm = np.maximum.reduceat(bpm, starts)
+
+    # time-weighted median: sort by (segment, bpm), find where the cumulative weight passes half
+    order = np.lexsort((bpm, segment))
+    cumulative = np.cumsum(shown[order])
+    before = np.concatenate(([0.0], cumulative[ends[:-1] - 1]))
+    median_at = np.searchsorted(cumulative, before + total / 2)
+    median = bpm[order][np.clip(median_at, starts, ends - 1)]
+
+    beat_times = records['time'][records['kind'] == BEAT]
+    # beats are counted from the first estimate of a segment to the first of the next
+    beats = np.diff(np.searchsorted(beat_times, np.concatenate(([-np.inf], t[starts[1:]], [np.inf]))))
+
+    result = []
+    for i in np.flatnonzero(total >= MIN_TRACK_SECONDS):
+        result.append({
+            'start': float(t[starts[i]]),
+            'end': float(t[ends[i] - 1] + shown[ends[i] - 1]),
+            'duration': float(total[i]),
+            'bpm': float(median[i]),
+            'min_bpm': float(min_bpm[i]),
+            'max_bpm': float(max_bpm[i]),
+            'confidence': float(weighted_conf[i] / total[i]),
+            'beats': int(beats[i]),
+        })
+    return result
+
+
+def _clock(t):
+    return datetime.fromtimestamp(t).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def write_tracks_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['start', 'end', 'duration', 'bpm', 'min_bpm', 'max_bpm', 'confidence', 'beats'])
+        for r in rows:
+            writer.writerow([_clock(r['start']), _clock(r['end']), round(r['duration'], 1), round(r['bpm'], 1),
+                             round(r['min_bpm'], 1), round(r['max_bpm'], 1), round(r['confidence'], 2), r['beats']])
+
+
+def export_csv(path, records):
+    """Every record as a CSV row (time as Unix seconds)."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['time', 'kind', 'bpm', 'confidence'])
+        kinds = np.array(['estimate', 'beat'])[records['kind']]
+        writer.writerows(zip(np.round(records['time'], 3), kinds, np.round(records['bpm'], 2),
+                             np.round(records['confidence'].astype(np.float32), 3)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Timeline file (timelines/slot<N>.bpmtl)")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Only from this local time (e.g. 2024-05-04T22:00)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Only up to this local time")
+    parser.add_argument("--csv", help="Write the tracks to this CSV file")
+    parser.add_argument("--export", help="Write every estimate and beat to this CSV file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    records = select(load(args.path), args.since and args.since.timestamp(), args.until and args.until.timestamp())
+    rows = tracks(records)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'start':19}  {'duration':>8}  {'bpm':>6}  {'range':>13}  {'conf':>4}  {'beats':>5}")
+    for r in rows:
+        print(f"{_clock(r['start'])}  {r['duration'] / 60:6.1f} m  {r['bpm']:6.1f}  "
+              f"{r['min_bpm']:6.1f}-{r['max_bpm']:<6.1f}  {r['confidence']:4.2f}  {r['beats']:>5}")
+    print(f"{len(rows)} tracks from {len(records)} records in {elapsed * 1000:.0f} ms")
+    if args.csv:
+        write_tracks_csv(args.csv, rows)
+    if args.export:
+        export_csv(args.export, records)
+
+
+if __name__ == "__main__":
+    main()
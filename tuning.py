@@ -0,0 +1,304 @@
+"""
+Parameter search for the librosa detector.
+
+Replays a labeled audio corpus through the detector (file-driven, as in
+offline analysis) for every candidate setting (a grid, or a random sample of it) in a process pool,
+and prints the Pareto front of accuracy against CPU cost. One point of the
+front can be written to config.json as the "librosa_preset".
+
+    python tuning.py corpus/ --hop 256,512 --fmax 4000,8000 --tightness 50,100,400
+    python tuning.py corpus/ --random 40 --workers 8 --out trials.json
+    python tuning.py corpus/ --load trials.json --write 2
+
+Labels come from corpus/labels.json ({"track.wav": 128.0, ...}) or from the
+BPM in the file name ("track_128bpm.wav", "loop 174 BPM.flac"). The onset
+window of every update is cached per file and onset setting in
+corpus/.tuning_cache, so trials that only change tightness or smoothing skip
+the STFT, also across runs.
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from capture import AUDIO_EXTENSIONS
+from library import file_digest
+
+CACHE_DIR = '.tuning_cache'
+SETTLE_SECONDS = 10.0        # Readings before this point of a file are not scored
+TOLERANCE = 0.5              # BPM error that still counts as correct
+COST_SECONDS = 20.0          # Audio run through the real detector to measure the CPU cost of a setting
+
+BPM_IN_NAME = re.compile(r'(\d+(?:\.\d+)?)\s*bpm', re.IGNORECASE)
+
+
+def load_corpus(path):
+    """
+    Find the labeled audio files of a corpus directory.
+
+    Returns:
+        List of (file path, BPM), sorted by path; unlabeled files are skipped
+    """
+    labels = {}
+    labels_path = os.path.join(path, 'labels.json')
+    if os.path.exists(labels_path):
+        with open(labels_path) as f:
+            labels = json.load(f)
+    corpus = []
+    for name in sorted(os.listdir(path)):
+        if not name.lower().endswith(AUDIO_EXTENSIONS):
+            continue
+        bpm = labels.get(name)
+        if bpm is None:
+            match = BPM_IN_NAME.search(name)
+            bpm = match and float(match.group(1))
+        if bpm:
+            corpus.append((os.path.join(path, name), float(bpm)))
+    return corpus
+
+
+def onset_key(preset):
+    """The settings the onset frames depend on."""
+    return preset['hop_length'], float(preset['fmin']), float(preset['fmax'])
+
+
+def windows_path(cache_dir, digest, key):
+    hop, fmin, fmax = key
+    return os.path.join(cache_dir, f"{digest[:20]}_{hop}_{fmin:g}_{fmax:g}.npz")
+
+
+def _record_windows(task):
+    """
+    Worker: run the detector over a file and cache the onset window of every update.
+
+    The file is played through a FileSource exactly as in offline analysis;
+    only the tempo estimate of each update is replaced by recording the onset
+    envelope it would have analysed (None for windows skipped as silent).
+    """
+    from capture import FileSource
+    from librosa_beat_detector import LibrosaBeatDetector, DEFAULT_PRESET
+
+    path, out, key = task
+    if os.path.exists(out):
+        return out
+    preset = dict(DEFAULT_PRESET, hop_length=key[0], fmin=key[1], fmax=key[2])
+    bd = LibrosaBeatDetector(source=FileSource(path), fast_lock=False, preset=preset)
+    times, windows = [], []
+    def record():
+        times.append(bd.audio_time)
+        windows.append(bd._onset_strength().copy() if bd._peak() >= 0.01 else None)
+    bd._calculate_bpm = record
+    bd.run()
+    silent = np.array([w is None for w in windows], dtype=bool)
+    frames = np.zeros((len(windows), bd.n_frames), dtype=np.float32)
+    for i, w in enumerate(windows):
+        if w is not None:
+            frames[i] = w
+    tmp = f"{out}.{os.getpid()}.npz"
+    np.savez(tmp, times=np.array(times), windows=frames, silent=silent, sample_rate=bd.sample_rate)
+    os.replace(tmp, out)
+    return out
+
+
+def _measure_cost(task):
+    """Worker: CPU seconds per second of audio of the real detector with a preset."""
+    from capture import read_audio_file
+    from librosa_beat_detector import LibrosaBeatDetector
+
+    preset, path = task
+    data, rate = read_audio_file(path)
+    audio = np.ascontiguousarray(data[:int(COST_SECONDS * rate), 0])
+    # a first run pays for imports and JIT compilation; only the second one is timed
+    for _ in range(2):
+        bd = LibrosaBeatDetector(preset=preset)
+        bd.set_sample_rate(rate)
+        warmup = bd.update_samples + bd.buffer_size
+        for i in range(0, warmup, bd.buffer_size):
+            bd.process_samples(audio[i:i + bd.buffer_size])
+    bd = LibrosaBeatDetector(preset=preset)
+    bd.set_sample_rate(rate)
+    start = time.thread_time()
+    for i in range(0, len(audio), bd.buffer_size):
+        bd.process_samples(audio[i:i + bd.buffer_size])
+    return (time.thread_time() - start) / (len(audio) / rate)
+
+
+def _score(task):
+    """
+    Worker: replay the cached onset windows through the detector's estimator with a preset.
+
+    Each window is estimated and passed through the tempo filter as in
+    LibrosaBeatDetector._calculate_bpm (without fast lock).
+
+    Returns:
+        Dict with correct (readings within TOLERANCE), readings, errors (per file, median absolute)
+    """
+    import librosa_beat_detector as lbd
+
+    preset, files = task
+    correct = readings = 0
+    errors = []
+    for path, bpm in files:
+        cached = np.load(path)
+        bd = lbd.LibrosaBeatDetector(preset=preset, fast_lock=False)
+        bd.set_sample_rate(int(cached['sample_rate']))
+        file_errors = []
+        for t, window, silent in zip(cached['times'], cached['windows'], cached['silent']):
+            if not silent:
+                raw_bpm, confidence = bd._estimate(window, bd.hop_length, bd.bpm if bd.bpm > 0 else lbd.START_BPM)
+                if raw_bpm is not None:
+                    bd.set_estimate(raw_bpm, confidence, t, lag=bd.buffer_duration / 2, smooth=lbd.ENABLE_SMOOTHING)
+            if t >= SETTLE_SECONDS:
+                file_errors.append(abs(bd.bpm - bpm))
+        correct += sum(e <= TOLERANCE for e in file_errors)
+        readings += len(file_errors)
+        errors.append(float(np.median(file_errors)) if file_errors else float('inf'))
+    return {'correct': correct, 'readings': readings, 'errors': errors}
+
+
+def candidates(args, defaults):
+    """
+    Presets to try: the grid of all listed values, or a random sample of it.
+
+    Returns:
+        List of preset dicts (the default preset first)
+    """
+    space = {
+        'hop_length': [int(v) for v in args.hop.split(',')],
+        'fmin': [float(v) for v in args.fmin.split(',')],
+        'fmax': [float(v) for v in args.fmax.split(',')],
+        'tightness': [float(v) for v in args.tightness.split(',')],
+        'measurement_std': [float(v) for v in args.measurement_std.split(',')],
+    }
+    grid = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+    if args.random and args.random < len(grid):
+        rng = np.random.default_rng(args.seed)
+        grid = [grid[i] for i in rng.choice(len(grid), args.random, replace=False)]
+    default = {k: defaults[k] for k in space}
+    return [default] + [p for p in grid if p != default]
+
+
+def pareto_front(trials):
+    """Trials no other trial beats on both accuracy and cost, cheapest first."""
+    front = []
+    for trial in sorted(trials, key=lambda t: (t['cost'], -t['accuracy'], t['error'])):
+        if not front or trial['accuracy'] > front[-1]['accuracy']:
+            front.append(trial)
+    return front
+
+
+def run(args):
+    from librosa_beat_detector import DEFAULT_PRESET
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        sys.exit(f"No labeled audio files in {args.corpus} (see labels.json / BPM in the file name)")
+    cache_dir = os.path.join(args.corpus, CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    presets = candidates(args, DEFAULT_PRESET)
+    print(f"Tuning: {len(corpus)} files, {len(presets)} settings, {args.workers} workers")
+
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(args.workers) as pool:
+        start = time.perf_counter()
+        digests = pool.map(file_digest, [path for path, _ in corpus])
+        # 1) onset windows, once per file and onset setting
+        keys = sorted({onset_key(p) for p in presets})
+        tasks = [(path, windows_path(cache_dir, digest, key), key)
+                 for (path, _), digest in zip(corpus, digests) for key in keys]
+        missing = sum(not os.path.exists(out) for _, out, _ in tasks)
+        pool.map(_record_windows, tasks)
+        print(f"Onset windows: {len(tasks) - missing} cached, {missing} computed "
+              f"({time.perf_counter() - start:.1f}s)")
+
+        # 2) CPU cost on the first file, once per setting that changes it (not the filter)
+        start = time.perf_counter()
+        cost_presets = {}
+        for p in presets:
+            cost_presets.setdefault(onset_key(p) + (p['tightness'],), p)
+        costs = dict(zip(cost_presets, pool.map(_measure_cost, [(p, corpus[0][0]) for p in cost_presets.values()])))
+        print(f"CPU cost: {len(costs)} settings measured ({time.perf_counter() - start:.1f}s)")
+
+        # 3) accuracy of every setting over the corpus
+        start = time.perf_counter()
+        scores = pool.map(_score, [(p, [(windows_path(cache_dir, digest, onset_key(p)), bpm)
+                                         for (_, bpm), digest in zip(corpus, digests)]) for p in presets])
+        print(f"Accuracy: {len(presets)} settings replayed ({time.perf_counter() - start:.1f}s)")
+
+    trials = []
+    for preset, score in zip(presets, scores):
+        trials.append({
+            'preset': preset,
+            'cost': costs[onset_key(preset) + (preset['tightness'],)],
+            'accuracy': score['correct'] / max(1, score['readings']),
+            'error': float(np.median(score['errors'])),
+            'files_ok': int(sum(e <= TOLERANCE for e in score['errors'])),
+        })
+    return trials
+
+
+def print_front(front, n_files, default):
+    print(f"\n{'#':>2} {'accuracy':>8} {'files':>5} {'error':>6} {'cpu':>6}  preset")
+    for i, trial in enumerate(front):
+        p = trial['preset']
+        print(f"{i:>2} {trial['accuracy']:>8.1%} {trial['files_ok']:>2}/{n_files:<2} {trial['error']:>6.2f} "
+              f"{trial['cost']:>6.1%}  hop {p['hop_length']}, fmin {p['fmin']:g}, fmax {p['fmax']:g}, "
+              f"tightness {p['tightness']:g}, measurement_std {p['measurement_std']:g}"
+              f"{'  (default)' if p == default else ''}")
+
+
+def write_preset(config_path, preset):
+    """Store a preset as "librosa_preset" in the app config."""
+    from config_store import ConfigStore
+
+    store = ConfigStore(config_path)
+    store.config['librosa_preset'] = preset
+    store.save()
+    store.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="Directory of labeled audio files")
+    parser.add_argument("--hop", default="256,384,512", help="Hop lengths to try")
+    parser.add_argument("--fmin", default="0,20,40")
+    parser.add_argument("--fmax", default="4000,6000,8000")
+    parser.add_argument("--tightness", default="50,100,200,400")
+    parser.add_argument("--measurement-std", default="0.2,0.3,0.5", help="Tempo filter measurement noise (BPM)")
+    parser.add_argument("--random", type=int, default=0, help="Try this many random settings instead of the grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", help="Write all trials to this JSON file")
+    parser.add_argument("--load", help="Use the trials of an earlier --out instead of running")
+    parser.add_argument("--write", type=int, metavar="N", help="Write point N of the front to the config as librosa_preset")
+    parser.add_argument("--config", default="config.json")
+    args = parser.parse_args()
+
+    from librosa_beat_detector import DEFAULT_PRESET
+
+    if args.load:
+        with open(args.load) as f:
+            trials = json.load(f)
+    else:
+        trials = run(args)
+    front = pareto_front(trials)
+    default = {k: DEFAULT_PRESET[k] for k in trials[0]['preset']}
+    print_front(front, len(load_corpus(args.corpus)), default)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(trials, f, indent=4)
+    if args.write is not None:
+        preset = front[args.write]['preset']
+        write_preset(args.config, preset)
+        print(f"\nWrote point {args.write} to {args.config} as librosa_preset")
+
+
+if __name__ == "__main__":
+    main()
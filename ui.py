@@ -1,9 +1,18 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, colorchooser
+from tkinter import font as tkfont
 import logging
 import json
+import sys
+import threading
+import time
+import numpy as np
 from beat_detector import list_input_devices
 from midi_clock import list_midi_ports
+from beat_detector_base import LOW_CONFIDENCE
+
+# Global settings whose change restyles every slot
+GLOBAL_APPEARANCE_FIELDS = {'font_color', 'bg_color', 'low_confidence_color', 'font_size'}
 
 class OverlayController:
     def __init__(self, root, beat_detectors, config, stop_event):
@@ -13,6 +22,20 @@ class OverlayController:
         self.windows = []
         self.windows_visible = True
         self.stop_event = stop_event
+        self._fonts = {}
+        self._pending = {}
+        self._pending_all = False
+        self._idle_id = None
+
+    def get_font(self, size):
+        """Shared Helvetica font object for a text size, created once and reused by all slots."""
+        size = int(size) if size else 30
+        if size < 8: size = 8
+        font = self._fonts.get(size)
+        if font is None:
+            font = tkfont.Font(root=self.root, family='Helvetica', size=size)
+            self._fonts[size] = font
+        return font
 
     def create_windows(self):
         # Clear existing windows
@@ -36,7 +59,6 @@ class OverlayController:
         y = cfg.get('y', 100)
         # Use per-device text size if available, else global default
         font_size = cfg.get('text_size', self.config.get('font_size', 30))
-        font_color = self.config.get('font_color', 'white')
         bg_color = self.config.get('bg_color', 'black')
 
         window = tk.Toplevel()
@@ -45,22 +67,27 @@ class OverlayController:
         window.attributes('-topmost', True)
         
         if bd is None:
-            label = tk.Label(window, text='MISSING', font=("Helvetica", font_size), fg='red', bg=bg_color)
+            label = tk.Label(window, text='MISSING', font=self.get_font(font_size), fg='red', bg=bg_color)
             label.pack()
             window._label = label
             return window
 
-        label = tk.Label(window, text=str(bd.bpm), font=("Helvetica", font_size), fg=font_color, bg=bg_color)
+        label = tk.Label(window, text=self.format_bpm(bd), font=self.get_font(font_size), fg=self.label_color(bd), bg=bg_color)
         label.pack()
 
         # Store label for easy updates
         window._label = label
 
+        if cfg.get('show_graph'):
+            window._graph = BpmGraph(window, bd.history, self.stop_event, bg_color,
+                                     self.config.get('font_color', 'white'), fps=self.config.get('graph_fps', GRAPH_FPS))
+            window._graph.canvas.pack()
+
         def update_label():
             if self.stop_event and self.stop_event.is_set():
                 return
             try:
-                label.config(text=str(bd.bpm))
+                label.config(text=self.format_bpm(bd), fg=self.label_color(bd))
             except Exception:
                 label.config(text='-')
             window.after(1000, update_label)
@@ -68,32 +95,73 @@ class OverlayController:
         window.after(1000, update_label)
         return window
 
+    @staticmethod
+    def format_bpm(bd):
+        """Label text for a detector: its BPM, followed by the locked MIDI clock reference if any."""
+        ref_bpm = bd.reference_bpm()
+        if ref_bpm:
+            return f"{bd.bpm} ({ref_bpm:.1f})"
+        return str(bd.bpm)
+
+    def label_color(self, bd):
+        """Text color for a detector: dimmed while its estimate has low confidence."""
+        if bd.confidence < LOW_CONFIDENCE:
+            return self.config.get('low_confidence_color', 'gray')
+        return self.config.get('font_color', 'white')
+
+    def request_update(self, changes=None):
+        """
+        Queue appearance changes, applied together on the next Tk idle cycle.
+
+        Args:
+            changes: Dict mapping a slot index (None for global settings) to the set of
+                     changed config fields, or None to refresh everything
+        """
+        if changes is None:
+            self._pending_all = True
+        else:
+            for slot, fields in changes.items():
+                self._pending.setdefault(slot, set()).update(fields)
+        if self._idle_id is None:
+            self._idle_id = self.root.after_idle(self._apply_pending)
+
+    def _apply_pending(self):
+        self._idle_id = None
+        pending, self._pending = self._pending, {}
+        full, self._pending_all = self._pending_all, False
+        if full or pending.pop(None, set()) & GLOBAL_APPEARANCE_FIELDS:
+            self.update_appearance()
+            return
+        for slot, fields in pending.items():
+            self._update_slot(slot, fields)
+
     def update_appearance(self):
         """Update existing windows with new config values (X, Y, Size, Colors) without recreating them."""
-        font_color = self.config.get('font_color', 'white')
-        bg_color = self.config.get('bg_color', 'black')
-        
-        for i, bd in enumerate(self.beat_detectors):
-            if i < len(self.windows) and self.windows[i]:
-                cfg = self.config['input_devices'][i]
-                x = cfg.get('x', 100)
-                y = cfg.get('y', 100)
-                font_size = cfg.get('text_size', self.config.get('font_size', 30))
-                
-                try:
-                    self.windows[i].geometry(f'+{x}+{y}')
-                    self.windows[i].config(bg=bg_color)
-                    if hasattr(self.windows[i], '_label'):
-                        # Ensure font_size is an int and valid
-                        f_size = int(font_size) if font_size else 30
-                        if f_size < 8: f_size = 8
-                        self.windows[i]._label.config(
-                            font=("Helvetica", f_size),
-                            fg=font_color,
-                            bg=bg_color
-                        )
-                except Exception as e:
-                    logging.error(f"Error updating window appearance for slot {i}: {e}")
+        for i in range(len(self.beat_detectors)):
+            self._update_slot(i)
+
+    def _update_slot(self, i, fields=None):
+        """Apply config to one slot's window; only the given fields, or everything if None."""
+        if i >= len(self.windows) or i >= len(self.beat_detectors) or not self.windows[i]:
+            return
+        window = self.windows[i]
+        bd = self.beat_detectors[i]
+        cfg = self.config['input_devices'][i]
+        try:
+            if fields is None or 'x' in fields or 'y' in fields:
+                window.geometry(f"+{cfg.get('x', 100)}+{cfg.get('y', 100)}")
+            if fields is None or 'text_size' in fields:
+                if hasattr(window, '_label'):
+                    window._label.config(font=self.get_font(cfg.get('text_size', self.config.get('font_size', 30))))
+            if fields is None:
+                bg_color = self.config.get('bg_color', 'black')
+                window.config(bg=bg_color)
+                if hasattr(window, '_graph'):
+                    window._graph.canvas.config(bg=bg_color)
+                if hasattr(window, '_label'):
+                    window._label.config(fg=self.label_color(bd) if bd is not None else 'red', bg=bg_color)
+        except Exception as e:
+            logging.error(f"Error updating window appearance for slot {i}: {e}")
 
     def toggle_visibility(self):
         if not self.windows:
@@ -130,42 +198,424 @@ class OverlayController:
         self.windows = []
 
 
-class ScrollableFrame(ttk.Frame):
-    def __init__(self, container, *args, **kwargs):
-        super().__init__(container, *args, **kwargs)
-        self.canvas = tk.Canvas(self, height=100, highlightthickness=0)
-        scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
-        self.scrollable_frame = ttk.Frame(self.canvas)
+GRAPH_FPS = 10  # Default redraw limit of the mini-graph ("graph_fps")
 
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(
-                scrollregion=self.canvas.bbox("all")
-            )
-        )
 
-        self.window_id = self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=scrollbar.set)
+class BpmGraph:
+    """
+    Scrolling mini-graph of a detector's BPM history, confidence and latest onset envelope.
 
-        self.canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-        
-        # Force the inner frame to match the canvas width
-        self.canvas.bind("<Configure>", self._on_canvas_configure)
+    Reads the detector's HistoryBuffer on the Tk thread. Redraws are rate-limited
+    to `fps`, skipped while the history is unchanged, and decimated to the canvas
+    width; the three line items are reused and only their coordinates updated.
+    """
+
+    WIDTH = 160
+    HEIGHT = 48
+    POINTS = 80  # number of BPM estimates shown
+
+    def __init__(self, parent, history, stop_event, bg_color, fg_color, fps=GRAPH_FPS):
+        self.history = history
+        self.stop_event = stop_event
+        self.interval_ms = max(1, int(1000 / fps))
+        self.canvas = tk.Canvas(parent, width=self.WIDTH, height=self.HEIGHT, bg=bg_color, highlightthickness=0)
+        self.onset_line = self.canvas.create_line(0, 0, 0, 0, fill='#505050')
+        self.confidence_line = self.canvas.create_line(0, 0, 0, 0, fill='#2e8b57')
+        self.bpm_line = self.canvas.create_line(0, 0, 0, 0, fill=fg_color, width=2)
+        self.range_text = self.canvas.create_text(2, 1, anchor='nw', fill='#808080', font=("Helvetica", 7))
+        self._seen = None
+        self.canvas.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        if self.stop_event and self.stop_event.is_set():
+            return
+        try:
+            if not self.canvas.winfo_exists():
+                return
+            seq = (self.history.count, self.history.onset_seq)
+            if seq != self._seen:
+                self._seen = seq
+                self._draw()
+            self.canvas.after(self.interval_ms, self._tick)
+        except tk.TclError:
+            # window was destroyed
+            pass
+
+    @staticmethod
+    def _coords(xs, ys):
+        if len(xs) < 2:
+            return [0, 0, 0, 0]
+        return np.column_stack((xs, ys)).ravel().tolist()
+
+    def _draw(self):
+        w, h = self.WIDTH, self.HEIGHT
+
+        # Onset envelope, decimated to at most one point per pixel
+        onset = self.history.onset
+        step = max(1, len(onset) // w)
+        onset = onset[::step]
+        peak = float(onset.max()) if len(onset) else 0.0
+        if peak > 0:
+            xs = np.linspace(0, w - 1, len(onset))
+            self.canvas.coords(self.onset_line, self._coords(xs, h - 1 - onset / peak * (h - 2)))
+
+        _, bpm, confidence = self.history.read_last(self.POINTS)
+        if len(bpm) >= 2:
+            xs = np.linspace(w - 1 - (len(bpm) - 1) * (w - 1) / (self.POINTS - 1), w - 1, len(bpm))
+            valid = bpm[bpm > 0]
+            lo, hi = (float(valid.min()), float(valid.max())) if len(valid) else (0.0, 1.0)
+            lo, hi = lo - 1.0, hi + 1.0  # at least +-1 BPM so a flat line sits mid-graph
+            self.canvas.coords(self.bpm_line, self._coords(xs, h - 1 - (np.clip(bpm, lo, hi) - lo) / (hi - lo) * (h - 2)))
+            self.canvas.coords(self.confidence_line, self._coords(xs, h - 1 - confidence * (h - 2)))
+            self.canvas.itemconfig(self.range_text, text=f"{lo:.0f}-{hi:.0f}")
+
+
+class CanvasOverlayController(OverlayController):
+    """
+    Renders all slots into a single topmost, borderless canvas window.
+    
+    One Toplevel covers the bounding box of all slots; each slot is a cached
+    background rectangle + text item. A single update loop touches only the
+    items whose text or color changed, and rebuilding on config changes only
+    recreates canvas items, never the window. The area between slots is made
+    transparent with `-transparentcolor`, which only Windows supports; elsewhere
+    the window would cover the desktop between the slots, so main.py only uses
+    this renderer where supported() is true.
+    """
+
+    UPDATE_MS = 1000
+    TRANSPARENT_KEY = '#010203'
+    PADDING = 2
+
+    @staticmethod
+    def supported():
+        """Whether Tk can make the window transparent between the slots (Windows only)."""
+        return sys.platform == 'win32'
+
+    def __init__(self, root, beat_detectors, config, stop_event):
+        super().__init__(root, beat_detectors, config, stop_event)
+        self.window = None
+        self.canvas = None
+        self.items = []  # per slot: dict(bd, cfg, rect, text, cache) or None
+        self.origin = (0, 0)
+        self.transparent = False
+        self.frame_cost_ms = 0.0
+        self.frame_count = 0
+        self._after_id = None
+
+    def _ensure_window(self):
+        if self.window is not None:
+            return
+        self.window = tk.Toplevel()
+        self.window.overrideredirect(True)
+        self.window.attributes('-topmost', True)
+        try:
+            self.window.attributes('-transparentcolor', self.TRANSPARENT_KEY)
+            self.transparent = True
+        except tk.TclError:
+            self.transparent = False
+        self.canvas = tk.Canvas(self.window, highlightthickness=0, bd=0)
+        self.canvas.pack(fill='both', expand=True)
+        if not self.windows_visible:
+            self.window.withdraw()
+
+    def _slot_style(self, cfg, bd):
+        """Return (x, y, font, text, fg) for a slot config entry."""
+        font = self.get_font(cfg.get('text_size', self.config.get('font_size', 30)))
+        if bd is None:
+            return cfg.get('x', 100), cfg.get('y', 100), font, 'MISSING', 'red'
+        return cfg.get('x', 100), cfg.get('y', 100), font, self.format_bpm(bd), self.label_color(bd)
+
+    def create_windows(self):
+        self._ensure_window()
+        self.canvas.delete('all')
+        self.items = []
+
+        for i, bd in enumerate(self.beat_detectors):
+            try:
+                self.items.append(self._create_slot_items(self.config['input_devices'][i], bd))
+            except Exception:
+                logging.exception('Failed to create overlay items for slot %d', i)
+                self.items.append(None)
+
+        self.update_appearance()
+        if self._after_id is None:
+            self._after_id = self.root.after(self.UPDATE_MS, self._tick)
+
+    def _create_slot_items(self, cfg, bd):
+        # Placed at the origin; update_appearance() moves the items into position
+        rect = self.canvas.create_rectangle(0, 0, 0, 0, width=0)
+        text_id = self.canvas.create_text(0, 0, anchor='nw')
+        return {'bd': bd, 'cfg': cfg, 'rect': rect, 'text': text_id, 'cache': {}}
+
+    def _update_origin(self):
+        """Place the window at the top-left corner of all configured slot positions."""
+        xs, ys = [], []
+        for slot in self.items:
+            if slot is not None:
+                xs.append(int(slot['cfg'].get('x', 100)))
+                ys.append(int(slot['cfg'].get('y', 100)))
+        self.origin = (min(xs), min(ys)) if xs else (0, 0)
+
+    def _fit_rect(self, slot):
+        x1, y1, x2, y2 = self.canvas.bbox(slot['text'])
+        self.canvas.coords(slot['rect'], x1 - self.PADDING, y1 - self.PADDING, x2 + self.PADDING, y2 + self.PADDING)
+
+    def _fit_window(self):
+        """Resize the window to the union of all slot rectangles."""
+        bbox = self.canvas.bbox('all')
+        if not bbox:
+            return
+        width, height = bbox[2] + 1, bbox[3] + 1
+        self.canvas.config(width=width, height=height)
+        self.window.geometry(f'{width}x{height}+{self.origin[0]}+{self.origin[1]}')
+
+    def _tick(self):
+        self._after_id = None
+        if self.stop_event and self.stop_event.is_set():
+            return
+        start = time.perf_counter()
+        resized = False
+        for slot in self.items:
+            if slot is None or slot['bd'] is None:
+                continue
+            bd = slot['bd']
+            try:
+                text = self.format_bpm(bd)
+                fill = self.label_color(bd)
+            except Exception:
+                text, fill = '-', self.config.get('font_color', 'white')
+            cache = slot['cache']
+            if text != cache.get('text') or fill != cache.get('fill'):
+                self.canvas.itemconfig(slot['text'], text=text, fill=fill)
+                if len(text) != len(cache.get('text', '')):
+                    # Digits are equal width, so only a length change resizes the box
+                    self._fit_rect(slot)
+                    resized = True
+                cache['text'], cache['fill'] = text, fill
+        if resized:
+            self._fit_window()
+
+        cost = (time.perf_counter() - start) * 1000.0
+        self.frame_cost_ms = cost if self.frame_count == 0 else 0.9 * self.frame_cost_ms + 0.1 * cost
+        self.frame_count += 1
+        if self.frame_count % 60 == 0:
+            logging.debug(f"Canvas overlay: {len(self.items)} slots, redraw cost {self.frame_cost_ms:.3f} ms/frame")
+        self._after_id = self.root.after(self.UPDATE_MS, self._tick)
+
+    def update_appearance(self):
+        """Re-apply position, size and colors to the canvas items."""
+        if self.canvas is None:
+            return
+        bg_color = self.config.get('bg_color', 'black')
+        self.canvas.config(bg=self.TRANSPARENT_KEY if self.transparent else bg_color)
+        # Slot config entries may have been replaced by the settings window
+        for i, slot in enumerate(self.items):
+            if slot is not None and i < len(self.config['input_devices']):
+                slot['cfg'] = self.config['input_devices'][i]
+        self._update_origin()
+        for i, slot in enumerate(self.items):
+            if slot is not None:
+                self._style_slot(i, slot)
+        self._fit_window()
+
+    def _style_slot(self, i, slot):
+        try:
+            x, y, font, text, fg = self._slot_style(slot['cfg'], slot['bd'])
+            cx, cy = x - self.origin[0], y - self.origin[1]
+            self.canvas.coords(slot['text'], cx + self.PADDING, cy + self.PADDING)
+            self.canvas.itemconfig(slot['text'], font=font, text=text, fill=fg)
+            self.canvas.itemconfig(slot['rect'], fill=self.config.get('bg_color', 'black'))
+            slot['cache'] = {'text': text, 'fill': fg}
+            self._fit_rect(slot)
+        except Exception as e:
+            logging.error(f"Error updating overlay appearance for slot {i}: {e}")
+
+    def _update_slot(self, i, fields=None):
+        """Restyle one slot; moves may shift the window origin, so they refresh everything."""
+        if fields is None or 'x' in fields or 'y' in fields:
+            self.update_appearance()
+            return
+        if i < len(self.items) and self.items[i] is not None and i < len(self.config['input_devices']):
+            slot = self.items[i]
+            slot['cfg'] = self.config['input_devices'][i]
+            self._style_slot(i, slot)
+            self._fit_window()
+
+    def toggle_visibility(self):
+        if self.window is None:
+            return
+        if self.windows_visible:
+            self.window.withdraw()
+            self.windows_visible = False
+        else:
+            self.window.deiconify()
+            self.window.lift()
+            self.windows_visible = True
+
+    def update_window_for_slot(self, slot_index, new_bd, new_cfg):
+        self._ensure_window()
+        while len(self.items) <= slot_index:
+            self.items.append(None)
+        old = self.items[slot_index]
+        if old:
+            self.canvas.delete(old['rect'], old['text'])
+        self.items[slot_index] = self._create_slot_items(new_cfg, new_bd)
+        self.update_appearance()
+
+    def close_all(self):
+        if self._after_id is not None:
+            try: self.root.after_cancel(self._after_id)
+            except: pass
+            self._after_id = None
+        if self.window is not None:
+            try: self.window.destroy()
+            except: pass
+        self.window = None
+        self.canvas = None
+        self.items = []
+
+
+class VirtualList(ttk.Frame):
+    """
+    Scrollable list that only creates widgets for the rows in view.
+
+    A pool of row widgets just large enough to fill the visible height is
+    rebound to different items on scroll, add and remove, so large item
+    counts never create (or destroy) more than a screenful of widgets.
+    """
+
+    def __init__(self, container, create_row, bind_row, height=100, row_height=30, **kwargs):
+        """
+        Args:
+            create_row: create_row(parent) -> row object with a `frame` widget
+            bind_row: bind_row(row, index) shows item `index` in an existing row
+        """
+        super().__init__(container, **kwargs)
+        self.create_row = create_row
+        self.bind_row = bind_row
+        self.row_height = row_height
+        self.count = 0
+        self.first = 0
+        self.rows = []
+        self.shown = 0
+
+        self.body = ttk.Frame(self, height=height)
+        self.body.pack_propagate(False)
+        self.body.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.body.bind("<Configure>", lambda e: self.refresh())
+        self._bind_wheel(self.body)
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1))
+        widget.bind("<Button-4>", lambda e: self.scroll(-1))
+        widget.bind("<Button-5>", lambda e: self.scroll(1))
+
+    def visible_count(self):
+        height = self.body.winfo_height()
+        if height <= 1:
+            # not mapped yet: use the requested height
+            height = self.body.winfo_reqheight()
+        return max(1, height // self.row_height)
+
+    def set_count(self, count):
+        """Set the number of items and rebind the visible rows."""
+        self.count = count
+        self.refresh()
+
+    def scroll(self, rows):
+        self.first += rows
+        self.refresh()
+
+    def see(self, index):
+        """Scroll so that item `index` is visible."""
+        visible = self.visible_count()
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + visible:
+            self.first = index - visible + 1
+        self.refresh()
+
+    def _on_scroll(self, action, amount, what=None):
+        if action == 'moveto':
+            self.first = int(round(float(amount) * self.count))
+        elif action == 'scroll':
+            step = self.visible_count() if what == 'pages' else 1
+            self.first += int(amount) * step
+        self.refresh()
+
+    def refresh(self):
+        """Rebind all visible rows (e.g. after scrolling or adding/removing items)."""
+        visible = self.visible_count()
+        self.first = max(0, min(self.first, self.count - visible))
+        needed = max(0, min(visible, self.count - self.first))
+
+        # Grow the pool on demand; rows beyond `needed` are hidden, not destroyed
+        while len(self.rows) < needed:
+            row = self.create_row(self.body)
+            for widget in [row.frame] + row.frame.winfo_children():
+                self._bind_wheel(widget)
+            self.rows.append(row)
+            self.row_height = max(self.row_height, row.frame.winfo_reqheight() + 4)
+        for k in range(needed, self.shown):
+            self.rows[k].frame.pack_forget()
+        for k in range(self.shown, needed):
+            self.rows[k].frame.pack(fill='x', pady=2)
+        self.shown = needed
+
+        for k in range(needed):
+            self.bind_row(self.rows[k], self.first + k)
+
+        if self.count:
+            self.scrollbar.set(self.first / self.count, (self.first + needed) / self.count)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def refresh_index(self, index):
+        """Rebind a single item if it is currently visible."""
+        row = self.row_for(index)
+        if row is not None:
+            self.bind_row(row, index)
+
+    def row_for(self, index):
+        """Return the row currently showing item `index`, or None when scrolled out of view."""
+        k = index - self.first
+        if 0 <= k < self.shown:
+            return self.rows[k]
+        return None
+
+    def visible_rows(self):
+        return self.rows[:self.shown]
+
+
+class _DeviceRow:
+    """Widgets and variables of one Settings row; `index` is the slot it currently shows."""
+
+    def __init__(self):
+        self.index = None
+        self.frame = None
 
-    def _on_canvas_configure(self, event):
-        self.canvas.itemconfig(self.window_id, width=event.width)
 
 class SettingsWindow:
     def __init__(self, root, config, on_save_callback, on_close_callback, on_change_callback=None):
+        """
+        on_change_callback(config, changes) is called for live edits; `changes` maps the
+        slot index (None for global settings) to the set of changed config fields.
+        """
         self.root = root
         self.config = config
         self.on_save = on_save_callback
         self.on_close = on_close_callback
         self.on_change = on_change_callback
         self.window = None
-        self.entries = [] # List of dicts {name_var, x_var, y_var, size_var, ...}
+        self.device_list = None
         self._updating = False
+        self._scan_generation = 0
+        # Edited text of every slot, also of rows scrolled out of view (which have no widgets)
+        self.row_values = []
 
     def open(self):
         if self.window:
@@ -199,10 +649,11 @@ class SettingsWindow:
             lbl.grid(row=0, column=i, padx=5, sticky='ew')
             header_frame.columnconfigure(i, minsize=width, weight=1 if col == "Name" else 0)
 
-        # Scrollable list
-        self.scroll_frame = ScrollableFrame(main_frame)
-        self.scroll_frame.pack(fill='both', expand=True)
+        # Device list (virtualized: only visible rows have widgets)
+        self.device_list = VirtualList(main_frame, self._create_row, self._bind_row)
+        self.device_list.pack(fill='both', expand=True)
         
+        self.load_row_values()
         self.refresh_list()
 
         # Global Appearance Section
@@ -274,82 +725,129 @@ class SettingsWindow:
         ttk.Button(btn_frame, text="Save & Apply", command=self.save).pack(side='right', padx=5)
         ttk.Button(btn_frame, text="Close", command=self.close).pack(side='right', padx=5)
 
-    def refresh_list(self):
-        # Clear existing
-        for widget in self.scroll_frame.scrollable_frame.winfo_children():
-            widget.destroy()
-        self.entries = []
-        self._updating = True
+    def _create_row(self, parent):
+        row = _DeviceRow()
+        row.frame = ttk.Frame(parent)
+        for j, width in enumerate(self.col_widths):
+            row.frame.columnconfigure(j, minsize=width, weight=1 if j==1 else 0)
 
-        for i, dev in enumerate(self.config['input_devices']):
-            row_frame = ttk.Frame(self.scroll_frame.scrollable_frame)
-            row_frame.pack(fill='x', pady=2)
-            
-            for j, width in enumerate(self.col_widths):
-                row_frame.columnconfigure(j, minsize=width, weight=1 if j==1 else 0)
+        def on_write(*args):
+            self.on_value_change(row.index)
 
-            # Slot
-            ttk.Label(row_frame, text=str(i), anchor='w').grid(row=0, column=0, padx=5, sticky='ew')
-            
-            # Name
-            name_var = tk.StringVar(value=dev.get('name', ''))
-            name_var.trace_add("write", lambda *args, idx=i: self.on_value_change(idx))
-            ttk.Entry(row_frame, textvariable=name_var, state='readonly').grid(row=0, column=1, padx=5, sticky='ew')
-            
-            # ID
-            ttk.Label(row_frame, text=str(dev.get('id', '?')), anchor='w').grid(row=0, column=2, padx=5, sticky='ew')
-            
-            # X
-            x_var = tk.StringVar(value=str(dev.get('x', 100)))
-            x_var.trace_add("write", lambda *args, idx=i: self.on_value_change(idx))
-            ttk.Spinbox(row_frame, from_=0, to=4000, textvariable=x_var, width=5).grid(row=0, column=3, padx=5, sticky='ew')
-            
-            # Y
-            y_var = tk.StringVar(value=str(dev.get('y', 100)))
-            y_var.trace_add("write", lambda *args, idx=i: self.on_value_change(idx))
-            ttk.Spinbox(row_frame, from_=0, to=4000, textvariable=y_var, width=5).grid(row=0, column=4, padx=5, sticky='ew')
-            
-            # Size
-            size_var = tk.StringVar(value=str(dev.get('text_size', self.config.get('font_size', 30))))
-            size_var.trace_add("write", lambda *args, idx=i: self.on_value_change(idx))
-            ttk.Spinbox(row_frame, from_=8, to=200, textvariable=size_var, width=5).grid(row=0, column=5, padx=5, sticky='ew')
-            
-            # Status
+        # Slot
+        row.slot_label = ttk.Label(row.frame, anchor='w')
+        row.slot_label.grid(row=0, column=0, padx=5, sticky='ew')
+
+        # Name
+        row.name_var = tk.StringVar()
+        row.name_var.trace_add("write", on_write)
+        ttk.Entry(row.frame, textvariable=row.name_var, state='readonly').grid(row=0, column=1, padx=5, sticky='ew')
+
+        # ID
+        row.id_label = ttk.Label(row.frame, anchor='w')
+        row.id_label.grid(row=0, column=2, padx=5, sticky='ew')
+
+        # X
+        row.x_var = tk.StringVar()
+        row.x_var.trace_add("write", on_write)
+        ttk.Spinbox(row.frame, from_=0, to=4000, textvariable=row.x_var, width=5).grid(row=0, column=3, padx=5, sticky='ew')
+
+        # Y
+        row.y_var = tk.StringVar()
+        row.y_var.trace_add("write", on_write)
+        ttk.Spinbox(row.frame, from_=0, to=4000, textvariable=row.y_var, width=5).grid(row=0, column=4, padx=5, sticky='ew')
+
+        # Size
+        row.size_var = tk.StringVar()
+        row.size_var.trace_add("write", on_write)
+        ttk.Spinbox(row.frame, from_=8, to=200, textvariable=row.size_var, width=5).grid(row=0, column=5, padx=5, sticky='ew')
+
+        # Status
+        row.status_label = ttk.Label(row.frame, anchor='w')
+        row.status_label.grid(row=0, column=6, padx=5, sticky='ew')
+
+        # Remove Button
+        ttk.Button(row.frame, text="Remove", command=lambda: self.remove_device(row.index)).grid(row=0, column=7, padx=5, sticky='ew')
+        return row
+
+    def _bind_row(self, row, index):
+        """Show slot `index` in a pooled row without firing change callbacks."""
+        dev = self.config['input_devices'][index]
+        values = self.row_values[index]
+        self._updating = True
+        try:
+            row.index = index
+            row.slot_label.configure(text=str(index))
+            row.name_var.set(values['name'])
+            row.id_label.configure(text=str(dev.get('id', '?')))
+            row.x_var.set(values['x'])
+            row.y_var.set(values['y'])
+            row.size_var.set(values['text_size'])
             status = "OK" if dev.get('_resolved') is not None else "MISSING"
-            lbl = ttk.Label(row_frame, text=status, anchor='w')
-            lbl.grid(row=0, column=6, padx=5, sticky='ew')
-            if status == "MISSING": lbl.configure(foreground='red')
-            else: lbl.configure(foreground='green')
-
-            # Remove Button
-            ttk.Button(row_frame, text="Remove", command=lambda idx=i: self.remove_device(idx)).grid(row=0, column=7, padx=5, sticky='ew')
-
-            self.entries.append({
-                'name': name_var,
-                'x': x_var,
-                'y': y_var,
-                'text_size': size_var
-            })
-        
-        self._updating = False
+            row.status_label.configure(text=status, foreground='red' if status == "MISSING" else 'green')
+        finally:
+            self._updating = False
+
+    def _values_of(self, dev):
+        """Text shown in a row for device `dev`."""
+        return {
+            'name': dev.get('name', ''),
+            'x': str(dev.get('x', 100)),
+            'y': str(dev.get('y', 100)),
+            'text_size': str(dev.get('text_size', self.config.get('font_size', 30))),
+        }
+
+    @staticmethod
+    def _parse_values(values):
+        """Config fields of a row's text; raises ValueError for invalid input."""
+        return {
+            'name': values['name'],
+            'x': int(values['x']),
+            'y': int(values['y']),
+            'text_size': int(values['text_size']),
+        }
+
+    def load_row_values(self):
+        """(Re)load the edited text of every slot from the config."""
+        self.row_values = [self._values_of(dev) for dev in self.config['input_devices']]
+
+    def refresh_list(self):
+        """Rebind the visible rows to the current device list (no widgets are rebuilt)."""
+        if len(self.row_values) != len(self.config['input_devices']):
+            self.load_row_values()
+        self.device_list.set_count(len(self.config['input_devices']))
         
         # Update MIDI source dropdown if it exists
         if hasattr(self, 'midi_source_combo'):
             self.refresh_midi_source_list()
 
     def on_value_change(self, index):
-        if self._updating: return
+        if self._updating or index is None: return
+        row = self.device_list.row_for(index)
+        if row is None:
+            return
+        self.set_row_values(index, {
+            'name': row.name_var.get(),
+            'x': row.x_var.get(),
+            'y': row.y_var.get(),
+            'text_size': row.size_var.get(),
+        })
+
+    def set_row_values(self, index, values):
+        """Store the edited text of slot `index` and apply it live when it is valid."""
+        self.row_values[index] = dict(values)
         try:
-            entry = self.entries[index]
-            self.config['input_devices'][index]['name'] = entry['name'].get()
-            self.config['input_devices'][index]['x'] = int(entry['x'].get() or 0)
-            self.config['input_devices'][index]['y'] = int(entry['y'].get() or 0)
-            self.config['input_devices'][index]['text_size'] = int(entry['text_size'].get() or 30)
-            
-            if self.on_change:
-                self.on_change(self.config)
-        except (ValueError, IndexError):
-            pass
+            parsed = self._parse_values(values)
+        except ValueError:
+            # kept in row_values; save() reports it
+            return
+        device = self.config['input_devices'][index]
+        # Report only the fields that actually changed for this slot
+        changed = {key for key, value in parsed.items() if device.get(key) != value}
+        device.update(parsed)
+
+        if changed and self.on_change:
+            self.on_change(self.config, {index: changed})
 
     def add_device_dialog(self):
         sel_win = tk.Toplevel(self.window)
@@ -370,19 +868,33 @@ class SettingsWindow:
         lb.column('name', width=400)
         lb.pack(fill='both', expand=True, side='top')
         
-        # Function to refresh the device list
-        def refresh_devices():
-            # Clear existing items
+        def populate(generation, avail):
+            # Ignore results of an older scan or for a closed dialog
+            if generation != self._scan_generation or not sel_win.winfo_exists():
+                return
             for item in lb.get_children():
                 lb.delete(item)
-            
-            # Get fresh list of devices
-            avail = list_input_devices()
             logging.info(f"Refreshed audio device list: found {len(avail)} devices")
-            
-            # Populate treeview
             for a in avail:
                 lb.insert('', 'end', values=(a['id'], a['name']))
+
+        # Enumerate devices on a worker thread; PyAudio init can take seconds
+        def refresh_devices():
+            self._scan_generation += 1
+            generation = self._scan_generation
+            for item in lb.get_children():
+                lb.delete(item)
+            lb.insert('', 'end', iid='scanning', values=('', 'Scanning...'))
+
+            def worker():
+                avail = list_input_devices()
+                try:
+                    self.root.after(0, populate, generation, avail)
+                except RuntimeError:
+                    # Tk main loop already gone
+                    pass
+
+            threading.Thread(target=worker, daemon=True, name='DeviceScan').start()
         
         # Initial population
         refresh_devices()
@@ -393,7 +905,7 @@ class SettingsWindow:
         
         def confirm():
             sel = lb.selection()
-            if not sel: return
+            if not sel or sel[0] == 'scanning': return
             item = lb.item(sel[0])
             dev_id = item['values'][0]
             dev_name = item['values'][1]
@@ -406,7 +918,9 @@ class SettingsWindow:
                 'text_size': self.config.get('font_size', 30)
             }
             self.config['input_devices'].append(new_dev)
+            self.row_values.append(self._values_of(new_dev))
             self.refresh_list()
+            self.device_list.see(len(self.config['input_devices']) - 1)
             sel_win.destroy()
         
         ttk.Button(btn_frame, text="Refresh List", command=refresh_devices).pack(side='left', padx=5)
@@ -416,13 +930,14 @@ class SettingsWindow:
     def remove_device(self, index):
         if messagebox.askyesno("Confirm", "Remove this device?"):
             del self.config['input_devices'][index]
+            del self.row_values[index]
             self.refresh_list()
 
     def on_midi_enable_change(self):
         """Handle MIDI enable checkbox toggle."""
         self.config['midi_enabled'] = self.midi_enabled_var.get()
         if self.on_change:
-            self.on_change(self.config)
+            self.on_change(self.config, {None: {'midi_enabled'}})
 
     def on_midi_source_change(self, event=None):
         """Handle MIDI source device selection change."""
@@ -432,7 +947,7 @@ class SettingsWindow:
             slot = int(selection.split(':')[0].replace('Slot', '').strip())
             self.config['midi_source_slot'] = slot
             if self.on_change:
-                self.on_change(self.config)
+                self.on_change(self.config, {None: {'midi_source_slot'}})
 
     def on_midi_port_change(self, event=None):
         """Handle MIDI port selection change."""
@@ -440,7 +955,7 @@ class SettingsWindow:
         if port and port != "No MIDI ports found":
             self.config['midi_port'] = port
             if self.on_change:
-                self.on_change(self.config)
+                self.on_change(self.config, {None: {'midi_port'}})
 
     def refresh_midi_ports(self):
         """Refresh the list of available MIDI ports and source devices."""
@@ -492,7 +1007,7 @@ class SettingsWindow:
             self.config[key] = result[1]
             self.update_color_buttons()
             if self.on_change:
-                self.on_change(self.config)
+                self.on_change(self.config, {None: {key}})
 
     def update_color_buttons(self):
         """Update the color button backgrounds to reflect current config."""
@@ -509,17 +1024,20 @@ class SettingsWindow:
         self.bg_color_btn.config(bg=bg_c, text=bg_c, fg=contrast(bg_c))
 
     def save(self):
-        # Update config from entries
-        for i, entry in enumerate(self.entries):
+        # Validate every slot, not just the rows in view: a row scrolled out of
+        # view keeps its (possibly invalid) text in row_values
+        parsed = []
+        for index, values in enumerate(self.row_values):
             try:
-                self.config['input_devices'][i]['name'] = entry['name'].get()
-                self.config['input_devices'][i]['x'] = int(entry['x'].get())
-                self.config['input_devices'][i]['y'] = int(entry['y'].get())
-                self.config['input_devices'][i]['text_size'] = int(entry['text_size'].get())
+                parsed.append(self._parse_values(values))
             except ValueError:
-                messagebox.showerror("Error", f"Invalid values in row {i}")
+                if self.device_list is not None:
+                    self.device_list.see(index)
+                messagebox.showerror("Error", f"Invalid values in row {index}")
                 return
 
+        for device, values in zip(self.config['input_devices'], parsed):
+            device.update(values)
         self.on_save(self.config)
 
     def _center_window(self, window, width, height):